@@ -0,0 +1,387 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+数据采集模块
+在独立线程的事件循环中周期读取PLC数据，不占用Qt界面线程
+"""
+
+import time
+import asyncio
+import threading
+
+from s7_client import S7Client, S7Error
+from read_planner import plan_reads
+from block_decoder import BlockDecoder
+from formula import FormulaEngine
+from data_source import SourceError
+from link_supervisor import LinkSupervisor
+from snapshot_queue import Snapshot, SnapshotQueue
+from sqlite_source import SqliteSource
+from mysql_source import MySQLSource
+
+# 非S7设备类型对应的数据表数据源
+DATA_SOURCES = {
+    "sqllite": SqliteSource,
+    "sqlite": SqliteSource,
+    "mysql": MySQLSource,
+}
+# 运行中修改后立即生效、不需要重新连接的设置项
+TIMING_KEYS = ("refresh_interval_ms", "heartbeat")
+
+
+class AcquisitionEngine:
+    """PLC采集引擎
+
+    在后台线程内运行独立的asyncio事件循环，按 refresh_interval_ms 周期批量读取标签，
+    每次请求受 timeout 约束；空闲时提前 heartbeat_timeout 秒发送心跳读取，
+    应答的最迟时刻正好是上次通信后一个心跳周期，断线在一个心跳周期内即可发现。
+    连接状态由 LinkSupervisor 维护，断开后按带抖动的指数退避重连，期间标签标记为过期。
+    读取结果原地写入标签注册表，界面线程通过 snapshot() 取得最新数据，不会被网络IO阻塞。
+    device_type 为 S7 时直接读取PLC，为数据库类型时由 DATA_SOURCES 中的数据源增量读取数据表。
+
+    每个周期结束后把结果副本放入 snapshots 队列(有界SPSC，满时丢弃最旧的)，
+    并在需要时调用 on_snapshot 通知界面线程取数据，界面线程不需要轮询也不与采集线程争锁。
+    """
+
+    def __init__(self, settings, registry, history=None):
+        """
+        Args:
+            settings: project.json 中的 plc_settings
+            registry: TagRegistry 标签注册表
+            history: 可选的 HistoryStore，每个成功的采集周期追加一行工程值
+        """
+        self.registry = registry
+        self.settings = {}
+        self._configure(settings)
+        self.history = history
+        self.formulas = FormulaEngine(registry)
+        for index, message in self.formulas.errors.items():
+            print(f"Error compiling formula of {registry.names[index]}: {message}")
+        self.supervisor = LinkSupervisor()
+        self.snapshots = SnapshotQueue()
+        # 有新快照时在采集线程中调用，界面用它发出跨线程的Qt信号
+        self.on_snapshot = None
+        # 周期处理器: 每个成功的采集周期在采集线程中调用 processor.process(registry, now)
+        self.processors = []
+        self.connected = False
+        self.last_error = ""
+        self.cycle_count = 0
+        self.last_cycle_ms = 0.0
+        self.max_cycle_ms = 0.0
+        self.total_cycle_ms = 0.0
+        self.overruns = 0
+        self._timestamp = 0.0
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._stop_event = None
+        self._wake_event = None
+        self._stopping = False
+        # 运行中收到的新设置，在下一次循环开始时应用
+        self._pending_settings = None
+
+    def _configure(self, settings):
+        """按设置创建连接对象，返回被替换的旧连接(首次调用时为 None)"""
+        old_link = (self.source or self.client) if self.settings else None
+        source = DATA_SOURCES.get(str(settings.get("device_type", "S7")).lower())
+        # 先创建数据源，设置无效时抛出 SourceError 且不改变当前配置
+        source = source(settings, self.registry) if source is not None else None
+        self.settings = dict(settings)
+        self._apply_timing(settings)
+        self.timeout = max(0.1, int(settings.get("timeout", 10000)) / 1000.0)
+        self.client = S7Client(
+            settings.get("address", "192.168.1.10"),
+            settings.get("port", 102),
+            timeout=self.timeout
+        )
+        self.source = source
+        self.byte_order = settings.get("byte_order", "ABCD")
+        self.plan = None
+        self.decoder = None
+        return old_link
+
+    def _apply_timing(self, settings):
+        self.refresh_interval = max(0.05, int(settings.get("refresh_interval_ms", 60000)) / 1000.0)
+        self.heartbeat = max(1, int(settings.get("heartbeat", 30)))
+
+    def update_settings(self, settings):
+        """运行中修改PLC设置(可在任意线程调用)
+
+        刷新周期与心跳立即生效；地址、设备类型等连接参数变化时关闭旧连接并按新设置重连。
+        采集协程运行时在两个周期之间应用，不会打断正在进行的读取。
+        """
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._request_settings, dict(settings))
+        else:
+            self._apply_settings(dict(settings))
+
+    def _request_settings(self, settings):
+        self._pending_settings = settings
+        if self._wake_event is not None:
+            self._wake_event.set()
+
+    def _apply_settings(self, settings):
+        """应用新设置
+
+        Returns:
+            需要关闭的旧连接，不需要重连时为 None
+        """
+        settings = {**self.settings, **settings}
+        if settings == self.settings:
+            return None
+        changed = {k for k in settings if settings.get(k) != self.settings.get(k)}
+        if changed.issubset(TIMING_KEYS):
+            self.settings = settings
+            self._apply_timing(settings)
+            return None
+        try:
+            old_link = self._configure(settings)
+        except (SourceError, ValueError) as e:
+            print(f"Error applying PLC settings: {e}")
+            return None
+        print(f"PLC settings changed ({', '.join(sorted(changed))}), reconnecting")
+        return old_link
+
+    def start(self):
+        """在独立线程中启动采集"""
+        if self._thread is not None:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run_loop, name="plc-acquisition", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止采集线程并关闭连接"""
+        if self._thread is None:
+            return
+        self.request_stop()
+        self._thread.join(self.timeout + 1)
+        self._thread = None
+
+    @property
+    def stopping(self):
+        """已请求停止；采集协程在此之后退出属于正常停止"""
+        return self._stopping
+
+    def request_stop(self):
+        """通知采集协程停止(可在任意线程调用)"""
+        self._stopping = True
+        loop, event, wake = self._loop, self._stop_event, self._wake_event
+        if loop is not None and event is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(event.set)
+            loop.call_soon_threadsafe(wake.set)
+
+    def cycle_stats(self):
+        """采集周期耗时统计"""
+        count = self.cycle_count
+        return {
+            "cycles": count,
+            "last_ms": round(self.last_cycle_ms, 2),
+            "avg_ms": round(self.total_cycle_ms / count, 2) if count else 0.0,
+            "max_ms": round(self.max_cycle_ms, 2),
+            "overruns": self.overruns,
+            "interval_ms": round(self.refresh_interval * 1000),
+        }
+
+    def add_processor(self, processor):
+        """注册周期处理器(如按环统计)，需在 start() 之前调用
+
+        处理器在采集线程中按周期增量计算，界面线程只读取其结果，不需要重新扫描历史数据。
+        """
+        self.processors.append(processor)
+        return processor
+
+    def snapshot(self):
+        """获取最新一次采集结果
+
+        Returns:
+            (values, quality, timestamp, connected) 元组，values/quality 为注册表数组的副本
+        """
+        with self._lock:
+            registry = self.registry
+            return registry.values[:], registry.quality[:], self._timestamp, self.connected
+
+    def _publish(self, read_at):
+        """把当前注册表的副本放入快照队列"""
+        registry = self.registry
+        with self._lock:
+            snapshot = Snapshot(registry.values[:], registry.quality[:], registry.timestamps[:],
+                                self._timestamp, read_at, self.cycle_count)
+        if self.snapshots.put(snapshot) and self.on_snapshot is not None:
+            self.on_snapshot()
+
+    @property
+    def heartbeat_timeout(self):
+        """心跳应答的等待时间(秒)，最多为半个心跳周期，保证两次心跳之间仍有空闲"""
+        return min(self.timeout, self.heartbeat / 2)
+
+    def link_status(self):
+        """连接状态与重连统计，供界面显示"""
+        return self.supervisor.status()
+
+    def _run_loop(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_until_complete(self.run())
+        finally:
+            loop.close()
+
+    async def run(self):
+        """采集协程，可由 AcquisitionManager 与其他PLC的采集协程在同一事件循环中并发运行"""
+        self._loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
+        self._wake_event = asyncio.Event()
+        if self._stopping:
+            return
+        await self._run()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        next_cycle = loop.time()
+        last_io = loop.time()
+        link = self.source or self.client
+        supervisor = self.supervisor
+        while not self._stop_event.is_set():
+            if self._pending_settings is not None:
+                settings, self._pending_settings = self._pending_settings, None
+                old_link = self._apply_settings(settings)
+                if old_link is not None:
+                    await old_link.close()
+                    link = self.source or self.client
+                    self.connected = False
+                # 设置变更后立即按新周期读取一次
+                next_cycle = last_io = loop.time()
+            if not link.connected:
+                self.connected = False
+                supervisor.connecting()
+                try:
+                    # 先关闭旧连接，避免重连时遗留半开的套接字
+                    await link.close()
+                    await link.connect()
+                    if self.source is None and (self.plan is None
+                                                or self.plan.pdu_size != self.client.pdu_size):
+                        self.plan = plan_reads(self.registry, self.client.pdu_size)
+                        self.decoder = BlockDecoder(self.plan, self.registry, self.byte_order)
+                        print(f"PLC read plan: {self.plan.report()}")
+                    self.connected = True
+                    supervisor.connected()
+                    last_io = loop.time()
+                except (S7Error, SourceError) as e:
+                    self.last_error = str(e)
+                    delay = supervisor.connect_failed(self.last_error)
+                    print(f"Error connecting PLC: {e}, retry in {delay:.1f} s")
+                    if await self._wait(delay):
+                        break
+                    next_cycle = loop.time()
+                    continue
+
+            now = loop.time()
+            # 心跳在应答期限(上次通信后一个心跳周期)之前 heartbeat_timeout 秒发出
+            heartbeat_at = last_io + self.heartbeat - self.heartbeat_timeout
+            if now >= next_cycle:
+                await self._read_cycle()
+                last_io = loop.time()
+                # 按固定节拍推进，若已落后则从当前时间重新计时，避免积压
+                next_cycle += self.refresh_interval
+                if next_cycle < last_io:
+                    next_cycle = last_io + self.refresh_interval
+            elif now >= heartbeat_at:
+                await self._send_heartbeat()
+                last_io = loop.time()
+
+            if not self.connected:
+                # 判定为断开后立即关闭连接并重连，重连失败时才按退避时间等待
+                await link.close()
+                continue
+            wait = min(next_cycle, last_io + self.heartbeat - self.heartbeat_timeout) - loop.time()
+            if await self._wait(max(0.0, wait)):
+                break
+        await link.close()
+        self.connected = False
+
+    async def _wait(self, seconds):
+        """等待指定时间，收到停止信号时返回True；设置变更时提前返回"""
+        try:
+            await asyncio.wait_for(self._wake_event.wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
+        self._wake_event.clear()
+        return self._stop_event.is_set()
+
+    def _link_failed(self, message):
+        """读取或心跳失败: 标签标记为过期，由状态机判定是否需要重连"""
+        self.last_error = message
+        link = self.source or self.client
+        with self._lock:
+            self.registry.mark_stale()
+        if self.supervisor.failed(message, not link.connected):
+            self.connected = False
+        self._publish(time.perf_counter())
+
+    async def _send_heartbeat(self):
+        registry = self.registry
+        if not len(registry):
+            return
+        # 应答必须在上次通信后一个心跳周期内返回，否则视为连接已失效
+        timeout = self.heartbeat_timeout
+        try:
+            if self.source is not None:
+                await asyncio.wait_for(self.source.ping(), timeout)
+            else:
+                await asyncio.wait_for(
+                    self.client.read_area(registry.area[0], registry.db[0], registry.offset[0], 1), timeout)
+        except asyncio.TimeoutError:
+            await (self.source or self.client).close()
+            self._link_failed("心跳超时")
+            print("PLC heartbeat timed out")
+        except (S7Error, SourceError) as e:
+            self._link_failed(str(e))
+            print(f"PLC heartbeat failed: {e}")
+
+    async def _read_cycle(self):
+        started = time.perf_counter()
+        registry = self.registry
+        results = []
+        try:
+            if self.source is not None:
+                results = await self.source.fetch()
+            else:
+                blocks = self.plan.blocks
+                for job in self.plan.jobs:
+                    raw = await self.client.read_multi([blocks[b].item() for b in job])
+                    results.extend(zip(job, raw))
+        except (S7Error, SourceError) as e:
+            self._link_failed(str(e))
+            print(f"Error reading PLC: {e}")
+            return
+        now = time.time()
+        with self._lock:
+            if self.source is not None:
+                self.source.apply(results, now)
+            else:
+                decode = self.decoder.decode
+                for b, data in results:
+                    decode(b, data, now)
+            self.formulas.evaluate()
+            self._timestamp = now
+            if self.history is not None:
+                self.history.append(now, registry.values, registry.quality)
+            for processor in self.processors:
+                try:
+                    processor.process(registry, now)
+                except Exception as e:
+                    print(f"Error processing cycle in {type(processor).__name__}: {e}")
+        self.supervisor.succeeded()
+        elapsed = (time.perf_counter() - started) * 1000.0
+        self.cycle_count += 1
+        self.last_cycle_ms = elapsed
+        self.total_cycle_ms += elapsed
+        if elapsed > self.max_cycle_ms:
+            self.max_cycle_ms = elapsed
+        if elapsed > self.refresh_interval * 1000.0:
+            self.overruns += 1
+        self._publish(started)
+
@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+采集管理模块
+在同一个事件循环中并发采集全部启用项目的PLC，单台PLC变慢或故障不影响其他PLC
+"""
+
+import asyncio
+import threading
+
+from acquisition import AcquisitionEngine
+from data_source import SourceError
+
+# 采集协程意外退出后重新启动前的等待时间(秒)
+RESTART_DELAY = 5.0
+
+
+class AcquisitionManager:
+    """多PLC采集管理器
+
+    每个项目一个 AcquisitionEngine，全部作为独立任务运行在一个后台线程的事件循环中。
+    S7 通信为异步IO，数据库数据源在各自的工作线程中查询，一台PLC等待应答时其他PLC照常采集；
+    每台PLC有独立的周期节拍、超时、重连退避与耗时统计，单个任务的异常只会重启该任务。
+    """
+
+    def __init__(self, projects, registry_factory, history_factory=None):
+        """
+        Args:
+            projects: [(name_en, plc_settings), ...]
+            registry_factory: registry_factory(name_en) -> TagRegistry
+            history_factory: 可选，history_factory(name_en, registry) -> HistoryStore 或 None
+        """
+        self.engines = {}
+        self.histories = {}
+        self._registry_factory = registry_factory
+        self._history_factory = history_factory
+        self._loop = None
+        self._thread = None
+        self._ready = threading.Event()
+        # 采集线程中各项目的监督任务，运行中新增的项目也加入其中
+        self._tasks = {}
+        # 已停用或删除的项目仍在退出中的任务，采集线程等待它们结束后才退出
+        self._retired = set()
+        for name, settings in projects:
+            self.add(name, settings)
+
+    def __len__(self):
+        return len(self.engines)
+
+    def engine(self, name):
+        return self.engines.get(name)
+
+    def add(self, name, settings):
+        """为一个项目创建采集引擎，采集线程已运行时立即开始采集
+
+        设置无效的项目只记录错误并跳过，不影响其他项目。
+
+        Returns:
+            新建的 AcquisitionEngine，设置无效时返回 None
+        """
+        try:
+            engine = self._create_engine(name, settings)
+        except (SourceError, ValueError) as e:
+            print(f"Error starting acquisition of {name}: {e}")
+            return None
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            print(f"Acquisition of {name} started")
+            loop.call_soon_threadsafe(self._spawn, name, engine)
+        return engine
+
+    def remove(self, name):
+        """停止一个项目(停用或删除)的采集，采集协程退出后关闭其历史存储
+
+        Returns:
+            项目不在采集时返回 False
+        """
+        engine = self.engines.pop(name, None)
+        if engine is None:
+            return False
+        history = self.histories.pop(name, None)
+        engine.request_stop()
+        print(f"Acquisition of {name} stopped")
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._retire, name, history)
+        elif history is not None:
+            history.close()
+        return True
+
+    def _create_engine(self, name, settings):
+        registry = self._registry_factory(name)
+        engine = AcquisitionEngine(settings, registry)
+        history = self._history_factory(name, registry) if self._history_factory is not None else None
+        if history is not None:
+            self.histories[name] = history
+            engine.history = history
+        self.engines[name] = engine
+        return engine
+
+    def start(self):
+        """启动采集线程"""
+        if self._thread is not None:
+            return self
+        self._ready.clear()
+        self._tasks = {}
+        self._retired = set()
+        self._thread = threading.Thread(target=self._run_loop, name="plc-acquisition", daemon=True)
+        self._thread.start()
+        self._ready.wait(5)
+        return self
+
+    def stop(self):
+        """停止全部采集任务，关闭连接与历史存储"""
+        if self._thread is not None:
+            for engine in self.engines.values():
+                engine.request_stop()
+            timeout = max((e.timeout for e in self.engines.values()), default=0) + 1
+            self._thread.join(timeout)
+            self._thread = None
+        for history in self.histories.values():
+            history.close()
+
+    def update_settings(self, name, settings):
+        """修改一个PLC的设置；未在采集的项目(新启用或导入的项目)立即开始采集
+
+        Returns:
+            设置无效、无法开始采集时返回 False
+        """
+        engine = self.engines.get(name)
+        if engine is not None:
+            engine.update_settings(settings)
+            return True
+        return self.add(name, settings) is not None
+
+    def status(self):
+        """各PLC的连接状态与周期耗时"""
+        return {
+            name: {"link": engine.link_status(), "cycle": engine.cycle_stats()}
+            for name, engine in self.engines.items()
+        }
+
+    def _run_loop(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._loop = loop
+        try:
+            loop.run_until_complete(self._run())
+        finally:
+            loop.close()
+            self._loop = None
+
+    def _spawn(self, name, engine):
+        """在采集线程的事件循环中为一个PLC创建监督任务(同名项目只创建一次)"""
+        if name not in self._tasks:
+            self._tasks[name] = asyncio.get_running_loop().create_task(
+                self._supervise(name, engine), name=f"plc-{name}")
+
+    def _retire(self, name, history):
+        """在采集线程中把已停止项目的任务移出，任务结束后关闭历史存储"""
+        task = self._tasks.pop(name, None)
+        if task is None:
+            if history is not None:
+                history.close()
+            return
+        self._retired.add(task)
+
+        def done(_task):
+            self._retired.discard(task)
+            if history is not None:
+                history.close()
+
+        task.add_done_callback(done)
+
+    async def _run(self):
+        for name, engine in list(self.engines.items()):
+            self._spawn(name, engine)
+        self._ready.set()
+        # 等待期间可能新增或停止任务，全部任务结束后才退出
+        while True:
+            pending = [task for task in list(self._tasks.values()) + list(self._retired) if not task.done()]
+            if not pending:
+                break
+            await asyncio.wait(pending)
+
+    async def _supervise(self, name, engine):
+        """运行一个PLC的采集协程，意外退出时隔 RESTART_DELAY 秒重启"""
+        while not engine.stopping:
+            try:
+                await engine.run()
+            except Exception as e:
+                print(f"Acquisition of {name} crashed: {e!r}, restarting in {RESTART_DELAY:.0f} s")
+                engine.connected = False
+                await asyncio.sleep(RESTART_DELAY)
+                continue
+            break
@@ -0,0 +1,347 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+报警模块
+按标签索引报警规则，每个采集周期只计算输入标签发生变化的规则，并处理死区与延时
+"""
+
+import heapq
+import itertools
+import threading
+from collections import deque, namedtuple
+from operator import itemgetter
+
+from tag_registry import QUALITY_GOOD
+
+# 规则类型
+HIGH = "high"            # 上限
+LOW = "low"              # 下限
+RATE = "roc"             # 变化率(单位/秒)
+DEVIATION = "deviation"  # 一组标签的最大值与最小值之差
+STUCK = "stuck"          # 持续不变
+
+RULE_TYPES = {
+    HIGH: HIGH, "上限": HIGH,
+    LOW: LOW, "下限": LOW,
+    RATE: RATE, "变化率": RATE,
+    DEVIATION: DEVIATION, "偏差": DEVIATION,
+    STUCK: STUCK, "卡滞": STUCK,
+}
+
+# 变化率规则在输入不再变化后多久(秒)按变化率为0重新判断
+RATE_WINDOW = 1.0
+# 有规则的标签按该数量分组比较
+BLOCK_TAGS = 64
+# 保留最近多少条报警事件
+EVENT_LOG_SIZE = 1000
+
+# 报警事件: timestamp 为发生/恢复时间(秒)，active 为 True 表示报警发生
+AlarmEvent = namedtuple("AlarmEvent", ["timestamp", "rule", "active", "value", "message"])
+
+
+class AlarmError(Exception):
+    """报警规则定义错误"""
+
+
+class AlarmRule:
+    """一条报警规则及其运行状态
+
+    运行状态为固定的几个字段，与规则的历史长度无关。
+    """
+
+    __slots__ = (
+        "name", "kind", "inputs", "limit", "deadband", "on_delay", "off_delay", "duration", "message",
+        "active", "condition", "pending", "due", "value", "ref_value", "ref_ts", "since",
+    )
+
+    def __init__(self, name, kind, inputs, limit=0.0, deadband=0.0, on_delay=0.0, off_delay=0.0,
+                 duration=0.0, message=""):
+        self.name = name
+        self.kind = kind
+        self.inputs = inputs
+        self.limit = limit
+        self.deadband = deadband
+        self.on_delay = on_delay
+        self.off_delay = off_delay
+        self.duration = duration
+        self.message = message
+        self.active = False
+        # 未经延时的报警条件
+        self.condition = False
+        # 条件与报警状态不一致的开始时间，等待延时
+        self.pending = None
+        # 下一次需要按时间重新判断的时间
+        self.due = None
+        self.value = 0.0
+        # 变化率: 上一个样本；卡滞: 最近一次变化时的值与时间
+        self.ref_value = None
+        self.ref_ts = None
+        self.since = None
+
+    def describe(self, names):
+        if self.message:
+            return self.message.format(name=self.name, value=self.value, limit=self.limit)
+        tag = "/".join(names[i] for i in self.inputs)
+        if self.kind == HIGH:
+            return f"{tag} {self.value:.2f} 超过上限 {self.limit:g}"
+        if self.kind == LOW:
+            return f"{tag} {self.value:.2f} 低于下限 {self.limit:g}"
+        if self.kind == RATE:
+            return f"{tag} 变化率 {self.value:.2f}/s 超过 {self.limit:g}/s"
+        if self.kind == DEVIATION:
+            return f"{tag} 偏差 {self.value:.2f} 超过 {self.limit:g}"
+        return f"{tag} 已 {self.value:.0f} 秒未变化"
+
+
+def _number(definition, keys, default=0.0):
+    for key in keys:
+        if definition.get(key) is not None:
+            return float(definition[key])
+    return default
+
+
+class AlarmEngine:
+    """报警规则引擎
+
+    作为采集引擎的周期处理器在采集线程中运行。规则按输入标签建立索引；
+    每个周期先按字节整体比较标签值与质量数组，没有变化时直接跳过；有变化时把有规则的标签按 BLOCK_TAGS 个一组，
+    用 itemgetter 一次取出一组的值与上周期比较，只在有变化的组内逐个检查，只计算输入发生变化的规则。
+    延时到期、卡滞与变化率回落这类随时间变化的判断放在按到期时间排序的堆中，不需要每周期扫描全部规则。
+
+    上限/下限/变化率/偏差规则在报警后需回到 限值 -/+ 死区 以内才恢复，卡滞规则的死区为视为未变化的幅度；
+    报警条件需持续 on_delay 秒才发生，恢复条件需持续 off_delay 秒才恢复。
+    报警状态由界面线程通过 active_alarms()/events_since() 读取。
+    """
+
+    def __init__(self, registry, definitions=()):
+        """
+        Args:
+            registry: TagRegistry
+            definitions: 报警规则定义 [{"名称", "类型", "标签", "限值", "死区", "延时", "恢复延时", "持续时间", "消息"}, ...]，
+                         偏差规则的 "标签" 为标签名称列表；定义错误的规则记入 errors 并忽略
+        """
+        self.registry = registry
+        self.rules = []
+        self.errors = {}
+        self._blocks = None
+        # 标签索引 -> 以该标签为输入的规则
+        self.by_tag = {}
+        for d in definitions:
+            try:
+                self.add_rule(d)
+            except AlarmError as e:
+                self.errors[d.get("名称", d.get("name", "?"))] = str(e)
+        self.events = deque(maxlen=EVENT_LOG_SIZE)
+        # 每次报警发生或恢复时加一，界面据此判断是否需要推送
+        self.version = 0
+        # 报警发生或恢复时在采集线程中调用 on_event(event)
+        self.on_event = None
+        self.evaluations = 0
+        self._timers = []
+        self._timer_seq = itertools.count()
+        self._prev_now = None
+        self._lock = threading.Lock()
+        self._prev_values = registry.values.tobytes()
+        self._prev_quality = registry.quality[:]
+        self._build_blocks()
+
+    def add_rule(self, definition):
+        """添加一条规则(需在采集开始之前调用)"""
+        d = definition
+        name = d.get("名称", d.get("name"))
+        if not name:
+            raise AlarmError("报警规则缺少名称")
+        kind = RULE_TYPES.get(d.get("类型", d.get("type")))
+        if kind is None:
+            raise AlarmError(f"未知的报警类型: {d.get('类型', d.get('type'))}")
+        tags = d.get("标签", d.get("tags", d.get("tag")))
+        if isinstance(tags, str):
+            tags = [tags]
+        if not tags:
+            raise AlarmError("报警规则缺少标签")
+        inputs = []
+        for tag in tags:
+            index = self.registry.index_of(tag)
+            if index < 0:
+                raise AlarmError(f"未知的标签: {tag}")
+            inputs.append(index)
+        if kind == DEVIATION and len(inputs) < 2:
+            raise AlarmError("偏差规则至少需要两个标签")
+        if kind != DEVIATION and len(inputs) != 1:
+            raise AlarmError("该类型的规则只能有一个标签")
+        try:
+            rule = AlarmRule(
+                name, kind, tuple(inputs),
+                limit=_number(d, ("限值", "limit")),
+                deadband=abs(_number(d, ("死区", "deadband"))),
+                on_delay=_number(d, ("延时", "on_delay")),
+                off_delay=_number(d, ("恢复延时", "off_delay")),
+                duration=_number(d, ("持续时间", "duration"), RATE_WINDOW if kind == RATE else 0.0),
+                message=d.get("消息", d.get("message", "")),
+            )
+        except (TypeError, ValueError) as e:
+            raise AlarmError(f"报警规则参数错误: {e}") from e
+        if kind == STUCK and rule.duration <= 0:
+            raise AlarmError("卡滞规则需要大于0的持续时间")
+        if kind == RATE:
+            # 变化率按上一周期的值计算，注册后每次变化都会更新
+            rule.ref_value = self.registry.values[inputs[0]]
+            rule.ref_ts = 0.0
+        self.rules.append(rule)
+        for index in inputs:
+            self.by_tag.setdefault(index, []).append(rule)
+        if self._blocks is not None:
+            self._build_blocks()
+        return rule
+
+    def _build_blocks(self):
+        """有规则的标签分组: [[组内标签, 取值函数, 上周期的值, 上周期的质量], ...]"""
+        registry = self.registry
+        watched = sorted(self.by_tag)
+        self._blocks = []
+        for start in range(0, len(watched), BLOCK_TAGS):
+            indices = tuple(watched[start:start + BLOCK_TAGS])
+            if len(indices) > 1:
+                getter = itemgetter(*indices)
+            else:
+                getter = lambda seq, i=indices[0]: (seq[i],)
+            self._blocks.append([indices, getter, getter(registry.values), getter(registry.quality)])
+
+    # ---- 计算 ----
+
+    def process(self, registry, now):
+        """采集引擎的周期回调"""
+        values = registry.values
+        quality = registry.quality
+        # 数值数组按字节比较(array 的 == 会逐个元素比较)
+        current = values.tobytes()
+        prev_quality = self._prev_quality
+        affected = None
+        quality_changed = quality != prev_quality
+        if quality_changed or current != self._prev_values:
+            affected = {}
+            by_tag = self.by_tag
+            for block in self._blocks:
+                indices, getter, last_values, last_quality = block
+                current_values = getter(values)
+                if quality_changed:
+                    current_quality = getter(quality)
+                    if current_values == last_values and current_quality == last_quality:
+                        continue
+                    changed = [i for i, v, lv, q, lq in zip(indices, current_values, last_values,
+                                                            current_quality, last_quality)
+                               if v != lv or q != lq]
+                    block[3] = current_quality
+                else:
+                    if current_values == last_values:
+                        continue
+                    changed = [i for i, v, lv in zip(indices, current_values, last_values) if v != lv]
+                block[2] = current_values
+                for i in changed:
+                    for rule in by_tag[i]:
+                        affected[id(rule)] = rule
+            self._prev_values = current
+            prev_quality[:] = quality
+        with self._lock:
+            if affected:
+                for rule in affected.values():
+                    self._evaluate(rule, now, values, quality)
+            timers = self._timers
+            while timers and timers[0][0] <= now:
+                due, _, rule = heapq.heappop(timers)
+                if rule.due == due:
+                    rule.due = None
+                    self._evaluate(rule, now, values, quality)
+        self._prev_now = now
+
+    def _schedule(self, rule, due):
+        # 每条规则只保留最早的一个到期时间，到期计算后会按需要再次安排
+        if rule.due is None or due < rule.due:
+            rule.due = due
+            heapq.heappush(self._timers, (due, next(self._timer_seq), rule))
+
+    def _evaluate(self, rule, now, values, quality):
+        self.evaluations += 1
+        inputs = rule.inputs
+        for i in inputs:
+            if quality[i] != QUALITY_GOOD:
+                # 输入无效时保持报警状态不变，卡滞重新计时
+                rule.ref_ts = None
+                rule.pending = None
+                return
+        kind = rule.kind
+        limit = rule.limit
+        # 已满足报警条件时按死区放宽，避免在限值附近反复报警/恢复
+        band = rule.deadband if rule.condition else 0.0
+        if kind == HIGH:
+            value = values[inputs[0]]
+            condition = value > limit - band
+        elif kind == LOW:
+            value = values[inputs[0]]
+            condition = value < limit + band
+        elif kind == DEVIATION:
+            group = [values[i] for i in inputs]
+            value = max(group) - min(group)
+            condition = value > limit - band
+        elif kind == RATE:
+            # 未变化的周期不计算，上一周期的值就是最近一次变化后的值
+            current = values[inputs[0]]
+            previous = self._prev_now
+            value = 0.0
+            if rule.ref_ts is not None and previous is not None and now > previous:
+                value = abs(current - rule.ref_value) / (now - previous)
+            rule.ref_value = current
+            rule.ref_ts = now
+            condition = value > limit - band
+            if condition:
+                # 输入不再变化时变化率视为0
+                self._schedule(rule, now + rule.duration)
+        else:
+            current = values[inputs[0]]
+            if rule.ref_ts is None or abs(current - rule.ref_value) > rule.deadband:
+                rule.ref_value = current
+                rule.ref_ts = now
+            value = now - rule.ref_ts
+            due = rule.ref_ts + rule.duration
+            condition = now >= due
+            if not condition:
+                self._schedule(rule, due)
+        rule.value = value
+        rule.condition = condition
+        if condition == rule.active:
+            rule.pending = None
+            return
+        if rule.pending is None:
+            rule.pending = now
+        due = rule.pending + (rule.on_delay if condition else rule.off_delay)
+        if now >= due:
+            self._switch(rule, condition, now)
+        else:
+            self._schedule(rule, due)
+
+    def _switch(self, rule, active, now):
+        rule.active = active
+        rule.pending = None
+        rule.since = now if active else None
+        message = rule.describe(self.registry.names)
+        event = AlarmEvent(now, rule.name, active, rule.value, message if active else f"已恢复: {message}")
+        self.events.append(event)
+        self.version += 1
+        if self.on_event is not None:
+            self.on_event(event)
+
+    # ---- 查询 ----
+
+    def active_alarms(self):
+        """当前报警 [(规则名称, 消息, 发生时间), ...]，按发生时间排序"""
+        with self._lock:
+            names = self.registry.names
+            active = [(rule.since, rule.name, rule.describe(names)) for rule in self.rules if rule.active]
+        active.sort()
+        return [(name, message, since) for since, name, message in active]
+
+    def events_since(self, timestamp):
+        """timestamp 之后的报警事件"""
+        with self._lock:
+            return [e for e in self.events if e.timestamp > timestamp]
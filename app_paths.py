@@ -0,0 +1,26 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+程序目录模块
+确定配置文件与运行数据的存放目录，源码运行与打包后的 exe 使用同一套规则
+"""
+
+import os
+import sys
+
+
+def app_dir():
+    """程序目录: 打包后为 exe 所在目录，源码运行时为源码目录
+
+    PyInstaller --onefile 打包后 __file__ 位于每次启动时解包、退出即删除的临时目录，
+    写在那里的数据下次启动就不存在了，因此打包后以 sys.executable 所在目录为准。
+    """
+    if getattr(sys, "frozen", False):
+        return os.path.dirname(os.path.abspath(sys.executable))
+    return os.path.dirname(os.path.abspath(__file__))
+
+
+APP_DIR = app_dir()
+# 历史数据、皮带秤累计等运行数据的根目录
+DATA_DIR = os.path.join(APP_DIR, "data")
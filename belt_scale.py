@@ -0,0 +1,365 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+皮带秤累计模块
+由荷重与皮带速度样本积分计算出土重量，按环、按班与总累计统计，长期运行无浮点累计误差
+"""
+
+import os
+import json
+import math
+import time
+import threading
+from array import array
+from bisect import bisect_left
+
+from app_paths import DATA_DIR
+from tag_registry import QUALITY_GOOD
+
+BELT_SCALE_DIR = os.path.join(DATA_DIR, "belt_scale")
+
+# 皮带秤使用的标签: 荷重(标定前的秤体信号，标定后为 kg/m) 与皮带速度(m/s)
+LOAD_TAG = "皮带秤荷重"
+SPEED_TAG = "皮带速度"
+
+# 每个班次的开始时间(本地时间的小时)
+SHIFT_START_HOURS = (8, 20)
+# 保留最近多少个班次的累计
+KEEP_SHIFTS = 62
+# 保留最近多少环的累计，状态文件不随掘进环数增长
+KEEP_RINGS = 200
+# 攒够该数量的样本或距上一批超过 BATCH_INTERVAL 秒时积分一批
+BATCH_SIZE = 200
+BATCH_INTERVAL = 1.0
+# 相邻样本间隔超过该值(秒)视为采集中断，该段不计入
+MAX_GAP_S = 5.0
+# 累计状态的保存间隔(秒)
+SAVE_INTERVAL = 60.0
+
+
+class CompensatedSum:
+    """Neumaier 补偿求和
+
+    长期累加很多小增量时，普通浮点加法每次舍入的误差会逐渐累积；
+    这里把每次丢失的低位保存在 compensation 中，结果与精确求和的误差不随累加次数增长。
+    """
+
+    __slots__ = ("total", "compensation")
+
+    def __init__(self, total=0.0, compensation=0.0):
+        self.total = total
+        self.compensation = compensation
+
+    def add(self, value):
+        total = self.total + value
+        if abs(self.total) >= abs(value):
+            self.compensation += (self.total - total) + value
+        else:
+            self.compensation += (value - total) + self.total
+        self.total = total
+
+    @property
+    def value(self):
+        return self.total + self.compensation
+
+    def to_json(self):
+        return [self.total, self.compensation]
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(float(data[0]), float(data[1]))
+
+
+def shift_bounds(timestamp, start_hours=SHIFT_START_HOURS):
+    """时间戳所在班次的 (开始, 结束) 时间戳，班次按本地时间划分"""
+    local = time.localtime(timestamp)
+    starts = []
+    # 前一天、当天与后一天的各班次开始时间，夏令时切换时由 mktime 自动调整
+    for day in (-1, 0, 1):
+        for hour in start_hours:
+            starts.append(time.mktime((local.tm_year, local.tm_mon, local.tm_mday + day,
+                                       hour, 0, 0, 0, 0, -1)))
+    starts.sort()
+    i = bisect_left(starts, timestamp + 1e-6) - 1
+    return starts[i], starts[i + 1]
+
+
+class BeltScaleTotalizer:
+    """皮带秤累计器
+
+    瞬时流量(kg/s) = 标定后的荷重(kg/m) × 皮带速度(m/s)，标定后的荷重 = (信号 - 零点) × 量程系数。
+    样本按数据时间以梯形法积分，间隔超过 max_gap 的一段不计入。
+
+    样本先攒成一批再积分: 一批内的增量用 math.fsum 精确求和，批与批之间的总累计、班累计、环累计
+    用 CompensatedSum 累加，连续运行数周的总累计也不会因舍入产生漂移。
+    作为采集引擎的周期处理器时在采集线程中运行，高频采样(50~200 Hz)的设备缓冲区也可直接调用
+    add_batch() 成批写入，都不占用界面线程。累计与标定保存在 BELT_SCALE_DIR/<name>.json，重启后继续累计。
+    """
+
+    def __init__(self, name, registry=None, rings=None, path=None, max_gap=MAX_GAP_S,
+                 shift_hours=SHIFT_START_HOURS):
+        """
+        Args:
+            name: 累计器名称(项目 name_en)，用作状态文件名
+            registry: 可选的 TagRegistry，作为周期处理器时从中读取荷重与速度标签
+            rings: 可选的 RingAggregator，按其当前环号统计环累计
+            path: 状态文件路径，默认 BELT_SCALE_DIR/<name>.json
+            max_gap: 计入累计的最大样本间隔(秒)
+            shift_hours: 各班次开始的小时
+        """
+        self.name = name
+        self.rings = rings
+        self.path = path or os.path.join(BELT_SCALE_DIR, f"{name}.json")
+        self.max_gap = max_gap
+        self.shift_hours = tuple(sorted(shift_hours))
+        self.load_index = self.speed_index = None
+        if registry is not None and LOAD_TAG in registry and SPEED_TAG in registry:
+            self.load_index = registry.index_of(LOAD_TAG)
+            self.speed_index = registry.index_of(SPEED_TAG)
+        self.zero = 0.0
+        self.span = 1.0
+        self.cumulative = CompensatedSum()
+        self.shifts = {}
+        self.ring_totals = {}
+        self.flow_tph = 0.0
+        self.samples = 0
+        self._lock = threading.Lock()
+        # 上一批的最后一个样本 (时间, 流量kg/s)，与下一批的第一个样本组成一段
+        self._last = None
+        self._shift_start = self._shift_end = None
+        self._pending_ts = array("d")
+        self._pending_load = array("d")
+        self._pending_speed = array("d")
+        # 攒下的样本所属的环，换环时先积分上一环的样本
+        self._pending_ring = None
+        self._last_saved = time.monotonic()
+        self._dirty = False
+        self._load()
+
+    # ---- 状态文件 ----
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            self.zero = float(state.get("zero", 0.0))
+            self.span = float(state.get("span", 1.0))
+            self.cumulative = CompensatedSum.from_json(state.get("cumulative", [0.0, 0.0]))
+            self.shifts = {float(k): CompensatedSum.from_json(v) for k, v in state.get("shifts", {}).items()}
+            self.ring_totals = {int(k): CompensatedSum.from_json(v) for k, v in state.get("rings", {}).items()}
+            self._trim_rings()
+        except (OSError, ValueError, TypeError, IndexError) as e:
+            print(f"Error loading belt scale state {self.path}: {e}")
+
+    def _save_locked(self):
+        state = {
+            "zero": self.zero,
+            "span": self.span,
+            "cumulative": self.cumulative.to_json(),
+            "shifts": {repr(k): v.to_json() for k, v in self.shifts.items()},
+            "rings": {str(k): v.to_json() for k, v in self.ring_totals.items()},
+        }
+        tmp = f"{self.path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"Error saving belt scale state {self.path}: {e}")
+            return
+        self._dirty = False
+        self._last_saved = time.monotonic()
+
+    def save(self):
+        """立即保存累计与标定"""
+        with self._lock:
+            self._save_locked()
+
+    def close(self):
+        """积分尚未处理的样本并保存"""
+        self.flush()
+        with self._lock:
+            if self._dirty:
+                self._save_locked()
+
+    # ---- 标定 ----
+
+    def set_calibration(self, zero=None, span=None):
+        """设置零点与量程系数，之后的样本按新标定计算"""
+        with self._lock:
+            if zero is not None:
+                self.zero = float(zero)
+            if span is not None:
+                self.span = float(span)
+            self._save_locked()
+
+    def calibrate_zero(self, loads):
+        """空皮带运行时的荷重信号样本求平均作为零点"""
+        if not len(loads):
+            raise ValueError("零点标定需要至少一个样本")
+        zero = math.fsum(loads) / len(loads)
+        self.set_calibration(zero=zero)
+        return zero
+
+    def calibrate_span(self, loads, reference):
+        """挂码或实物标定: 荷重信号样本与已知荷重 reference(kg/m) 求量程系数"""
+        if not len(loads):
+            raise ValueError("量程标定需要至少一个样本")
+        signal = math.fsum(loads) / len(loads) - self.zero
+        if abs(signal) < 1e-9:
+            raise ValueError("标定信号与零点相同，无法计算量程系数")
+        span = float(reference) / signal
+        self.set_calibration(span=span)
+        return span
+
+    # ---- 积分 ----
+
+    def process(self, registry, now):
+        """采集引擎的周期回调，荷重与速度都有效时记一个样本，攒够一批后积分"""
+        load_index = self.load_index
+        speed_index = self.speed_index
+        if load_index is None:
+            return
+        quality = registry.quality
+        if quality[load_index] != QUALITY_GOOD or quality[speed_index] != QUALITY_GOOD:
+            return
+        timestamps = registry.timestamps
+        timestamp = max(timestamps[load_index], timestamps[speed_index]) or now
+        pending = self._pending_ts
+        if pending and timestamp <= pending[-1]:
+            return
+        ring = self.rings.rings[-1] if self.rings is not None and len(self.rings) else None
+        if pending and ring != self._pending_ring:
+            self.flush()
+            pending = self._pending_ts
+        self._pending_ring = ring
+        pending.append(timestamp)
+        self._pending_load.append(registry.values[load_index])
+        self._pending_speed.append(registry.values[speed_index])
+        if len(pending) >= BATCH_SIZE or timestamp - pending[0] >= BATCH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        """积分 process() 中攒下的样本"""
+        if not self._pending_ts:
+            return
+        timestamps, loads, speeds = self._pending_ts, self._pending_load, self._pending_speed
+        self._pending_ts, self._pending_load, self._pending_speed = array("d"), array("d"), array("d")
+        self.add_batch(timestamps, loads, speeds, self._pending_ring)
+
+    def add_batch(self, timestamps, loads, speeds, ring=None):
+        """积分一批样本
+
+        Args:
+            timestamps: 数据时间(秒)，递增
+            loads: 荷重信号(标定前)
+            speeds: 皮带速度(m/s)
+            ring: 本批计入的环号，默认取 rings 的当前环
+
+        Returns:
+            本批的重量(t)
+        """
+        count = len(timestamps)
+        if not count or len(loads) != count or len(speeds) != count:
+            return 0.0
+        if ring is None and self.rings is not None and len(self.rings):
+            ring = self.rings.rings[-1]
+        with self._lock:
+            zero, span = self.zero, self.span
+            # 瞬时流量(kg/s)，皮带反转或零点以下的信号不计入
+            flows = [max(0.0, (load - zero) * span * speed) for load, speed in zip(loads, speeds)]
+            ts = list(timestamps)
+            if self._last is not None and ts[0] > self._last[0]:
+                ts.insert(0, self._last[0])
+                flows.insert(0, self._last[1])
+            batch = 0.0
+            start = 0
+            while start < len(ts) - 1:
+                if self._shift_end is None or ts[start] >= self._shift_end or ts[start] < self._shift_start:
+                    self._roll_shift(ts[start])
+                # 跨越交班时刻的一段计入上一班
+                stop = min(len(ts) - 1, bisect_left(ts, self._shift_end, start + 1))
+                tonnes = self._integrate(ts, flows, start, stop) / 1000.0
+                if tonnes:
+                    self.cumulative.add(tonnes)
+                    self.shifts[self._shift_start].add(tonnes)
+                    if ring is not None:
+                        ring_total = self.ring_totals.get(ring)
+                        if ring_total is None:
+                            ring_total = self.ring_totals[ring] = CompensatedSum()
+                            self._trim_rings()
+                        ring_total.add(tonnes)
+                    batch += tonnes
+                start = stop
+            self._last = (ts[-1], flows[-1])
+            self.flow_tph = flows[-1] * 3.6
+            self.samples += count
+            self._dirty = True
+            if time.monotonic() - self._last_saved >= SAVE_INTERVAL:
+                self._save_locked()
+        return batch
+
+    def _integrate(self, ts, flows, start, stop):
+        """样本 [start, stop] 之间各段的梯形积分(kg)，用 math.fsum 精确求和"""
+        max_gap = self.max_gap
+        t = ts[start:stop + 1]
+        f = flows[start:stop + 1]
+        return math.fsum(
+            (f0 + f1) * (t1 - t0)
+            for t0, t1, f0, f1 in zip(t, t[1:], f, f[1:])
+            if 0.0 < t1 - t0 <= max_gap
+        ) * 0.5
+
+    def _trim_rings(self):
+        while len(self.ring_totals) > KEEP_RINGS:
+            self.ring_totals.pop(min(self.ring_totals))
+
+    def _roll_shift(self, timestamp):
+        self._shift_start, self._shift_end = shift_bounds(timestamp, self.shift_hours)
+        if self._shift_start not in self.shifts:
+            self.shifts[self._shift_start] = CompensatedSum()
+            while len(self.shifts) > KEEP_SHIFTS:
+                self.shifts.pop(min(self.shifts))
+
+    # ---- 查询 ----
+
+    def totals(self):
+        """当前的累计
+
+        Returns:
+            {"cumulative_t", "shift_t", "shift_start", "ring", "ring_t", "flow_tph"}
+        """
+        with self._lock:
+            shift_start = self._shift_start
+            if shift_start is None:
+                shift_start = shift_bounds(time.time(), self.shift_hours)[0]
+            shift = self.shifts.get(shift_start)
+            ring = max(self.ring_totals) if self.ring_totals else None
+            if self.rings is not None and len(self.rings):
+                ring = self.rings.rings[-1]
+            ring_total = self.ring_totals.get(ring)
+            return {
+                "cumulative_t": self.cumulative.value,
+                "shift_t": shift.value if shift is not None else 0.0,
+                "shift_start": shift_start,
+                "ring": ring,
+                "ring_t": ring_total.value if ring_total is not None else 0.0,
+                "flow_tph": self.flow_tph,
+            }
+
+    def ring_total(self, ring):
+        """指定环的皮带秤重量(t)"""
+        with self._lock:
+            total = self.ring_totals.get(ring)
+            return total.value if total is not None else 0.0
+
+    def shift_totals(self):
+        """最近各班次的重量 [(班次开始时间戳, t), ...]，按时间排序"""
+        with self._lock:
+            return [(start, total.value) for start, total in sorted(self.shifts.items())]
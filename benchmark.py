@@ -0,0 +1,521 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+性能测试脚本
+使用方法：python benchmark.py [项目...]，不指定时运行全部
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+from tag_registry import TagRegistry
+
+
+def _make_registry(count, seed=1):
+    """生成分布在若干DB中的测试标签，地址带有随机空隙"""
+    rnd = random.Random(seed)
+    types = [("float", 4), ("float", 4), ("short", 2), ("dint", 4), ("bool", 1)]
+    registry = TagRegistry()
+    db, offset = 1, 0
+    for i in range(count):
+        dtype, size = rnd.choice(types)
+        if dtype == "bool":
+            address = f"DB{db}.DBX{offset}.{rnd.randrange(8)}"
+        else:
+            address = f"DB{db}.DB{'W' if size == 2 else 'D'}{offset}"
+        registry.add(f"tag{i}", address, dtype)
+        offset += size + rnd.choice((0, 0, 0, 2, 4, 40))
+        if offset > 2000:
+            db, offset = db + 1, 0
+    return registry
+
+
+def bench_plan(count=2000):
+    """读取计划: 每周期请求数量"""
+    from read_planner import plan_reads
+    registry = _make_registry(count)
+    for pdu in (240, 480, 960):
+        started = time.perf_counter()
+        plan = plan_reads(registry, pdu)
+        elapsed = (time.perf_counter() - started) * 1000
+        report = plan.report()
+        print(f"pdu={pdu}: {report['tags']} tags, requests/cycle {report['requests_before']} -> "
+              f"{report['requests_after']} ({report['blocks']} blocks, {report['bytes_per_cycle']} bytes), "
+              f"planned in {elapsed:.1f} ms")
+
+
+def bench_decode(count=5000, rounds=200):
+    """块解码: 每秒解码标签数"""
+    from read_planner import plan_reads
+    from block_decoder import BlockDecoder, BYTE_ORDERS
+    registry = _make_registry(count)
+    plan = plan_reads(registry, 960)
+    buffers = [bytes(random.getrandbits(8) for _ in range(b.size)) for b in plan.blocks]
+    for order in BYTE_ORDERS:
+        decoder = BlockDecoder(plan, registry, order)
+        started = time.perf_counter()
+        for _ in range(rounds):
+            for index, buf in enumerate(buffers):
+                decoder.decode(index, buf, 0.0)
+        elapsed = time.perf_counter() - started
+        print(f"{order}: {count * rounds / elapsed:,.0f} tags/s ({elapsed / rounds * 1000:.2f} ms per {count} tags)")
+
+
+def _render_pyecharts(labels, values, stroke):
+    """旧的每次刷新流程: 构建 pyecharts 图表对象并渲染完整HTML，再用正则提取 body"""
+    import re
+    from pyecharts.charts import Bar, Line
+    from pyecharts import options as opts
+    from pyecharts.globals import ThemeType
+    bar = (
+        Bar(init_opts=opts.InitOpts(width="100%", height="360px", theme=ThemeType.LIGHT))
+        .add_xaxis(labels)
+        .add_yaxis("出土量(t)", values, category_gap="40%", yaxis_index=0,
+                   itemstyle_opts=opts.ItemStyleOpts(color="#1890ff"))
+        .extend_axis(yaxis=opts.AxisOpts(
+            name="推进行程(mm)", type_="value", min_=0, max_=250, position="right",
+            axisline_opts=opts.AxisLineOpts(linestyle_opts=opts.LineStyleOpts(color="#d14a61")),
+            axislabel_opts=opts.LabelOpts(formatter="{value} mm")))
+        .set_global_opts(
+            tooltip_opts=opts.TooltipOpts(trigger="axis", axis_pointer_type="cross"),
+            legend_opts=opts.LegendOpts(is_show=True),
+            xaxis_opts=opts.AxisOpts(name="环号", name_location="center", name_gap=30,
+                                     axislabel_opts=opts.LabelOpts(font_size=12)),
+            yaxis_opts=opts.AxisOpts(name="出土量(t)", name_location="end", name_gap=15,
+                                     axisline_opts=opts.AxisLineOpts(
+                                         linestyle_opts=opts.LineStyleOpts(color="#1890ff")))))
+    line = (
+        Line().add_xaxis(labels)
+        .add_yaxis("推进行程(mm)", stroke, yaxis_index=1, label_opts=opts.LabelOpts(is_show=False),
+                   itemstyle_opts=opts.ItemStyleOpts(color="#d14a61"),
+                   linestyle_opts=opts.LineStyleOpts(width=2)))
+    bar.overlap(line)
+    m = re.search(r"<body[^>]*>([\s\S]*?)</body>", bar.render_embed())
+    return m.group(1) if m else ""
+
+
+def bench_chart(rounds=200):
+    """环号图表: 每次刷新的CPU耗时(pyecharts渲染 vs 缓存配置+数据更新)"""
+    import json
+    labels = [str(i) for i in range(1, 21)]
+    values = [random.randint(80, 150) for _ in range(20)]
+    stroke = [random.randint(100, 200) for _ in range(20)]
+
+    started = time.process_time()
+    for _ in range(rounds):
+        json.dumps({
+            "xAxis": [{"data": labels}],
+            "series": [{"data": values}, {"data": stroke}]
+        }, ensure_ascii=False)
+    cached = (time.process_time() - started) / rounds * 1000
+    print(f"cached option + setOption payload: {cached:.4f} ms/tick")
+
+    try:
+        import pyecharts  # noqa: F401
+    except ImportError:
+        print("pyecharts not installed, skipping render_embed baseline")
+        return
+    started = time.process_time()
+    for _ in range(rounds // 10 or 1):
+        _render_pyecharts(labels, values, stroke)
+    rendered = (time.process_time() - started) / (rounds // 10 or 1) * 1000
+    print(f"pyecharts render_embed + regex: {rendered:.3f} ms/tick ({rendered / cached:.0f}x)")
+
+
+def bench_history(tags=1000, rows=1000):
+    """历史存储: 每秒写入点数(含预写日志与fsync)"""
+    import shutil
+    import tempfile
+    from array import array
+    from history_store import HistoryStore
+    root = tempfile.mkdtemp(prefix="plc-history-")
+    try:
+        store = HistoryStore("bench", [f"tag{i}" for i in range(tags)], root=root)
+        values = array("d", [random.random() for _ in range(tags)])
+        quality = array("B", [1]) * tags
+        started = time.perf_counter()
+        for row in range(rows):
+            store.append(float(row), values, quality)
+            if row % 100 == 99:
+                store.flush()
+        store.close()
+        elapsed = time.perf_counter() - started
+        print(f"{tags} tags x {rows} rows: {tags * rows / elapsed:,.0f} points/s ({elapsed:.2f} s)")
+        started = time.perf_counter()
+        store = HistoryStore("bench", [f"tag{i}" for i in range(tags)], root=root)
+        timestamps, _, _ = store.query("tag500", 100.0, 900.0)
+        store.close()
+        print(f"query {len(timestamps)} points of one tag in {(time.perf_counter() - started) * 1000:.1f} ms")
+        # 同一目录下的两个项目使用相同的标签名称，查询不能读到另一个项目的数据
+        for project, first, value in (("projA", 100.0, 1.0), ("projB", 50.0, 2.0)):
+            store = HistoryStore(project, ["t"], root=root)
+            for row in range(5):
+                store.append(first + row, array("d", [value]), array("B", [1]))
+            store.close()
+        store = HistoryStore("projA", ["t"], root=root)
+        timestamps, values, _ = store.query("t")
+        store.close()
+        if list(timestamps) != [100.0, 101.0, 102.0, 103.0, 104.0] or set(values) != {1.0}:
+            raise AssertionError(f"projA query returned other project's rows: {list(timestamps)}")
+        print("two projects in one root: queries stay within their project")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def bench_export(tags=200, rows=100000):
+    """历史导出: 分块流式导出 CSV / gzip CSV 的速度与内存峰值"""
+    import shutil
+    import tempfile
+    import tracemalloc
+    from array import array
+    from history_store import HistoryStore
+    from history_export import export_history
+    root = tempfile.mkdtemp(prefix="plc-export-")
+    try:
+        store = HistoryStore("bench", [f"tag{i}" for i in range(tags)], root=root)
+        quality = array("B", [1]) * tags
+        for row in range(rows):
+            store.append(row * 0.1, array("d", [random.random() * 100 for _ in range(tags)]), quality)
+            if row % 1000 == 999:
+                store.flush()
+        store.close()
+        for fmt in ("csv", "csv.gz"):
+            path = os.path.join(root, "export." + fmt)
+            started = time.perf_counter()
+            export_history("bench", path, fmt, root=root)
+            elapsed = time.perf_counter() - started
+            size = os.path.getsize(path) / 1048576
+            print(f"{fmt}: {rows} rows x {tags} tags in {elapsed:.2f} s "
+                  f"({tags * rows / elapsed:,.0f} values/s, {size:.1f} MB)")
+        # 内存统计会明显拖慢导出，单独运行一次
+        tracemalloc.start()
+        export_history("bench", os.path.join(root, "memory.csv"), "csv", root=root)
+        peak = tracemalloc.get_traced_memory()[1] / 1048576
+        tracemalloc.stop()
+        print(f"csv peak Python memory {peak:.1f} MB")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def bench_import(count=1000):
+    """项目导入: ZIP 中上千个项目文件的批量校验与一次写入"""
+    import json
+    import shutil
+    import zipfile
+    import tempfile
+    from project_store import ProjectStore, DEFAULT_PLC_SETTINGS
+    from project_import import import_projects, STATUS_OK
+    root = tempfile.mkdtemp(prefix="plc-import-")
+    try:
+        archive_path = os.path.join(root, "projects.zip")
+        with zipfile.ZipFile(archive_path, "w") as archive:
+            for n in range(count):
+                project = {"name_cn": f"项目{n}", "name_en": f"project_{n}", "is_active": False,
+                           "plc_settings": dict(DEFAULT_PLC_SETTINGS)}
+                archive.writestr(f"projects/{n}.json", json.dumps(project, ensure_ascii=False))
+        store = ProjectStore(os.path.join(root, "project.json"))
+        started = time.perf_counter()
+        report = import_projects([archive_path], store)
+        elapsed = time.perf_counter() - started
+        store.close()
+        imported = sum(1 for item in report if item["status"] == STATUS_OK)
+        print(f"{imported}/{count} projects imported and saved in {elapsed * 1000:.1f} ms")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def bench_downsample(count=1000000, points=2000):
+    """降采样: 百万点序列压缩到图表点数的耗时"""
+    import math
+    from array import array
+    from downsample import downsample_indices, METHODS
+    xs = array("d", range(count))
+    ys = array("d", (math.sin(i / 5000.0) + random.random() * 0.1 for i in range(count)))
+    for method in METHODS:
+        started = time.perf_counter()
+        kept = downsample_indices(xs, ys, points, method)
+        elapsed = (time.perf_counter() - started) * 1000
+        print(f"{method}: {count} -> {len(kept)} points in {elapsed:.0f} ms")
+
+
+def bench_ring(rings=1000, samples_per_ring=1800):
+    """按环统计: 每样本增量计算耗时与按环窗口取图表数据的耗时"""
+    from ring_aggregator import RingAggregator
+    from tag_registry import TagRegistry
+    registry = TagRegistry.from_definitions([
+        {"名称": "推进行程", "数据地址": "DB1.DBD0", "数据类型": "float"},
+        {"名称": "瞬时出土量", "数据地址": "DB1.DBD4", "数据类型": "float"},
+        {"名称": "环号", "数据地址": "DB1.DBW10", "数据类型": "short"},
+    ])
+    aggregator = RingAggregator(registry)
+    add = aggregator.add_sample
+    stroke_step = 1800.0 / samples_per_ring
+    t = 0.0
+    started = time.perf_counter()
+    for ring in range(1, rings + 1):
+        for i in range(samples_per_ring):
+            add(t, 80.0 + random.random() * 40.0, i * stroke_step, ring)
+            t += 1.0
+    elapsed = time.perf_counter() - started
+    count = rings * samples_per_ring
+    print(f"samples: {count} in {elapsed * 1000:.0f} ms ({elapsed * 1e6 / count:.2f} us/sample), rings {len(aggregator)}")
+    started = time.perf_counter()
+    for _ in range(1000):
+        aggregator.window(20)
+    print(f"window(20): {(time.perf_counter() - started) * 1000:.3f} us")
+    started = time.perf_counter()
+    for _ in range(100):
+        aggregator.between(1, rings)
+    print(f"between(all {rings} rings): {(time.perf_counter() - started) * 10:.3f} ms")
+
+
+def bench_belt(hours=24, rate=200, batch=200):
+    """皮带秤累计: 高频样本的积分速度与长时间累计误差"""
+    import tempfile
+    from belt_scale import BeltScaleTotalizer
+    with tempfile.TemporaryDirectory() as tmp:
+        totalizer = BeltScaleTotalizer("bench", path=os.path.join(tmp, "bench.json"))
+        count = hours * 3600 * rate
+        loads = [100.0] * batch
+        speeds = [2.0] * batch
+        naive = 0.0
+        step = 100.0 * 2.0 / rate / 1000.0
+        started = time.perf_counter()
+        for k in range(0, count, batch):
+            totalizer.add_batch([(k + i) / rate for i in range(batch)], loads, speeds)
+        elapsed = time.perf_counter() - started
+        for _ in range(count - 1):
+            naive += step
+        expected = 100.0 * 2.0 * (count - 1) / rate / 1000.0
+        print(f"{count} samples in {elapsed:.1f} s ({count / elapsed / 1e6:.2f} M samples/s)")
+        print(f"total {totalizer.cumulative.value:.6f} t, expected {expected:.6f} t, "
+              f"error {totalizer.cumulative.value - expected:.3e} t (naive per-sample sum {naive - expected:.3e} t)")
+
+
+def bench_alarm(tags=5000, rules=500, changed=250, rounds=500):
+    """报警规则: 5000个标签时每个采集周期的报警计算耗时"""
+    from alarm_engine import AlarmEngine
+    from tag_registry import TagRegistry
+    registry = TagRegistry.from_definitions(
+        [(f"T{i}", f"DB2.DBD{i * 4}", "float", "") for i in range(tags)])
+    for i in range(tags):
+        registry.set_value(i, 0.0, 0.0)
+    kinds = ("上限", "下限", "变化率", "卡滞", "偏差")
+    definitions = []
+    for n in range(rules):
+        kind = kinds[n % len(kinds)]
+        tag = random.randrange(tags - 4)
+        definitions.append({
+            "名称": f"R{n}", "类型": kind,
+            "标签": [f"T{tag + k}" for k in range(4)] if kind == "偏差" else f"T{tag}",
+            "限值": {"上限": 90, "下限": 10, "变化率": 500, "卡滞": 0, "偏差": 80}[kind],
+            "死区": 2, "延时": 1, "恢复延时": 1, "持续时间": 30,
+        })
+    engine = AlarmEngine(registry, definitions)
+    now = 0.0
+    engine.process(registry, now)
+    for label, count in (("unchanged", 0), (f"{changed} changed", changed)):
+        samples = []
+        for _ in range(rounds):
+            now += 0.1
+            for i in random.sample(range(tags), count):
+                registry.values[i] = random.random() * 100
+            started = time.perf_counter()
+            engine.process(registry, now)
+            samples.append((time.perf_counter() - started) * 1e6)
+        samples.sort()
+        print(f"{label}: avg {sum(samples) / len(samples):.1f} us, "
+              f"P95 {samples[int(len(samples) * 0.95)]:.1f} us, max {samples[-1]:.1f} us")
+    print(f"rules {len(engine.rules)}, evaluations {engine.evaluations}, active {len(engine.active_alarms())}")
+
+
+def bench_sqlite(tags=1000, rows=200000):
+    """SQLite数据源: 每秒读取并写入注册表的行数"""
+    import os
+    import sqlite3
+    import asyncio
+    import tempfile
+    from sqlite_source import SqliteSource
+    registry = _make_registry(tags)
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    try:
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE plc_values (tag TEXT, value REAL, ts REAL)")
+        conn.commit()
+        source = SqliteSource({"address": path, "timeout": 10000}, registry)
+
+        async def run():
+            await source.connect()
+            conn.executemany("INSERT INTO plc_values VALUES (?, ?, ?)",
+                             ((f"tag{i % tags}", random.random(), 1.7e9 + i) for i in range(rows)))
+            conn.commit()
+            started = time.perf_counter()
+            fetched = await source.fetch()
+            source.apply(fetched, time.time())
+            elapsed = time.perf_counter() - started
+            await source.close()
+            print(f"{len(fetched)} rows in {elapsed * 1000:.0f} ms: {len(fetched) / elapsed:,.0f} rows/s")
+
+        asyncio.run(run())
+        conn.close()
+    finally:
+        os.remove(path)
+
+
+def bench_mysql(tags=1000, rows=100000):
+    """MySQL数据源: 对本地MySQL/MariaDB实例的增量读取速度
+
+    连接参数取自环境变量 PLC_MYSQL_HOST/PLC_MYSQL_PORT/PLC_MYSQL_USER/PLC_MYSQL_PASSWORD/
+    PLC_MYSQL_DATABASE，未设置 PLC_MYSQL_HOST 时跳过。会创建并删除表 plc_values_bench。
+    """
+    import os
+    import asyncio
+    from mysql_source import MySQLSource
+    host = os.environ.get("PLC_MYSQL_HOST")
+    if not host:
+        print("PLC_MYSQL_HOST not set, skipping")
+        return
+    settings = {
+        "address": host,
+        "port": int(os.environ.get("PLC_MYSQL_PORT", 3306)),
+        "username": os.environ.get("PLC_MYSQL_USER", "root"),
+        "password": os.environ.get("PLC_MYSQL_PASSWORD", ""),
+        "database": os.environ.get("PLC_MYSQL_DATABASE", "plc"),
+        "table": "plc_values_bench",
+        "timeout": 30000,
+    }
+    registry = _make_registry(tags)
+    source = MySQLSource(settings, registry)
+
+    async def run():
+        await source.connect()
+        conn = source._pool.acquire(source.timeout)
+        cursor = conn.conn.cursor()
+        cursor.execute("DROP TABLE IF EXISTS plc_values_bench")
+        cursor.execute("CREATE TABLE plc_values_bench (id BIGINT AUTO_INCREMENT PRIMARY KEY, "
+                       "tag VARCHAR(64), value DOUBLE, ts DOUBLE)")
+        cursor.executemany("INSERT INTO plc_values_bench (tag, value, ts) VALUES (%s, %s, %s)",
+                           [(f"tag{i % tags}", random.random(), 1.7e9 + i) for i in range(rows)])
+        source._pool.release(conn)
+        started = time.perf_counter()
+        fetched = await source.fetch()
+        source.apply(fetched, time.time())
+        elapsed = time.perf_counter() - started
+        print(f"{len(fetched)} rows in {elapsed * 1000:.0f} ms: {len(fetched) / elapsed:,.0f} rows/s, "
+              f"{source._pool.created} connection(s)")
+        conn = source._pool.acquire(source.timeout)
+        conn.conn.cursor().execute("DROP TABLE plc_values_bench")
+        source._pool.release(conn)
+        await source.close()
+
+    asyncio.run(run())
+
+
+def _run_app(env, timeout):
+    """以子进程运行 main.py，返回标准输出，失败时输出错误并返回 None"""
+    import os
+    import subprocess
+    main_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+    try:
+        result = subprocess.run([sys.executable, main_path], env=dict(os.environ, **env),
+                                capture_output=True, text=True, encoding="utf-8", errors="replace",
+                                timeout=timeout)
+    except subprocess.TimeoutExpired:
+        print("timed out")
+        return None
+    if result.returncode != 0:
+        print(f"exit code {result.returncode}")
+        print(result.stderr.strip()[-500:])
+    return result.stdout
+
+
+def _report_fields(output, tag):
+    """解析 main.py 输出的 "TAG key=value ..." 统计行"""
+    for line in (output or "").splitlines():
+        if line.startswith(tag + " "):
+            return {k: float(v) for k, v in (item.split("=", 1) for item in line.split()[1:])}
+    return None
+
+
+def _median(samples, key):
+    values = sorted(s[key] for s in samples)
+    return values[len(values) // 2]
+
+
+def bench_startup(settle_ms=5000, runs=3):
+    """冷启动: 页面延迟创建与启动时全部创建的启动耗时和内存
+
+    以子进程运行 main.py，分别统计主页创建完成时与再等待 settle_ms 毫秒(期间空闲预创建其他页面)后
+    的内存，"含渲染进程"为本进程与 QtWebEngine 子进程的合计。需要图形环境。
+    """
+    for label, eager in (("启动时全部创建", "1"), ("延迟创建", "0")):
+        env = {"PLC_EXIT_AFTER_START": str(settle_ms), "PLC_EAGER_PAGES": eager}
+        samples = []
+        for _ in range(runs):
+            fields = _report_fields(_run_app(env, settle_ms / 1000.0 + 60), "STARTUP")
+            if fields is None:
+                print(f"{label}: no startup report")
+                break
+            samples.append(fields)
+        if samples:
+            print(f"{label}: 冷启动 {_median(samples, 'cold_start_ms'):.0f} ms, "
+                  f"启动时内存 {_median(samples, 'rss_mb'):.1f} MB ({samples[0]['pages']:.0f} 个页面), "
+                  f"{settle_ms} ms 后内存 {_median(samples, 'settled_rss_mb'):.1f} MB, "
+                  f"含渲染进程 {_median(samples, 'tree_mb'):.1f} MB "
+                  f"({samples[0]['settled_pages']:.0f} 个页面), 中位数/{len(samples)} 次")
+
+
+def bench_tabs(rounds=25, settle_ms=3000):
+    """页面切换: 单 WebView 外壳中切换页面的耗时与全部页面打开后的内存
+
+    启动 main.py 并等待 settle_ms 毫秒后依次切换四个页面 rounds 轮，切换耗时为从点击到页面端绘制完成。
+    需要图形环境。
+    """
+    env = {"PLC_EXIT_AFTER_START": str(settle_ms), "PLC_TAB_ROUNDS": str(rounds)}
+    output = _run_app(env, settle_ms / 1000.0 + rounds * 10 + 60)
+    fields = _report_fields(output, "TABS")
+    if fields is None:
+        print("no tab switch report")
+        return
+    print(f"{fields['switches']:.0f} 次切换(丢失 {fields['lost']:.0f}): 平均 {fields['avg_ms']:.1f} ms, "
+          f"P95 {fields['p95_ms']:.1f} ms, 最大 {fields['max_ms']:.1f} ms; "
+          f"全部页面打开后内存(含渲染进程) {fields['tree_mb']:.1f} MB")
+
+
+BENCHMARKS = {
+    "plan": bench_plan,
+    "decode": bench_decode,
+    "chart": bench_chart,
+    "history": bench_history,
+    "export": bench_export,
+    "import": bench_import,
+    "downsample": bench_downsample,
+    "ring": bench_ring,
+    "belt": bench_belt,
+    "alarm": bench_alarm,
+    "sqlite": bench_sqlite,
+    "mysql": bench_mysql,
+    "startup": bench_startup,
+    "tabs": bench_tabs,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PLC监控系统性能测试")
+    parser.add_argument("names", nargs="*", help="要运行的测试项目: " + ", ".join(BENCHMARKS))
+    args = parser.parse_args()
+    for name in args.names:
+        if name not in BENCHMARKS:
+            parser.error(f"未知的测试项目: {name}")
+    for name in args.names or BENCHMARKS:
+        print(f"== {name}: {BENCHMARKS[name].__doc__.splitlines()[0]}")
+        BENCHMARKS[name]()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
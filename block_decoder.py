@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+数据块解码模块
+按读取计划对整块原始数据批量解码，支持 ABCD/CDAB/BADC/DCBA 字节顺序
+"""
+
+import struct
+from array import array
+from itertools import repeat
+from operator import and_, or_, lshift, rshift, itemgetter
+
+from tag_registry import (TYPE_BOOL, TYPE_BYTE, TYPE_SHORT, TYPE_WORD, TYPE_DINT, TYPE_DWORD,
+                          TYPE_FLOAT, TYPE_LREAL, TYPE_STRING, QUALITY_GOOD)
+
+BYTE_ORDERS = ("ABCD", "CDAB", "BADC", "DCBA")
+
+# 字节顺序 -> (16位字内是否交换字节, 字的排列是否颠倒)
+_ORDER_LAYOUT = {
+    "ABCD": (False, False),
+    "CDAB": (False, True),
+    "BADC": (True, False),
+    "DCBA": (True, True),
+}
+
+# 类型 -> (struct格式字符, 字节数, 重新解释用的 array 类型(整型, 目标))
+_TYPE_LAYOUT = {
+    TYPE_SHORT: ("h", 2, None),
+    TYPE_WORD: ("H", 2, None),
+    TYPE_DINT: ("i", 4, ("I", "i")),
+    TYPE_DWORD: ("I", 4, ("I", "I")),
+    TYPE_FLOAT: ("f", 4, ("I", "f")),
+    TYPE_LREAL: ("d", 8, ("Q", "d")),
+}
+
+
+class _Kernel:
+    """同一块内同类型、互不重叠的一组标签，一次 unpack_from 完成解码"""
+
+    __slots__ = ("tags", "unpack", "words", "convert", "bits", "gather")
+
+    def __init__(self):
+        self.tags = array("I")
+        self.unpack = None
+        self.words = 0
+        self.convert = None
+        self.bits = None
+        self.gather = None
+
+
+class BlockDecoder:
+    """数据块解码器
+
+    根据读取计划为每个块预先编译解码内核：数值类型按字节顺序生成一个覆盖全部标签的
+    struct 格式，单字节与位类型用 itemgetter 批量取字节，解码时直接在 memoryview 上进行，
+    不复制数据、不为每个标签创建中间对象，结果原地写入标签注册表的原始值数组。
+    """
+
+    def __init__(self, plan, registry, byte_order="ABCD"):
+        byte_order = (byte_order or "ABCD").upper()
+        if byte_order not in _ORDER_LAYOUT:
+            raise ValueError(f"不支持的字节顺序: {byte_order}")
+        self.registry = registry
+        self.byte_order = byte_order
+        self.kernels = [self._compile(block) for block in plan.blocks]
+
+    def _compile(self, block):
+        registry = self.registry
+        swap_bytes, reverse_words = _ORDER_LAYOUT[self.byte_order]
+        groups = {}
+        strings = []
+        for j, offset in zip(block.tags, block.offsets):
+            code = registry.dtype[j]
+            if code == TYPE_STRING:
+                strings.append((j, offset, registry.size[j]))
+            else:
+                groups.setdefault(code, []).append((offset, j))
+
+        kernels = []
+        for code, members in groups.items():
+            members.sort()
+            if code in (TYPE_BOOL, TYPE_BYTE):
+                kernels.append(self._compile_bytes(code, members))
+                continue
+            # 同一位置可能被多个标签引用，按不重叠原则分层，每层一个 struct
+            fmt, size, convert = _TYPE_LAYOUT[code]
+            layers = []
+            for offset, j in members:
+                for layer in layers:
+                    if layer[-1][0] + size <= offset:
+                        layer.append((offset, j))
+                        break
+                else:
+                    layers.append([(offset, j)])
+            for layer in layers:
+                kernels.append(self._compile_struct(layer, fmt, size, convert, swap_bytes, reverse_words))
+        return kernels, strings
+
+    def _compile_bytes(self, code, members):
+        kernel = _Kernel()
+        offsets = [offset for offset, _ in members]
+        kernel.tags = array("I", [j for _, j in members])
+        getter = itemgetter(*offsets)
+        kernel.gather = getter if len(offsets) > 1 else (lambda buf: (getter(buf),))
+        if code == TYPE_BOOL:
+            kernel.bits = array("B", [self.registry.bit[j] for _, j in members])
+        return kernel
+
+    def _compile_struct(self, layer, fmt, size, convert, swap_bytes, reverse_words):
+        kernel = _Kernel()
+        kernel.tags = array("I", [j for _, j in layer])
+        if size == 2 or (swap_bytes == reverse_words):
+            # ABCD/DCBA 及16位类型可直接按大/小端解码
+            field = fmt
+            prefix = "<" if swap_bytes else ">"
+        else:
+            # CDAB/BADC: 按16位字解码后再组合
+            kernel.words = size // 2
+            kernel.convert = convert
+            field = "H" * kernel.words
+            prefix = "<" if swap_bytes else ">"
+        parts = []
+        position = 0
+        for offset, _ in layer:
+            if offset > position:
+                parts.append(f"{offset - position}x")
+            parts.append(field)
+            position = offset + size
+        kernel.unpack = struct.Struct(prefix + "".join(parts)).unpack_from
+        if kernel.words:
+            kernel.words = -kernel.words if reverse_words else kernel.words
+        return kernel
+
+    def decode(self, block_index, buffer, timestamp):
+        """解码一个块并写入注册表
+
+        Args:
+            block_index: 读取计划中的块索引
+            buffer: 块原始数据(bytes/bytearray/memoryview)
+            timestamp: 数据时间戳
+        """
+        registry = self.registry
+        raw = registry.raw
+        timestamps = registry.timestamps
+        quality = registry.quality
+        view = memoryview(buffer)
+        kernels, strings = self.kernels[block_index]
+        for kernel in kernels:
+            if kernel.gather is not None:
+                decoded = kernel.gather(view)
+                if kernel.bits is not None:
+                    decoded = map(and_, map(rshift, decoded, kernel.bits), repeat(1))
+            else:
+                decoded = kernel.unpack(view)
+                if kernel.words:
+                    decoded = _combine_words(decoded, kernel.words, kernel.convert)
+            for j, v in zip(kernel.tags, decoded):
+                raw[j] = v
+                timestamps[j] = timestamp
+                quality[j] = QUALITY_GOOD
+        for j, offset, size in strings:
+            data = view[offset:offset + size]
+            length = min(data[1], size - 2) if size > 2 else 0
+            registry.set_value(j, bytes(data[2:2 + length]).decode("latin-1"), timestamp)
+
+
+def _combine_words(raw, words, convert):
+    """将按16位字拆开的数值重新组合并按目标类型重新解释"""
+    count = abs(words)
+    parts = [raw[i::count] for i in range(count)]
+    if words < 0:
+        parts.reverse()
+    combined = parts[0]
+    for part in parts[1:]:
+        combined = map(or_, map(lshift, combined, repeat(16)), part)
+    int_code, target = convert
+    ints = array(int_code, combined)
+    if target == int_code:
+        return ints
+    out = array(target)
+    out.frombytes(ints.tobytes())
+    return out
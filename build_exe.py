@@ -11,6 +11,7 @@ import os
 import sys
 import shutil
 import PyInstaller.__main__
+from web_scheme import check_assets
 
 def clean_build_folders():
     """清理旧的构建文件夹"""
@@ -22,6 +23,10 @@ def clean_build_folders():
     if os.path.exists(spec_file):
         os.remove(spec_file)
 
+def ensure_echarts_asset():
+    """检查仓库中的 ECharts 运行库(ui/assets/echarts.min.js)，缺失或被修改时停止打包"""
+    check_assets(os.path.join('ui', 'assets'))
+
 def copy_ui_files():
     """复制UI文件到dist目录"""
     ui_folder = os.path.join('dist', 'ui')
@@ -35,11 +40,17 @@ def copy_ui_files():
             src_file = os.path.join(src_ui_folder, file)
             dst_file = os.path.join(ui_folder, file)
             shutil.copy2(src_file, dst_file)
+    
+    # 复制本地静态资源
+    src_assets = os.path.join(src_ui_folder, 'assets')
+    if os.path.exists(src_assets):
+        shutil.copytree(src_assets, os.path.join(ui_folder, 'assets'), dirs_exist_ok=True)
 
 def build_exe():
     """使用PyInstaller打包应用程序为Windows exe文件"""
     # 清理旧的构建文件
     clean_build_folders()
+    ensure_echarts_asset()
     
     # PyInstaller参数 - 针对Windows exe
     pyinstaller_args = [
@@ -52,10 +63,10 @@ def build_exe():
         '--hidden-import=PyQt5.QtCore',
         '--hidden-import=PyQt5.QtWidgets',
         '--hidden-import=PyQt5.QtWebEngineWidgets',
-        '--hidden-import=pyecharts',
-        '--hidden-import=pyecharts.charts',
-        '--hidden-import=pyecharts.options',
-        '--hidden-import=pyecharts.globals',
+        '--hidden-import=PyQt5.QtWebEngineCore',
+        '--hidden-import=PyQt5.QtWebChannel',
+        '--hidden-import=mysql.connector.plugins.mysql_native_password',
+        '--hidden-import=mysql.connector.plugins.caching_sha2_password',
         '--distpath=dist',  # 指定输出目录
         '--workpath=build',  # 指定工作目录
         '--clean',  # 清理临时文件
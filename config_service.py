@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+配置服务模块
+监视 setting.json 与 project.json，配置变化时向订阅者推送带类型的变更信号
+"""
+
+import os
+import json
+
+from PyQt5.QtCore import QObject, QTimer, QFileSystemWatcher, pyqtSignal
+
+from app_paths import APP_DIR
+from project_store import PROJECTS_PATH, get_store
+from plc_link import load_enabled_projects
+
+SETTINGS_PATH = os.path.join(APP_DIR, "setting.json")
+
+DEFAULT_SETTINGS = {
+    "theme": "浅色",
+    "refresh_interval": 5,
+    "auto_save_logs": True,
+    "enable_notifications": True,
+    # 空闲时预创建尚未打开的页面
+    "prewarm_pages": True
+}
+
+# 界面刷新间隔下限(毫秒)
+MIN_REFRESH_MS = 100
+# 文件变化后合并处理的等待时间(毫秒)，编辑器保存一次可能触发多次通知
+DEBOUNCE_MS = 50
+
+
+def load_settings_file(path=SETTINGS_PATH):
+    """读取 setting.json，缺省项用默认值补齐"""
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return {**DEFAULT_SETTINGS, **json.load(f)}
+        except Exception as e:
+            print(f"Error loading settings: {e}")
+    return dict(DEFAULT_SETTINGS)
+
+
+class ConfigService(QObject):
+    """配置服务
+
+    启动时读取一次配置并缓存，之后只在 QFileSystemWatcher 报告文件变化或本进程保存设置时重新读取，
+    定时器、采集引擎与页面订阅信号即可，不需要在刷新周期内读取配置。
+    project.json 的内容由 ProjectStore 管理，本服务把其变化转换为各项目的PLC设置变更信号。
+
+    信号:
+        settingsChanged(dict): 应用设置(setting.json)变化，参数为完整设置
+        refreshIntervalChanged(int): 界面刷新间隔变化(毫秒)
+        plcSettingsChanged(str, dict): 项目 name_en 的PLC设置变化，参数为补齐默认值后的设置
+        plcRemoved(str): 项目 name_en 被停用或删除
+        projectsChanged(): 项目列表变化
+    """
+
+    settingsChanged = pyqtSignal(dict)
+    refreshIntervalChanged = pyqtSignal(int)
+    plcSettingsChanged = pyqtSignal(str, dict)
+    plcRemoved = pyqtSignal(str)
+    projectsChanged = pyqtSignal()
+
+    def __init__(self, settings_path=SETTINGS_PATH, projects_path=PROJECTS_PATH, parent=None):
+        super().__init__(parent)
+        self.settings_path = settings_path
+        self.projects_path = projects_path
+        self._settings = load_settings_file(settings_path)
+        self._plc = {name: settings for name, settings, _ in load_enabled_projects()}
+        # 环境变量 PLC_REFRESH_MS 优先于 setting.json 中的刷新间隔
+        self._refresh_override = self._env_refresh_ms()
+        self._pending = set()
+        self._debounce = QTimer(self)
+        self._debounce.setSingleShot(True)
+        self._debounce.timeout.connect(self._process_pending)
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.fileChanged.connect(self._on_file_changed)
+        self.watcher.directoryChanged.connect(self._on_directory_changed)
+        self._watch()
+        get_store().add_listener(self._on_projects_changed)
+
+    @staticmethod
+    def _env_refresh_ms():
+        value = os.environ.get("PLC_REFRESH_MS")
+        try:
+            return max(MIN_REFRESH_MS, int(value)) if value else None
+        except ValueError:
+            return None
+
+    def _watch(self):
+        """监视配置文件及其目录
+
+        文件被原子替换(写临时文件后改名)后原来的监视会失效，目录变化时重新加入。
+        """
+        paths = [p for p in (self.settings_path, self.projects_path) if os.path.exists(p)]
+        watched = set(self.watcher.files() or [])
+        missing = [p for p in paths if p not in watched]
+        if missing:
+            self.watcher.addPaths(missing)
+        dirs = {os.path.dirname(p) for p in (self.settings_path, self.projects_path)}
+        watched_dirs = set(self.watcher.directories() or [])
+        missing_dirs = [d for d in dirs if d not in watched_dirs]
+        if missing_dirs:
+            self.watcher.addPaths(missing_dirs)
+
+    def _on_file_changed(self, path):
+        self._pending.add(os.path.abspath(path))
+        self._debounce.start(DEBOUNCE_MS)
+
+    def _on_directory_changed(self, _path):
+        watched = set(self.watcher.files() or [])
+        for path in (self.settings_path, self.projects_path):
+            if path not in watched and os.path.exists(path):
+                self._pending.add(path)
+        self._watch()
+        if self._pending:
+            self._debounce.start(DEBOUNCE_MS)
+
+    def _process_pending(self):
+        pending, self._pending = self._pending, set()
+        self._watch()
+        if os.path.abspath(self.settings_path) in pending:
+            self._apply_settings(load_settings_file(self.settings_path))
+        if os.path.abspath(self.projects_path) in pending:
+            # ProjectStore 发现文件被外部修改后重新加载，并回调 _on_projects_changed
+            get_store().projects()
+
+    # ---- 应用设置 ----
+
+    def settings(self):
+        """当前应用设置(副本)"""
+        return dict(self._settings)
+
+    def refresh_interval_ms(self):
+        """界面刷新间隔(毫秒)，setting.json 中的 refresh_interval 单位为秒"""
+        if self._refresh_override is not None:
+            return self._refresh_override
+        try:
+            seconds = float(self._settings.get("refresh_interval", DEFAULT_SETTINGS["refresh_interval"]))
+        except (TypeError, ValueError):
+            seconds = DEFAULT_SETTINGS["refresh_interval"]
+        return max(MIN_REFRESH_MS, int(seconds * 1000))
+
+    def save_settings(self, settings):
+        """保存应用设置并立即通知订阅者"""
+        settings = {**self._settings, **settings}
+        tmp = f"{self.settings_path}.tmp"
+        try:
+            # 先写临时文件并 fsync 再原子替换，写入过程中断电也不会留下空的 setting.json
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(settings, f, indent=4, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.settings_path)
+        except OSError as e:
+            print(f"Error saving settings: {e}")
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return False
+        self._apply_settings(settings)
+        return True
+
+    def _apply_settings(self, settings):
+        if settings == self._settings:
+            return
+        old_interval = self.refresh_interval_ms()
+        self._settings = settings
+        self.settingsChanged.emit(dict(settings))
+        interval = self.refresh_interval_ms()
+        if interval != old_interval:
+            self.refreshIntervalChanged.emit(interval)
+
+    # ---- 项目设置 ----
+
+    def plc_settings(self, name):
+        """项目的PLC设置(补齐默认值)，未启用的项目返回 None"""
+        settings = self._plc.get(name)
+        return dict(settings) if settings is not None else None
+
+    def _on_projects_changed(self, _source):
+        plc = {name: settings for name, settings, _ in load_enabled_projects()}
+        for name, settings in plc.items():
+            if self._plc.get(name) != settings:
+                self.plcSettingsChanged.emit(name, dict(settings))
+        for name in self._plc:
+            if name not in plc:
+                self.plcRemoved.emit(name)
+        self._plc = plc
+        self.projectsChanged.emit()
+
+
+_service = None
+
+
+def get_config():
+    """进程内共享的 ConfigService，需在创建 QApplication 之后调用"""
+    global _service
+    if _service is None:
+        _service = ConfigService()
+    return _service
@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+数据表数据源模块
+网关把PLC数据写入数据库表时，按水位线增量读取新行并写入标签注册表
+"""
+
+import re
+import asyncio
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from tag_registry import TYPE_STRING, QUALITY_GOOD, QUALITY_BAD
+
+# 数据表默认结构: 每行一个标签值
+DEFAULT_TABLE = "plc_values"
+DEFAULT_TAG_COLUMN = "tag"
+DEFAULT_VALUE_COLUMN = "value"
+DEFAULT_TIME_COLUMN = "ts"
+# 单次查询的最大行数，以及一次轮询最多连续查询的批数
+DEFAULT_BATCH_SIZE = 50000
+MAX_BATCHES_PER_POLL = 20
+# 首次连接时回读的最近行数，用于尽快得到各标签的当前值
+BACKLOG_ROWS = 10000
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+class SourceError(Exception):
+    """数据源连接或读取异常"""
+
+
+def _identifier(value, default):
+    value = str(value or default).strip()
+    if not _IDENTIFIER.match(value):
+        raise SourceError(f"无效的表名或列名: {value}")
+    return value
+
+
+def to_epoch(value, default):
+    """把数据库中的时间值转换为秒级时间戳
+
+    支持秒/毫秒数值、datetime 对象与 ISO 格式字符串，无法识别时返回 default
+    """
+    if value is None:
+        return default
+    if isinstance(value, (int, float)):
+        return value / 1000.0 if value > 1e11 else float(value)
+    if isinstance(value, datetime):
+        return value.timestamp()
+    try:
+        return to_epoch(float(value), default)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return default
+
+
+class TableSource:
+    """数据表数据源基类
+
+    表中每行为 (水位线, 标签, 值, 时间)，标签列可以是标签名称或数据地址。
+    每次轮询用同一条预编译的范围查询 "水位线 > ? ORDER BY 水位线 LIMIT ?" 取回全部新行，
+    按水位线索引顺序扫描，不会重复读取旧数据。数据库调用在专用工作线程中执行，
+    不阻塞采集事件循环，每次调用受 timeout 约束。
+
+    子类实现 _connect_blocking/_query/_close_blocking/_abandon，并设置 placeholder 与 errors。
+    """
+
+    placeholder = "?"
+    default_watermark = "rowid"
+    errors = ()
+    workers = 1
+
+    def __init__(self, settings, registry):
+        """
+        Args:
+            settings: project.json 中的 plc_settings，可额外指定 table/tag_column/value_column/
+                      time_column/watermark_column/batch_size
+            registry: TagRegistry 标签注册表
+        """
+        self.settings = dict(settings)
+        self.registry = registry
+        self.address = settings.get("address", "")
+        self.timeout = max(0.1, int(settings.get("timeout", 10000)) / 1000.0)
+        self.table = _identifier(settings.get("table"), DEFAULT_TABLE)
+        self.watermark_column = _identifier(settings.get("watermark_column"), self.default_watermark)
+        self.tag_column = _identifier(settings.get("tag_column"), DEFAULT_TAG_COLUMN)
+        self.value_column = _identifier(settings.get("value_column"), DEFAULT_VALUE_COLUMN)
+        time_column = settings.get("time_column", DEFAULT_TIME_COLUMN)
+        self.time_column = _identifier(time_column, DEFAULT_TIME_COLUMN) if time_column else None
+        self.batch_size = max(1, int(settings.get("batch_size", DEFAULT_BATCH_SIZE)))
+        self.watermark = None
+        self.rows_read = 0
+        self.unknown_tags = set()
+        self._pending = []
+        self._executor = None
+        self._connected = False
+
+        # 标签列的取值可能是名称也可能是地址，两者都映射到注册表索引
+        keys = {}
+        for index, address in enumerate(registry.addresses):
+            keys.setdefault(address, index)
+        for index, name in enumerate(registry.names):
+            keys[name] = index
+        self._keys = keys
+
+        ph = self.placeholder
+        columns = ", ".join((self.watermark_column, self.tag_column, self.value_column,
+                             self.time_column or "NULL"))
+        self._tail_sql = (f"SELECT {columns} FROM {self.table} WHERE {self.watermark_column} > {ph} "
+                          f"ORDER BY {self.watermark_column} LIMIT {ph}")
+        self._backlog_sql = (f"SELECT {columns} FROM {self.table} "
+                             f"ORDER BY {self.watermark_column} DESC LIMIT {ph}")
+
+    @property
+    def connected(self):
+        return self._connected
+
+    async def _call(self, func, *args):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                thread_name_prefix=type(self).__name__)
+        loop = asyncio.get_running_loop()
+        try:
+            return await asyncio.wait_for(loop.run_in_executor(self._executor, func, *args), self.timeout)
+        except asyncio.TimeoutError:
+            self._connected = False
+            raise SourceError(f"{self.describe()} 操作超时")
+        except self.errors as e:
+            self._connected = False
+            raise SourceError(f"{self.describe()}: {e}") from e
+
+    def describe(self):
+        return f"{type(self).__name__}({self.address})"
+
+    async def connect(self):
+        """建立连接；首次连接时回读最近 BACKLOG_ROWS 行作为各标签的初始值"""
+        await self._call(self._open)
+        self._connected = True
+
+    def _open(self):
+        self._connect_blocking()
+        if self.watermark is None:
+            rows = self._query(self._backlog_sql, (BACKLOG_ROWS,))
+            rows.reverse()
+            self._pending = rows
+            self.watermark = rows[-1][0] if rows else 0
+            self.rows_read += len(rows)
+
+    async def close(self):
+        """关闭连接并结束工作线程"""
+        self._connected = False
+        if self._executor is None:
+            return
+        try:
+            await self._call(self._close_blocking)
+        except SourceError as e:
+            print(f"Error closing {self.describe()}: {e}")
+            # 工作线程仍阻塞在查询中，连接留给该线程，重新连接时在新的工作线程中创建
+            self._abandon()
+        self._executor.shutdown(wait=False)
+        self._executor = None
+
+    async def ping(self):
+        """心跳查询"""
+        await self._call(self._query, "SELECT 1", ())
+
+    async def fetch(self):
+        """取回水位线之后的全部新行"""
+        return await self._call(self._fetch)
+
+    def _fetch(self):
+        rows, self._pending = self._pending, []
+        for _ in range(MAX_BATCHES_PER_POLL):
+            batch = self._query(self._tail_sql, (self.watermark, self.batch_size))
+            if not batch:
+                break
+            rows.extend(batch)
+            self.watermark = batch[-1][0]
+            self.rows_read += len(batch)
+            if len(batch) < self.batch_size:
+                break
+        return rows
+
+    def apply(self, rows, now):
+        """把查询结果写入注册表的原始值，同一标签以最后一行为准"""
+        registry = self.registry
+        keys = self._keys
+        raw = registry.raw
+        timestamps = registry.timestamps
+        quality = registry.quality
+        dtype = registry.dtype
+        for _, key, value, ts in rows:
+            index = keys.get(key)
+            if index is None and isinstance(key, (bytes, bytearray)):
+                key = key.decode("utf-8")
+                index = keys.get(key)
+            if index is None:
+                if key not in self.unknown_tags:
+                    self.unknown_tags.add(key)
+                    print(f"{self.describe()}: 未登记的标签 {key}")
+                continue
+            ts = to_epoch(ts, now)
+            if value is None:
+                quality[index] = QUALITY_BAD
+                timestamps[index] = ts
+            elif dtype[index] == TYPE_STRING:
+                registry.set_value(index, str(value), ts)
+            else:
+                try:
+                    raw[index] = float(value)
+                except (TypeError, ValueError):
+                    quality[index] = QUALITY_BAD
+                    continue
+                timestamps[index] = ts
+                quality[index] = QUALITY_GOOD
+
+    def _connect_blocking(self):
+        raise NotImplementedError
+
+    def _query(self, sql, params):
+        raise NotImplementedError
+
+    def _close_blocking(self):
+        raise NotImplementedError
+
+    def _abandon(self):
+        """关闭超时后丢弃连接(不调用其方法，原工作线程可能仍在使用)"""
+        raise NotImplementedError
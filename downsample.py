@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+降采样模块
+历史数据查询时把序列压缩到图表可流畅绘制的点数，保留曲线形状与极值
+"""
+
+from array import array
+
+from tag_registry import QUALITY_GOOD
+
+# 图表单个系列的默认最大点数
+MAX_CHART_POINTS = 2000
+# LTTB 之前先用极值包络预压缩，输入超过目标点数的该倍数时启用
+PREREDUCE_FACTOR = 8
+
+METHODS = ("lttb", "minmax")
+
+
+def min_max_indices(ys, buckets):
+    """极值包络: 把序列均分为 buckets 段，每段保留最小值与最大值的位置
+
+    首尾两点总是保留，返回按位置排序的索引列表，长度不超过 2 * buckets + 2。
+    """
+    n = len(ys)
+    if n <= 2 * buckets + 2 or buckets <= 0:
+        return list(range(n))
+    indices = [0]
+    step = (n - 2) / buckets
+    for b in range(buckets):
+        start = 1 + int(b * step)
+        stop = 1 + int((b + 1) * step)
+        if stop <= start:
+            continue
+        # 内置 min/max 在切片上以C速度执行
+        segment = ys[start:stop]
+        lo = segment.index(min(segment)) + start
+        hi = segment.index(max(segment)) + start
+        if lo == hi:
+            indices.append(lo)
+        elif lo < hi:
+            indices.extend((lo, hi))
+        else:
+            indices.extend((hi, lo))
+    indices.append(n - 1)
+    return indices
+
+
+def lttb_indices(xs, ys, threshold):
+    """Largest-Triangle-Three-Buckets 降采样，返回保留点的索引列表
+
+    Args:
+        xs, ys: 横坐标(单调递增)与纵坐标序列
+        threshold: 目标点数(>= 3)
+    """
+    n = len(ys)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+    indices = [0]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # 下一个桶的平均点作为三角形的第三个顶点
+        next_start = int((i + 1) * every) + 1
+        next_stop = min(int((i + 2) * every) + 1, n)
+        span = next_stop - next_start
+        avg_x = sum(xs[next_start:next_stop]) / span
+        avg_y = sum(ys[next_start:next_stop]) / span
+
+        start = int(i * every) + 1
+        stop = int((i + 1) * every) + 1
+        ax, ay = xs[a], ys[a]
+        dx, dy = ax - avg_x, avg_y - ay
+        best = start
+        best_area = -1.0
+        for j in range(start, stop):
+            # 三角形面积的2倍，省略常数因子
+            area = abs(dx * (ys[j] - ay) + dy * (xs[j] - ax))
+            if area > best_area:
+                best_area = area
+                best = j
+        indices.append(best)
+        a = best
+    indices.append(n - 1)
+    return indices
+
+
+def downsample_indices(xs, ys, max_points=MAX_CHART_POINTS, method="lttb"):
+    """按指定方法选出最多 max_points 个点的索引
+
+    lttb 在数据远多于目标点数时先做极值包络预压缩，既保证速度又不丢失尖峰。
+    """
+    if method not in METHODS:
+        raise ValueError(f"不支持的降采样方法: {method}")
+    n = len(ys)
+    if n <= max_points:
+        return list(range(n))
+    if method == "minmax":
+        return min_max_indices(ys, max(1, (max_points - 2) // 2))
+    if n > max_points * PREREDUCE_FACTOR:
+        kept = min_max_indices(ys, max_points * PREREDUCE_FACTOR // 2)
+        sub_x = array("d", [xs[i] for i in kept])
+        sub_y = array("d", [ys[i] for i in kept])
+        return [kept[i] for i in lttb_indices(sub_x, sub_y, max_points)]
+    return lttb_indices(xs, ys, max_points)
+
+
+def query_series(store, name, start=None, end=None, max_points=MAX_CHART_POINTS, method="lttb"):
+    """从历史存储查询一个标签并降采样为图表数据
+
+    质量为坏的点被丢弃。
+
+    Args:
+        store: HistoryStore
+        name: 标签名称
+        start, end: 时间范围(秒)，None 表示不限
+        max_points: 最多返回的点数
+        method: "lttb" 或 "minmax"
+
+    Returns:
+        [[时间戳(毫秒), 值], ...]，可直接作为 ECharts time 轴系列的 data
+    """
+    timestamps, values, quality = store.query(name, start, end)
+    if quality.count(QUALITY_GOOD) != len(quality):
+        good = [i for i, q in enumerate(quality) if q == QUALITY_GOOD]
+        timestamps = array("d", [timestamps[i] for i in good])
+        values = array("d", [values[i] for i in good])
+    return [
+        [int(timestamps[i] * 1000), round(values[i], 3)]
+        for i in downsample_indices(timestamps, values, max_points, method)
+    ]
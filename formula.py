@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+计算公式模块
+将标签的计算公式解析为受限语法树并编译为函数，每个采集周期按依赖顺序增量计算工程值
+"""
+
+import ast
+import math
+from array import array
+from operator import itemgetter
+
+from tag_registry import QUALITY_BAD, QUALITY_GOOD
+
+# 公式中可使用的函数
+# 取整函数的结果也转为浮点，与整数常量一样避免超大整数幂运算长时间占用采集线程
+FUNCTIONS = {
+    "abs": abs,
+    "min": min,
+    "max": max,
+    "round": lambda x, n=0: float(round(x, int(n))),
+    "int": lambda x: float(math.trunc(x)),
+    "float": float,
+    "sqrt": math.sqrt,
+    "floor": lambda x: float(math.floor(x)),
+    "ceil": lambda x: float(math.ceil(x)),
+    "exp": math.exp,
+    "log": math.log,
+    "log10": math.log10,
+    "sin": math.sin,
+    "cos": math.cos,
+    "tan": math.tan,
+    "pi": math.pi,
+}
+
+# 公式中的保留变量: raw 为标签原始值，input/offset 为"公式输入值"
+RESERVED_NAMES = ("raw", "input", "offset")
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.BoolOp, ast.Compare, ast.IfExp, ast.Call,
+    ast.Name, ast.Load, ast.Constant,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow,
+    ast.UAdd, ast.USub, ast.Not, ast.And, ast.Or,
+    ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE,
+)
+
+NO_FORMULA = ("", "none")
+
+
+class FormulaError(Exception):
+    """公式解析或计算异常"""
+
+
+def is_formula(text):
+    return str(text or "").strip().lower() not in NO_FORMULA
+
+
+class _Rewriter(ast.NodeTransformer):
+    """把标签引用改写为编译函数的参数，并收集依赖"""
+
+    def __init__(self, registry, self_index):
+        self.registry = registry
+        self.self_index = self_index
+        self.deps = []
+        self._params = {}
+
+    def _param(self, index):
+        if index not in self._params:
+            self._params[index] = f"_v{len(self.deps)}"
+            self.deps.append(index)
+        return self._params[index]
+
+    def visit_Name(self, node):
+        if node.id in RESERVED_NAMES or node.id in FUNCTIONS:
+            return node
+        index = self.registry.index_of(node.id)
+        if index < 0:
+            raise FormulaError(f"未知的标签: {node.id}")
+        if index == self.self_index:
+            return ast.copy_location(ast.Name(id="raw", ctx=ast.Load()), node)
+        return ast.copy_location(ast.Name(id=self._param(index), ctx=ast.Load()), node)
+
+    def visit_Constant(self, node):
+        # 整数常量转为浮点，避免超大整数幂运算长时间占用采集线程
+        if isinstance(node.value, int) and not isinstance(node.value, bool):
+            return ast.copy_location(ast.Constant(value=float(node.value)), node)
+        return node
+
+    def visit_Call(self, node):
+        # tag("名称") 用于引用名称不是合法标识符的标签
+        if isinstance(node.func, ast.Name) and node.func.id == "tag":
+            if len(node.args) != 1 or node.keywords or not isinstance(node.args[0], ast.Constant) \
+                    or not isinstance(node.args[0].value, str):
+                raise FormulaError("tag() 只接受一个字符串常量")
+            return self.visit_Name(ast.copy_location(ast.Name(id=node.args[0].value, ctx=ast.Load()), node))
+        if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS or node.keywords:
+            raise FormulaError(f"不允许调用: {ast.unparse(node.func)}")
+        self.generic_visit(node)
+        return node
+
+
+def compile_formula(text, registry, index):
+    """将公式编译为函数
+
+    Returns:
+        (func, deps): func(raw, input, offset, *依赖标签的值)，deps 为依赖标签索引列表
+    """
+    try:
+        tree = ast.parse(str(text).strip(), mode="eval")
+    except SyntaxError as e:
+        raise FormulaError(f"公式语法错误: {e.msg}") from e
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise FormulaError(f"公式中不允许使用 {type(node).__name__}")
+        if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float, str)):
+            raise FormulaError(f"公式中不允许使用常量 {node.value!r}")
+    rewriter = _Rewriter(registry, index)
+    tree = ast.fix_missing_locations(rewriter.visit(tree))
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            raise FormulaError("公式中不允许使用字符串")
+    params = ", ".join(list(RESERVED_NAMES) + [f"_v{i}" for i in range(len(rewriter.deps))])
+    source = f"lambda {params}: {ast.unparse(tree)}"
+    func = eval(compile(source, f"<formula:{registry.names[index]}>", "eval"),
+                {"__builtins__": {}, **FUNCTIONS})
+    return func, rewriter.deps
+
+
+class FormulaEngine:
+    """公式计算引擎
+
+    公式在创建时解析并编译一次，按依赖关系拓扑排序。每个周期先把原始值整体复制为工程值，
+    再按顺序只重算输入发生变化的公式，其余公式沿用上次结果；单个公式出错只影响该标签。
+    """
+
+    def __init__(self, registry):
+        self.registry = registry
+        self.errors = {}
+        self._cache = array("d", bytes(8 * len(registry)))
+        self._formulas = []
+        compiled = {}
+        for index, text in enumerate(registry.formulas):
+            if not is_formula(text):
+                continue
+            try:
+                compiled[index] = compile_formula(text, registry, index)
+            except FormulaError as e:
+                self.errors[index] = str(e)
+        for index in self._topological_order(compiled):
+            func, deps = compiled[index]
+            # 自身取原始值，依赖取已计算的工程值(拓扑序保证依赖先于本公式计算)
+            inputs = itemgetter(index, *deps) if deps else (lambda a, i=index: (a[i],))
+            self._formulas.append([index, func, inputs, None])
+
+    def _topological_order(self, compiled):
+        order = []
+        state = {}
+
+        def visit(index, path):
+            if state.get(index) == 2:
+                return True
+            if state.get(index) == 1:
+                for i in path[path.index(index):]:
+                    self.errors[i] = "公式存在循环引用"
+                return False
+            state[index] = 1
+            ok = True
+            for dep in compiled[index][1]:
+                if dep in self.errors:
+                    ok = False
+                elif dep in compiled and not visit(dep, path + [dep]):
+                    ok = False
+            state[index] = 2
+            if ok and index not in self.errors:
+                order.append(index)
+            elif index not in self.errors:
+                self.errors[index] = "依赖的公式无效"
+            return ok and index not in self.errors
+
+        for index in compiled:
+            visit(index, [index])
+        return order
+
+    @property
+    def count(self):
+        return len(self._formulas)
+
+    def evaluate(self):
+        """计算全部工程值，返回本次实际重算的公式数量"""
+        registry = self.registry
+        raw = registry.raw
+        values = registry.values
+        quality = registry.quality
+        formula_inputs = registry.formula_inputs
+        cache = self._cache
+        values[:] = raw
+        computed = 0
+        for entry in self._formulas:
+            index, func, inputs, previous = entry
+            current = inputs(values)
+            states = inputs(quality)
+            if any(q != QUALITY_GOOD for q in states):
+                quality[index] = QUALITY_BAD
+                entry[3] = None
+                continue
+            k = formula_inputs[index]
+            key = (current, k)
+            if key == previous:
+                values[index] = cache[index]
+                continue
+            computed += 1
+            try:
+                result = float(func(current[0], k, k, *current[1:]))
+            except Exception as e:
+                self.errors[index] = f"{type(e).__name__}: {e}"
+                quality[index] = QUALITY_BAD
+                entry[3] = None
+                continue
+            entry[3] = key
+            self.errors.pop(index, None)
+            cache[index] = result
+            values[index] = result
+        for index in self.errors:
+            quality[index] = QUALITY_BAD
+        return computed
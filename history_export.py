@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+历史数据导出模块
+从历史数据段文件分块流式导出为 CSV、gzip 压缩的 CSV 或 Parquet，内存占用与导出时长无关
+"""
+
+import os
+import csv
+import gzip
+import time
+import threading
+
+from history_store import HISTORY_DIR, count_rows, history_names, iter_chunks
+from tag_registry import QUALITY_BAD
+
+try:
+    import pyarrow
+    import pyarrow.parquet as pyarrow_parquet
+except ImportError:  # 未安装 pyarrow 时仅在选择 Parquet 格式后报错
+    pyarrow = None
+    pyarrow_parquet = None
+
+# 支持的格式: 格式名 -> 文件扩展名
+FORMATS = {
+    "csv": ".csv",
+    "csv.gz": ".csv.gz",
+    "parquet": ".parquet",
+}
+TIME_COLUMN = "时间"
+# 采集值来自PLC的32位浮点数，9位有效数字可以无损还原
+FLOAT_FORMAT = "%.9g"
+# 采集值文本的压缩率在各压缩级别之间相差不到一成，最低级别的速度约为默认级别的4倍
+GZIP_LEVEL = 1
+# 每块的值个数(行数 x 标签数)，导出的内存占用由此决定，与导出时长和标签数无关
+CHUNK_VALUES = 200000
+
+
+class ExportError(Exception):
+    """导出异常"""
+
+
+class ExportCancelled(ExportError):
+    """导出被取消"""
+
+
+def format_for_path(path):
+    """按文件扩展名判断导出格式，无法识别时返回 None"""
+    lower = path.lower()
+    # 先匹配较长的扩展名，.csv.gz 不能识别为 .gz
+    for fmt, suffix in sorted(FORMATS.items(), key=lambda item: -len(item[1])):
+        if lower.endswith(suffix):
+            return fmt
+    return None
+
+
+class _TimeFormatter:
+    """本地时间格式化，同一秒内的样本复用日期时间部分"""
+
+    def __init__(self):
+        self._second = None
+        self._prefix = ""
+
+    def __call__(self, timestamp):
+        second, ms = divmod(round(timestamp * 1000), 1000)
+        if second != self._second:
+            self._second = second
+            self._prefix = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(second))
+        return f"{self._prefix}.{ms:03d}"
+
+
+def _csv_column(values, quality):
+    """一列的文本，质量为 BAD 或该时间段没有该标签时为空"""
+    if values is None:
+        return None
+    return [FLOAT_FORMAT % v if q != QUALITY_BAD else "" for v, q in zip(values, quality)]
+
+
+def _write_csv(f, names, chunks, on_chunk):
+    writer = csv.writer(f, lineterminator="\n")
+    writer.writerow([TIME_COLUMN] + list(names))
+    format_time = _TimeFormatter()
+    for timestamps, values, quality in chunks:
+        rows = len(timestamps)
+        empty = [""] * rows
+        columns = [_csv_column(v, q) or empty for v, q in zip(values, quality)]
+        times = [format_time(t) for t in timestamps]
+        # 值都是数字，不需要转义，整块拼接后一次写入
+        f.write("\n".join(map(",".join, zip(times, *columns))))
+        f.write("\n")
+        on_chunk(rows)
+
+
+def _write_parquet(path, names, chunks, on_chunk):
+    if pyarrow is None:
+        raise ExportError("导出 Parquet 需要安装 pyarrow")
+    fields = [pyarrow.field(TIME_COLUMN, pyarrow.timestamp("ms"))]
+    fields += [pyarrow.field(name, pyarrow.float64()) for name in names]
+    schema = pyarrow.schema(fields)
+    # 每块写为一个行组，写入后即可释放
+    with pyarrow_parquet.ParquetWriter(path, schema, compression="snappy") as writer:
+        for timestamps, values, quality in chunks:
+            rows = len(timestamps)
+            arrays = [pyarrow.array([round(t * 1000) for t in timestamps], pyarrow.int64())
+                      .cast(pyarrow.timestamp("ms"))]
+            for column, column_quality in zip(values, quality):
+                if column is None:
+                    arrays.append(pyarrow.nulls(rows, pyarrow.float64()))
+                else:
+                    arrays.append(pyarrow.array(
+                        [v if q != QUALITY_BAD else None for v, q in zip(column, column_quality)],
+                        pyarrow.float64()))
+            writer.write_table(pyarrow.Table.from_arrays(arrays, schema=schema))
+            on_chunk(rows)
+
+
+def export_history(group, path, fmt=None, names=None, start=None, end=None,
+                   chunk_rows=None, progress=None, cancelled=None, root=HISTORY_DIR):
+    """把标签组 [start, end] 内的历史数据导出到文件
+
+    按 chunk_rows 行一块读取并写出，先写入同目录的临时文件，完成后再替换目标文件；
+    取消或出错时删除临时文件，目标文件保持不变。
+
+    Args:
+        group: 标签组(项目)名称
+        path: 导出文件路径
+        fmt: FORMATS 中的格式，None 时按扩展名判断
+        names: 导出的标签名称，None 表示历史数据中的全部标签
+        start, end: 时间范围(秒)，None 表示不限
+        chunk_rows: 每块的行数，None 时按 CHUNK_VALUES 与标签数计算
+        progress: progress(已导出行数, 总行数)，每块调用一次
+        cancelled: 返回 True 表示取消导出的函数，每块检查一次
+        root: 历史数据根目录
+
+    Returns:
+        导出的行数
+    """
+    fmt = fmt or format_for_path(path)
+    if fmt not in FORMATS:
+        raise ExportError(f"不支持的导出格式: {fmt or path}")
+    names = list(names) if names is not None else history_names(group, root)
+    if not names:
+        raise ExportError(f"项目 {group} 没有历史数据")
+    chunk_rows = chunk_rows or max(1, CHUNK_VALUES // len(names))
+    total = count_rows(group, start, end, root)
+    state = {"rows": 0}
+
+    def on_chunk(rows):
+        state["rows"] += rows
+        if progress is not None:
+            progress(state["rows"], total)
+
+    def chunks():
+        for chunk in iter_chunks(group, names, start, end, chunk_rows, root):
+            if cancelled is not None and cancelled():
+                raise ExportCancelled("导出已取消")
+            yield chunk
+
+    tmp = path + ".tmp"
+    try:
+        if fmt == "parquet":
+            _write_parquet(tmp, names, chunks(), on_chunk)
+        elif fmt == "csv.gz":
+            # utf-8-sig 带BOM，Excel 可直接识别中文列名
+            with gzip.open(tmp, "wt", compresslevel=GZIP_LEVEL, encoding="utf-8-sig", newline="") as f:
+                _write_csv(f, names, chunks(), on_chunk)
+        else:
+            with open(tmp, "w", encoding="utf-8-sig", newline="") as f:
+                _write_csv(f, names, chunks(), on_chunk)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return state["rows"]
+
+
+class ExportJob:
+    """在后台线程中运行的导出任务
+
+    on_progress(已导出行数, 总行数) 与 on_finished(状态, 说明) 在导出线程中调用，
+    界面中使用时应通过信号转到界面线程。状态为 "done"、"cancelled" 或 "failed"。
+    """
+
+    def __init__(self, group, path, fmt=None, names=None, start=None, end=None,
+                 chunk_rows=None, on_progress=None, on_finished=None):
+        self.group = group
+        self.path = path
+        self.fmt = fmt
+        self.names = names
+        self.start_ts = start
+        self.end_ts = end
+        self.chunk_rows = chunk_rows
+        self.on_progress = on_progress
+        self.on_finished = on_finished
+        self.rows = 0
+        self._cancel_event = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """启动导出线程"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="history-export", daemon=True)
+            self._thread.start()
+        return self
+
+    def cancel(self):
+        """请求取消，导出线程在写完当前块后停止"""
+        self._cancel_event.set()
+
+    def join(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        try:
+            self.rows = export_history(self.group, self.path, self.fmt, self.names, self.start_ts, self.end_ts,
+                                       self.chunk_rows, self.on_progress, self._cancel_event.is_set)
+            status, message = "done", f"已导出 {self.rows} 行到 {self.path}"
+        except ExportCancelled as e:
+            status, message = "cancelled", str(e)
+        except Exception as e:
+            # 包括 pyarrow 的异常，导出线程中的任何错误都要回报给界面
+            print(f"Error exporting history of {self.group}: {e}")
+            status, message = "failed", f"导出失败: {e}"
+        if self.on_finished is not None:
+            self.on_finished(status, message)
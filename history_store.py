@@ -0,0 +1,555 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+历史数据存储模块
+按标签组将采集值追加写入定长列式段文件，先写预写日志(WAL)保证断电不丢数据
+"""
+
+import os
+import json
+import time
+import zlib
+import struct
+import hashlib
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+
+from app_paths import DATA_DIR
+
+HISTORY_DIR = os.path.join(DATA_DIR, "history")
+
+# 段文件头: 标识, 版本, 保留, 容量(行), 标签数, 已写行数, 首/末时间戳
+_SEGMENT_HEADER = struct.Struct("<4sHHIIIdd")
+SEGMENT_MAGIC = b"PLCS"
+SEGMENT_VERSION = 1
+HEADER_SIZE = 64
+# 单个段文件的目标大小，容量(行数)按标签数换算
+SEGMENT_BYTES = 64 * 1024 * 1024
+MIN_SEGMENT_ROWS = 1024
+
+# 日志记录头: 标识, 行数, 校验和, 段号, 段内起始行
+_WAL_HEADER = struct.Struct("<4sIIII")
+WAL_MAGIC = b"PLCW"
+WAL_NAME = "wal.log"
+META_NAME = "meta.json"
+
+# 写入线程的刷盘间隔(秒)与检查点间隔(秒)，日志超过 WAL_LIMIT 字节时提前做检查点
+FLUSH_INTERVAL = 1.0
+CHECKPOINT_INTERVAL = 30.0
+WAL_LIMIT = 16 * 1024 * 1024
+# 分块读取(导出)时每块的行数
+CHUNK_ROWS = 10000
+
+
+class HistoryError(Exception):
+    """历史数据存储异常"""
+
+
+class _Segment:
+    """一个定长列式段文件
+
+    布局: 文件头 | 时间戳列(d) | 各标签值列(d) | 各标签质量列(B)，每列预留 capacity 行
+    """
+
+    __slots__ = ("path", "number", "capacity", "tag_count", "rows", "first_ts", "last_ts", "file")
+
+    def __init__(self, path, number, capacity, tag_count):
+        self.path = path
+        self.number = number
+        self.capacity = capacity
+        self.tag_count = tag_count
+        self.rows = 0
+        self.first_ts = 0.0
+        self.last_ts = 0.0
+        self.file = None
+
+    @classmethod
+    def create(cls, path, number, capacity, tag_count):
+        segment = cls(path, number, capacity, tag_count)
+        segment.file = open(path, "w+b")
+        # 预分配整段空间(稀疏文件)，写入时只需按偏移覆盖
+        segment.file.truncate(HEADER_SIZE + capacity * (8 + tag_count * 9))
+        segment.write_header()
+        return segment
+
+    @classmethod
+    def open(cls, path, number, writable=False):
+        f = open(path, "r+b" if writable else "rb")
+        header = f.read(HEADER_SIZE)
+        if len(header) < _SEGMENT_HEADER.size:
+            f.close()
+            raise HistoryError(f"段文件不完整: {path}")
+        magic, version, _, capacity, tag_count, rows, first_ts, last_ts = _SEGMENT_HEADER.unpack_from(header)
+        if magic != SEGMENT_MAGIC or version != SEGMENT_VERSION:
+            f.close()
+            raise HistoryError(f"无法识别的段文件: {path}")
+        segment = cls(path, number, capacity, tag_count)
+        segment.rows, segment.first_ts, segment.last_ts = rows, first_ts, last_ts
+        segment.file = f
+        return segment
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def write_header(self):
+        self.file.seek(0)
+        self.file.write(_SEGMENT_HEADER.pack(SEGMENT_MAGIC, SEGMENT_VERSION, 0, self.capacity,
+                                             self.tag_count, self.rows, self.first_ts, self.last_ts))
+
+    def _value_offset(self, tag):
+        return HEADER_SIZE + self.capacity * 8 * (1 + tag)
+
+    def _quality_offset(self, tag):
+        return HEADER_SIZE + self.capacity * 8 * (1 + self.tag_count) + self.capacity * tag
+
+    def write(self, start_row, timestamps, values, quality):
+        """写入一批行，values/quality 为按行排列的数组(行数 x 标签数)"""
+        f = self.file
+        n = self.tag_count
+        f.seek(HEADER_SIZE + start_row * 8)
+        timestamps.tofile(f)
+        for tag in range(n):
+            f.seek(self._value_offset(tag) + start_row * 8)
+            values[tag::n].tofile(f)
+        for tag in range(n):
+            f.seek(self._quality_offset(tag) + start_row)
+            quality[tag::n].tofile(f)
+        end_row = start_row + len(timestamps)
+        if start_row == 0:
+            self.first_ts = timestamps[0]
+        if end_row >= self.rows:
+            self.rows = end_row
+            self.last_ts = timestamps[-1]
+        self.write_header()
+
+    def _read(self, code, offset, start, stop):
+        column = array(code)
+        if stop > start:
+            self.file.seek(offset + start * column.itemsize)
+            column.fromfile(self.file, stop - start)
+        return column
+
+    def read_timestamps(self):
+        return self._read("d", HEADER_SIZE, 0, self.rows)
+
+    def read_column(self, tag, start, stop):
+        return (self._read("d", self._value_offset(tag), start, stop),
+                self._read("B", self._quality_offset(tag), start, stop))
+
+
+class HistoryStore:
+    """追加写入的时序数据存储
+
+    同一组标签每个采集周期共用一个时间戳，按组存放在 HISTORY_DIR/<组名> 下，
+    每段文件为定长列式布局，按时间范围查询时只读取相关段的对应列。
+
+    采集线程调用 append() 只把一行数据复制到内存缓冲区；后台写入线程按 FLUSH_INTERVAL
+    批量写入：先追加到预写日志并 fsync，再按列写入段文件，每隔 CHECKPOINT_INTERVAL
+    把段文件 fsync 后清空日志。启动时重放日志，未落盘的段数据可完整恢复。
+    """
+
+    def __init__(self, group, names, root=HISTORY_DIR, flush_interval=FLUSH_INTERVAL):
+        """
+        Args:
+            group: 标签组名称
+            names: 组内标签名称列表，顺序与 append() 的值顺序一致
+            root: 存储根目录
+            flush_interval: 批量写入间隔(秒)
+        """
+        self.root = root
+        self.names = list(names)
+        self.tag_count = len(self.names)
+        if not self.tag_count:
+            raise HistoryError("标签组不能为空")
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.flush_interval = flush_interval
+        # 标签列表变化时使用新的组目录，旧数据仍可按标签名查询；
+        # 查询只在同名标签组(同一项目)的目录中进行，各项目的标签名称相同
+        self.base_group = group
+        digest = hashlib.sha1("\n".join(self.names).encode("utf-8")).hexdigest()[:8]
+        self.group = f"{group}-{digest}"
+        self.path = os.path.join(root, self.group)
+        self.capacity = max(MIN_SEGMENT_ROWS, SEGMENT_BYTES // (8 + self.tag_count * 9))
+        self.points_written = 0
+
+        self._timestamps = array("d")
+        self._values = array("d")
+        self._quality = array("B")
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._segment = None
+        self._wal = None
+        self._last_checkpoint = time.monotonic()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._open()
+
+    def _open(self):
+        os.makedirs(self.path, exist_ok=True)
+        meta_path = os.path.join(self.path, META_NAME)
+        if not os.path.exists(meta_path):
+            tmp = meta_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"names": self.names, "capacity": self.capacity}, f, ensure_ascii=False)
+            os.replace(tmp, meta_path)
+        else:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                self.capacity = json.load(f).get("capacity", self.capacity)
+        numbers = _segment_numbers(self.path)
+        if numbers:
+            self._segment = _Segment.open(self._segment_path(numbers[-1]), numbers[-1], writable=True)
+        self._replay_wal()
+        self._wal = open(os.path.join(self.path, WAL_NAME), "ab")
+
+    def _segment_path(self, number):
+        return os.path.join(self.path, f"{number:08d}.seg")
+
+    def _replay_wal(self):
+        """把日志中的记录重新写入对应段的对应行(幂等)，随后做检查点"""
+        wal_path = os.path.join(self.path, WAL_NAME)
+        if not os.path.exists(wal_path):
+            return
+        with open(wal_path, "rb") as f:
+            data = f.read()
+        n = self.tag_count
+        position = 0
+        replayed = 0
+        while position + _WAL_HEADER.size <= len(data):
+            magic, rows, crc, number, start_row = _WAL_HEADER.unpack_from(data, position)
+            body = position + _WAL_HEADER.size
+            end = body + rows * (8 + n * 9)
+            # 记录不完整或校验失败说明写入时断电，之后的内容全部丢弃
+            if magic != WAL_MAGIC or end > len(data) or zlib.crc32(data[body:end]) != crc:
+                break
+            timestamps = array("d")
+            timestamps.frombytes(data[body:body + rows * 8])
+            values = array("d")
+            values.frombytes(data[body + rows * 8:body + rows * 8 * (1 + n)])
+            quality = array("B", data[body + rows * 8 * (1 + n):end])
+            self._segment_for(number).write(start_row, timestamps, values, quality)
+            replayed += rows
+            position = end
+        if replayed:
+            print(f"History {self.group}: recovered {replayed} rows from write-ahead log")
+        self._checkpoint(truncate_path=wal_path)
+
+    def _segment_for(self, number):
+        segment = self._segment
+        if segment is not None and segment.number == number:
+            return segment
+        if segment is not None:
+            segment.file.flush()
+            os.fsync(segment.file.fileno())
+            segment.close()
+        path = self._segment_path(number)
+        if os.path.exists(path):
+            self._segment = _Segment.open(path, number, writable=True)
+        else:
+            self._segment = _Segment.create(path, number, self.capacity, self.tag_count)
+        return self._segment
+
+    def start(self):
+        """启动后台写入线程"""
+        if self._thread is not None:
+            return self
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        """写入剩余数据并关闭"""
+        if self._thread is not None:
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        with self._io_lock:
+            self._checkpoint()
+            if self._wal is not None:
+                self._wal.close()
+                self._wal = None
+            if self._segment is not None:
+                self._segment.close()
+                self._segment = None
+
+    def append(self, timestamp, values, quality):
+        """追加一行数据(只复制到内存，不做磁盘IO)
+
+        Args:
+            timestamp: 时间戳(秒)
+            values: 各标签的值，长度与 names 相同
+            quality: 各标签的质量码
+        """
+        with self._lock:
+            self._timestamps.append(timestamp)
+            self._values.extend(values)
+            self._quality.extend(quality)
+
+    def _run(self):
+        while not self._stop_event.wait(self.flush_interval):
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"Error writing history {self.group}: {e}")
+
+    def flush(self):
+        """把缓冲区写入日志与段文件，返回写入的行数"""
+        with self._io_lock:
+            with self._lock:
+                timestamps, values, quality = self._timestamps, self._values, self._quality
+                if not timestamps:
+                    return 0
+                self._timestamps, self._values, self._quality = array("d"), array("d"), array("B")
+            if self._wal is None:
+                raise HistoryError("历史数据存储已关闭")
+            n = self.tag_count
+            rows = len(timestamps)
+            # 按段的剩余容量切分，每条日志记录只对应一个段
+            chunks = []
+            position = 0
+            segment = self._segment
+            number = segment.number if segment is not None else 0
+            start_row = segment.rows if segment is not None else 0
+            while position < rows:
+                if start_row >= self.capacity:
+                    number, start_row = number + 1, 0
+                count = min(rows - position, self.capacity - start_row)
+                stop = position + count
+                chunks.append((number, start_row, timestamps[position:stop],
+                               values[position * n:stop * n], quality[position * n:stop * n]))
+                position = stop
+                start_row += count
+
+            for number, start_row, ts, vals, qual in chunks:
+                body = ts.tobytes() + vals.tobytes() + qual.tobytes()
+                self._wal.write(_WAL_HEADER.pack(WAL_MAGIC, len(ts), zlib.crc32(body), number, start_row))
+                self._wal.write(body)
+            self._wal.flush()
+            os.fsync(self._wal.fileno())
+
+            for number, start_row, ts, vals, qual in chunks:
+                self._segment_for(number).write(start_row, ts, vals, qual)
+            self.points_written += rows * n
+
+            if (time.monotonic() - self._last_checkpoint >= CHECKPOINT_INTERVAL
+                    or self._wal.tell() >= WAL_LIMIT):
+                self._checkpoint()
+            return rows
+
+    def _checkpoint(self, truncate_path=None):
+        """段文件落盘后清空日志"""
+        if self._segment is not None:
+            self._segment.file.flush()
+            os.fsync(self._segment.file.fileno())
+        if self._wal is not None:
+            self._wal.seek(0)
+            self._wal.truncate()
+            self._wal.flush()
+            os.fsync(self._wal.fileno())
+        elif truncate_path is not None:
+            with open(truncate_path, "wb"):
+                pass
+        self._last_checkpoint = time.monotonic()
+
+    def query(self, name, start=None, end=None):
+        """查询标签在 [start, end] 时间范围内的历史数据
+
+        同时读取段文件与尚未写入的缓冲区，结果按时间顺序排列。
+
+        Returns:
+            (timestamps, values, quality) 三个 array
+        """
+        out_ts, out_values, out_quality = array("d"), array("d"), array("B")
+        lo = float("-inf") if start is None else start
+        hi = float("inf") if end is None else end
+        with self._io_lock:
+            for group_path, tag in self._groups_with(name):
+                current = group_path == self.path
+                for number in _segment_numbers(group_path):
+                    segment = self._segment if current and self._segment is not None \
+                        and self._segment.number == number else None
+                    own = segment is None
+                    if own:
+                        segment = _Segment.open(os.path.join(group_path, f"{number:08d}.seg"), number)
+                    else:
+                        segment.file.flush()
+                    try:
+                        if not segment.rows or segment.last_ts < lo or segment.first_ts > hi:
+                            continue
+                        timestamps = segment.read_timestamps()
+                        i, j = bisect_left(timestamps, lo), bisect_right(timestamps, hi)
+                        values, quality = segment.read_column(tag, i, j)
+                        out_ts.extend(timestamps[i:j])
+                        out_values.extend(values)
+                        out_quality.extend(quality)
+                    finally:
+                        if own:
+                            segment.close()
+            tag = self.index.get(name)
+            if tag is not None:
+                with self._lock:
+                    n = self.tag_count
+                    timestamps = self._timestamps
+                    i, j = bisect_left(timestamps, lo), bisect_right(timestamps, hi)
+                    out_ts.extend(timestamps[i:j])
+                    out_values.extend(self._values[i * n + tag:j * n:n])
+                    out_quality.extend(self._quality[i * n + tag:j * n:n])
+        return out_ts, out_values, out_quality
+
+    def _groups_with(self, name):
+        """列出本标签组中包含该标签的全部组目录及其列号，按首个段的时间排序"""
+        return [(group_path, names.index(name))
+                for group_path, names in history_groups(self.base_group, self.root) if name in names]
+
+    def purge(self, before):
+        """删除全部数据早于 before 的段文件，返回删除的段数量"""
+        removed = 0
+        with self._io_lock:
+            for number in _segment_numbers(self.path):
+                if self._segment is not None and number == self._segment.number:
+                    continue
+                path = self._segment_path(number)
+                segment = _Segment.open(path, number)
+                expired = segment.rows and segment.last_ts < before
+                segment.close()
+                if expired:
+                    os.remove(path)
+                    removed += 1
+        return removed
+
+
+def _segment_numbers(path):
+    numbers = []
+    for entry in os.listdir(path):
+        if entry.endswith(".seg") and entry[:-4].isdigit():
+            numbers.append(int(entry[:-4]))
+    numbers.sort()
+    return numbers
+
+
+def _first_timestamp(path):
+    numbers = _segment_numbers(path)
+    if not numbers:
+        return float("inf")
+    try:
+        segment = _Segment.open(os.path.join(path, f"{numbers[0]:08d}.seg"), numbers[0])
+    except (OSError, HistoryError):
+        return float("inf")
+    segment.close()
+    return segment.first_ts
+
+
+def history_groups(group, root=HISTORY_DIR):
+    """标签组的全部组目录(标签列表变化后会产生新的目录)
+
+    Returns:
+        [(目录, 标签名称列表), ...]，按首个段的时间排序
+    """
+    found = []
+    if not os.path.isdir(root):
+        return found
+    for entry in os.listdir(root):
+        group_path = os.path.join(root, entry)
+        meta_path = os.path.join(group_path, META_NAME)
+        if entry.rsplit("-", 1)[0] != group or not os.path.isfile(meta_path):
+            continue
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                names = json.load(f).get("names", [])
+        except (OSError, ValueError) as e:
+            print(f"Error reading history meta {meta_path}: {e}")
+            continue
+        found.append((_first_timestamp(group_path), group_path, names))
+    found.sort(key=lambda item: item[0])
+    return [(group_path, names) for _, group_path, names in found]
+
+
+def history_names(group, root=HISTORY_DIR):
+    """标签组历史数据中出现过的全部标签名称，按首次出现的顺序"""
+    names = []
+    for _, group_names in history_groups(group, root):
+        names.extend(n for n in group_names if n not in names)
+    return names
+
+
+def _segments_in_range(group, start, end, root):
+    """范围内的段: 逐个以只读方式打开，调用方负责关闭"""
+    lo = float("-inf") if start is None else start
+    hi = float("inf") if end is None else end
+    for group_path, names in history_groups(group, root):
+        for number in _segment_numbers(group_path):
+            try:
+                segment = _Segment.open(os.path.join(group_path, f"{number:08d}.seg"), number)
+            except (OSError, HistoryError) as e:
+                print(f"Error opening history segment {number} of {group_path}: {e}")
+                continue
+            if not segment.rows or segment.last_ts < lo or segment.first_ts > hi:
+                segment.close()
+                continue
+            yield segment, names, lo, hi
+
+
+def _row_range(segment, lo, hi):
+    """段内时间在 [lo, hi] 的行范围，整段都在范围内时不读取时间戳列"""
+    if segment.first_ts >= lo and segment.last_ts <= hi:
+        return 0, segment.rows, None
+    timestamps = segment.read_timestamps()
+    return bisect_left(timestamps, lo), bisect_right(timestamps, hi), timestamps
+
+
+def count_rows(group, start=None, end=None, root=HISTORY_DIR):
+    """标签组在 [start, end] 内已写入段文件的行数"""
+    total = 0
+    for segment, _, lo, hi in _segments_in_range(group, start, end, root):
+        try:
+            i, j, _ = _row_range(segment, lo, hi)
+            total += j - i
+        finally:
+            segment.close()
+    return total
+
+
+def iter_chunks(group, names, start=None, end=None, chunk_rows=CHUNK_ROWS, root=HISTORY_DIR):
+    """按时间顺序分块读取标签组的历史数据，内存占用只与 chunk_rows 和段大小有关
+
+    以只读方式直接读取段文件，不需要打开 HistoryStore，可在采集写入的同时在其他线程中运行；
+    只包含已写入段文件的数据(写入线程每 FLUSH_INTERVAL 秒写入一次)。
+
+    Args:
+        group: 标签组名称
+        names: 要读取的标签名称；某个组目录中没有的标签对应 None
+        start, end: 时间范围(秒)，None 表示不限
+        chunk_rows: 每块最多的行数
+
+    Yields:
+        (timestamps, values, quality): timestamps 为 array("d")，values/quality 为与 names 对应的列表，
+        元素为 array 或 None
+    """
+    for segment, group_names, lo, hi in _segments_in_range(group, start, end, root):
+        try:
+            tags = [group_names.index(n) if n in group_names else None for n in names]
+            i, j, timestamps = _row_range(segment, lo, hi)
+            for position in range(i, j, chunk_rows):
+                stop = min(j, position + chunk_rows)
+                if timestamps is not None:
+                    chunk_ts = timestamps[position:stop]
+                else:
+                    chunk_ts = segment._read("d", HEADER_SIZE, position, stop)
+                values = []
+                quality = []
+                for tag in tags:
+                    if tag is None:
+                        values.append(None)
+                        quality.append(None)
+                    else:
+                        column, column_quality = segment.read_column(tag, position, stop)
+                        values.append(column)
+                        quality.append(column_quality)
+                yield chunk_ts, values, quality
+        finally:
+            segment.close()
@@ -6,165 +6,438 @@
 负责主页内容和图表展示
 """
 
-import os
-import re
-import random
+import json
 import time
-from PyQt5.QtWebEngineWidgets import QWebEngineView
-from PyQt5.QtCore import QUrl, QTimer, QSettings
+from concurrent.futures import ThreadPoolExecutor
+from PyQt5.QtCore import QTimer, QObject, pyqtSignal, pyqtSlot
+
+from acquisition_manager import AcquisitionManager
+from config_service import MIN_REFRESH_MS, get_config
+from history_store import HistoryStore, HistoryError
+from downsample import downsample_indices, query_series, MAX_CHART_POINTS
+from plc_link import load_enabled_projects
+from ring_aggregator import RingAggregator
+from belt_scale import BeltScaleTotalizer, SHIFT_START_HOURS
+from alarm_engine import AlarmEngine
+from project_store import DEFAULT_PLC_SETTINGS, get_store
+from tag_registry import TagRegistry, QUALITY_GOOD, QUALITY_BAD
+from web_scheme import ECHARTS_URL
+
+# 主页采集的PLC标签
+PLC_TAGS = [
+    {"名称": "推进行程", "数据地址": "DB1.DBD0", "数据类型": "float", "单位": "mm"},
+    {"名称": "瞬时出土量", "数据地址": "DB1.DBD4", "数据类型": "float", "单位": "t/h"},
+    {"名称": "当前状态", "数据地址": "DB1.DBW8", "数据类型": "short", "单位": "%"},
+    {"名称": "环号", "数据地址": "DB1.DBW10", "数据类型": "short", "单位": "",
+     "计算公式": "raw + input", "公式输入值": 8000},
+    {"名称": "刀盘转速", "数据地址": "DB1.DBD12", "数据类型": "float", "单位": ""},
+    {"名称": "A组油缸行程", "数据地址": "DB1.DBD16", "数据类型": "float", "单位": "mm"},
+    {"名称": "B组油缸行程", "数据地址": "DB1.DBD20", "数据类型": "float", "单位": "mm"},
+    {"名称": "C组油缸行程", "数据地址": "DB1.DBD24", "数据类型": "float", "单位": "mm"},
+    {"名称": "D组油缸行程", "数据地址": "DB1.DBD28", "数据类型": "float", "单位": "mm"},
+    {"名称": "推进速度", "数据地址": "DB1.DBD32", "数据类型": "float", "单位": ""},
+    {"名称": "皮带秤荷重", "数据地址": "DB1.DBD36", "数据类型": "float", "单位": "kg/m"},
+    {"名称": "皮带速度", "数据地址": "DB1.DBD40", "数据类型": "float", "单位": "m/s"},
+]
+
+# 主页默认的报警规则，项目的 alarm_rules 中可以追加规则
+ALARM_RULES = [
+    {"名称": "油缸行程偏差", "类型": "偏差",
+     "标签": ["A组油缸行程", "B组油缸行程", "C组油缸行程", "D组油缸行程"],
+     "限值": 20, "死区": 5, "延时": 2, "恢复延时": 5},
+    {"名称": "瞬时出土量超限", "类型": "上限", "标签": "瞬时出土量", "限值": 400, "死区": 20, "延时": 5, "恢复延时": 5},
+    {"名称": "推进速度突变", "类型": "变化率", "标签": "推进速度", "限值": 20, "延时": 1},
+    # 秤体信号总有微小波动，长时间完全不变说明传感器或采集异常
+    {"名称": "皮带秤信号卡滞", "类型": "卡滞", "标签": "皮带秤荷重", "持续时间": 600, "死区": 0.001},
+]
+
+# 环号图表显示最近多少环
+CHART_RINGS = 20
+
+# 每累计多少个读取到显示的延迟样本输出一次统计
+LATENCY_REPORT_EVERY = 100
+
+# 环号图表的静态配置(坐标轴、样式、双Y轴)，只在导入时序列化一次，
+# 刷新时仅通过 setOption 合并 xAxis.data 与各系列数据
+RING_CHART_OPTION = {
+    "tooltip": {"trigger": "axis", "axisPointer": {"type": "cross"}},
+    "legend": {"show": True},
+    "xAxis": [{
+        "type": "category",
+        "name": "环号",
+        "nameLocation": "center",
+        "nameGap": 30,
+        "axisLabel": {"fontSize": 12},
+        "data": []
+    }],
+    "yAxis": [
+        {
+            "type": "value",
+            "name": "出土量(t)",
+            "nameLocation": "end",
+            "nameGap": 15,
+            "axisLine": {"lineStyle": {"color": "#1890ff"}}
+        },
+        {
+            "type": "value",
+            "name": "推进行程(mm)",
+            "min": 0,
+            "max": 250,
+            "position": "right",
+            "axisLine": {"lineStyle": {"color": "#d14a61"}},
+            "axisLabel": {"formatter": "{value} mm"}
+        }
+    ],
+    "series": [
+        {
+            "type": "bar",
+            "name": "出土量(t)",
+            "yAxisIndex": 0,
+            "barCategoryGap": "40%",
+            "itemStyle": {"color": "#1890ff"},
+            "data": []
+        },
+        {
+            "type": "line",
+            "name": "推进行程(mm)",
+            "yAxisIndex": 1,
+            "label": {"show": False},
+            "itemStyle": {"color": "#d14a61"},
+            "lineStyle": {"width": 2},
+            "data": []
+        }
+    ]
+}
+RING_CHART_OPTION_JSON = json.dumps(RING_CHART_OPTION, ensure_ascii=False)
+
+# 环号图表切换到整班、24小时或整段掘进时显示的历史趋势，数据由页面通过 queryHistory 查询，
+# 每个系列最多 MAX_CHART_POINTS 点；缩放后按可见范围重新查询更细的数据
+HISTORY_CHART_TAGS = ["瞬时出土量", "推进行程"]
+HISTORY_CHART_OPTION = {
+    "tooltip": {"trigger": "axis"},
+    "legend": {"show": True},
+    "grid": {"bottom": 70},
+    "xAxis": [{"type": "time"}],
+    "yAxis": [
+        {
+            "type": "value",
+            "name": "瞬时出土量(t/h)",
+            "axisLine": {"lineStyle": {"color": "#1890ff"}}
+        },
+        {
+            "type": "value",
+            "name": "推进行程(mm)",
+            "position": "right",
+            "axisLine": {"lineStyle": {"color": "#d14a61"}}
+        }
+    ],
+    "dataZoom": [{"type": "inside"}, {"type": "slider"}],
+    "series": [
+        {
+            "type": "line",
+            "name": "瞬时出土量(t/h)",
+            "yAxisIndex": 0,
+            "showSymbol": False,
+            "itemStyle": {"color": "#1890ff"},
+            "data": []
+        },
+        {
+            "type": "line",
+            "name": "推进行程(mm)",
+            "yAxisIndex": 1,
+            "showSymbol": False,
+            "itemStyle": {"color": "#d14a61"},
+            "data": []
+        }
+    ]
+}
+HISTORY_CHART_OPTION_JSON = json.dumps(HISTORY_CHART_OPTION, ensure_ascii=False)
 
-from pyecharts.charts import Bar, Line
-from pyecharts import options as opts
-from pyecharts.globals import ThemeType
 
 class HomePage:
-    """主页类，负责生成主页内容和图表"""
+    """主页类，负责生成主页内容和图表
+    
+    页面作为外壳的 home 路由只加载一次，之后每次刷新只通过共享的 QWebChannel 推送发生变化的数据
+    """
+    
+    route = "home"
     
-    def __init__(self):
-        self.page = QWebEngineView()
+    def __init__(self, shell):
+        self.shell = shell
+        self.bridge = HomeBridge(time.perf_counter(), self)
+        shell.add_route(self.route, self.bridge)
         self.summary_data = {
             "推进行程": 75,
             "瞬时出土量": 42,
-            "环出土量": 128,
+            "环出土量": 0,
             "当前状态": 60
         }
-        # 模拟最近20环的出土量数据
-        self.ring_data = {
-            "rings": [str(i) for i in range(1, 21)],
-            "values": [random.randint(80, 150) for _ in range(20)],
-            "stroke_values": [random.randint(100, 200) for _ in range(20)]
-        }
-        self.refresh_interval_ms = self._load_refresh_interval()
+        self.registry = TagRegistry.from_definitions(PLC_TAGS)
+        # 明细表的静态列只生成一次，刷新时仅传递实时值与时间戳
+        self.metrics_meta = [
+            row for row in self.registry.metadata_rows() if row[0] not in self.summary_data
+        ]
+        self.metrics_index = [self.registry.index_of(row[0]) for row in self.metrics_meta]
+        self.plc_values = self.registry.values[:]
+        self.plc_quality = self.registry.quality[:]
+        self.plc_timestamps = self.registry.timestamps[:]
+        self.plc_timestamp = 0.0
+        # 读取到显示延迟: 推送序号 -> 读取开始时间，页面绘制后回报
+        self._push_seq = 0
+        self._pending_latency = {}
+        self.latency_ms = []
+        self.skipped_snapshots = 0
+        # 上一次推送到页面的数据，用于计算增量
+        self._sent_summary = {}
+        self._sent_metrics = []
+        self._sent_ring = None
+        self._sent_link = None
+        self.link_status = {}
+        # 同时采集全部启用项目的PLC，主页显示当前运行项目
+        projects = load_enabled_projects()
+        self.active_project = next(name for name, _, active in projects if active)
+        self.manager = AcquisitionManager(
+            [(name, settings) for name, settings, _ in projects],
+            self._create_registry,
+            self._open_history
+        )
+        self.engine = self.manager.engine(self.active_project)
+        if self.engine is None:
+            # 运行项目的设置无效时按默认设置创建，主页照常显示，修正设置后按新设置重连
+            self.engine = self.manager.add(self.active_project, dict(DEFAULT_PLC_SETTINGS))
+        self.history = self.manager.histories.get(self.active_project)
+        # 环出土量与环号图表由采集线程按环增量统计
+        self.rings = self.engine.add_processor(RingAggregator(self.registry))
+        # 皮带秤按环、按班与总累计，在环统计之后处理以取得本周期的环号
+        self.belt_scale = self.engine.add_processor(
+            BeltScaleTotalizer(self.active_project, self.registry, self.rings))
+        project = get_store().get(self.active_project) or {}
+        self.alarms = self.engine.add_processor(
+            AlarmEngine(self.registry, ALARM_RULES + list(project.get("alarm_rules", []))))
+        for rule, message in self.alarms.errors.items():
+            print(f"Error compiling alarm rule {rule}: {message}")
+        self._sent_alarms = None
+        self._sent_belt = None
+        # 采集线程只发出信号，界面线程在事件循环中取最新快照
+        self.notifier = SnapshotNotifier()
+        self.notifier.ready.connect(self.on_snapshot)
+        self.engine.on_snapshot = self.notifier.ready.emit
+        self.manager.start()
+        # 配置变化由配置服务推送，刷新周期内不读取配置
+        self.config = get_config()
+        self.config.refreshIntervalChanged.connect(self.set_refresh_interval)
+        self.config.plcSettingsChanged.connect(self._on_plc_settings_changed)
+        self.config.plcRemoved.connect(self.manager.remove)
+        self.config.settingsChanged.connect(self._on_settings_changed)
+        self.notifications = self.config.settings().get("enable_notifications", True)
+        self.refresh_interval_ms = self.config.refresh_interval_ms()
         self.timer = QTimer()
         self.timer.timeout.connect(self.update_data)
         self.timer.start(self.refresh_interval_ms)
         self.generate_home_page()
     
-    def get_page(self):
-        """获取页面组件"""
-        return self.page
-    
-    def _get_mac_prefix8(self):
+    def shutdown(self):
+        """停止定时器与采集线程，写入剩余的历史数据"""
+        self.timer.stop()
+        self.manager.stop()
+        self.belt_scale.close()
+        self.bridge.close()
+
+    def _create_registry(self, project):
+        if project == self.active_project:
+            return self.registry
+        return TagRegistry.from_definitions(PLC_TAGS)
+
+    @staticmethod
+    def _open_history(project, registry):
         try:
-            import uuid
-            mac = uuid.getnode()
-            hex_mac = f"{mac:012x}".upper()
-            return hex_mac[:8]
-        except Exception:
-            return "00000000"
+            return HistoryStore(project, registry.names).start()
+        except (OSError, HistoryError) as e:
+            print(f"Error opening history store of {project}: {e}")
+            return None
     
     def _build_metrics_table(self):
-        now_str = time.strftime('%Y-%m-%d %H:%M:%S')
-        mac8 = self._get_mac_prefix8()
-        try:
-            current_ring_label = int(self.ring_data["rings"][-1])
-        except Exception:
-            current_ring_label = 1
-        ring_base = 8000
-        ring_no = ring_base + current_ring_label - 1
-        stroke = int(self.summary_data.get("推进行程", 0))
-        # 模拟各油缸行程：在总行程基础上加减微小偏差
-        cyl_variants = [
-            ("A组油缸行程", max(0, stroke + 1)),
-            ("B组油缸行程", max(0, stroke - 1)),
-            ("C组油缸行程", max(0, stroke + 2)),
-            ("D组油缸行程", max(0, stroke - 2)),
+        """明细表的实时列: 与 metrics_meta 按行对应的 [实时值, 数据时间(毫秒)]
+
+        过期的标签仍显示最后的值，连接状态由页面上的连接标识提示。
+        """
+        values = self.plc_values
+        quality = self.plc_quality
+        timestamps = self.plc_timestamps
+        return [
+            [round(values[i], 2) if quality[i] != QUALITY_BAD else None, int(timestamps[i] * 1000)]
+            for i in self.metrics_index
         ]
-        # 刀盘转速与推进速度简单计算（示意）
-        rpm = round(self.summary_data.get("当前状态", 0) * 0.3, 2)
-        refresh_ms = getattr(self, 'refresh_interval_ms', 60000)
-        speed = round(stroke / max(1, refresh_ms / 1000.0), 2)
-        rows = []
-        def row(name, dtype, formula_inputs, unit, value):
-            return {
-                "名称": name,
-                "数据地址": mac8,
-                "数据类型": dtype,
-                "计算公式": "none",
-                "公式输入值": formula_inputs,
-                "单位": unit,
-                "实时值": value,
-                "数据时间": now_str
-            }
-        rows.append(row("环号", "short", ring_base, "", ring_no))
-        rows.append(row("刀盘转速", "float", 0, "", rpm))
-        for nm, val in cyl_variants:
-            rows.append(row(nm, "float", 0, "mm", val))
-        rows.append(row("推进速度", "float", 0, "", speed))
-        return rows
-
-    def _load_refresh_interval(self):
-        try:
-            settings = QSettings("PLCApp", "PLC")
-            val = int(settings.value("refresh_interval_ms", 60000))
-            return max(1000, val)
-        except Exception:
-            env_val = os.environ.get("PLC_REFRESH_MS")
-            try:
-                if env_val:
-                    return max(1000, int(env_val))
-            except Exception:
-                pass
-        return 60000
+
+    def _on_plc_settings_changed(self, name, settings):
+        self.manager.update_settings(name, settings)
+        engine = self.manager.engine(name)
+        if name == self.active_project and engine is not None and engine is not self.engine:
+            # 运行项目停用后重新启用时采集引擎是新建的，沿用原来的周期处理器与快照通知
+            engine.processors = self.engine.processors
+            engine.on_snapshot = self.engine.on_snapshot
+            self.engine = engine
+            self.history = self.manager.histories.get(name)
+
+    def _on_settings_changed(self, settings):
+        notifications = settings.get("enable_notifications", True)
+        if notifications != self.notifications:
+            self.notifications = notifications
+            # 开关变化后重新推送报警列表
+            self._sent_alarms = None
 
     def set_refresh_interval(self, ms):
-        self.refresh_interval_ms = max(1000, int(ms))
+        self.refresh_interval_ms = max(MIN_REFRESH_MS, int(ms))
         self.timer.stop()
         self.timer.start(self.refresh_interval_ms)
     
+    def on_snapshot(self):
+        """采集线程产生新快照: 只取最新的一个，落后时跳过中间的快照"""
+        snapshot, skipped = self.engine.snapshots.take_latest()
+        if snapshot is None:
+            return
+        self.skipped_snapshots += skipped
+        self._apply_snapshot(snapshot)
+        self.push_updates(snapshot.read_at)
+
+    def _apply_snapshot(self, snapshot):
+        self.plc_values = snapshot.values
+        self.plc_quality = snapshot.quality
+        self.plc_timestamps = snapshot.timestamps
+        self.plc_timestamp = snapshot.timestamp
+        self.link_status = self.engine.link_status()
+        for key in ("推进行程", "瞬时出土量", "当前状态"):
+            index = self.registry.index_of(key)
+            if snapshot.quality[index] == QUALITY_GOOD:
+                self.summary_data[key] = round(snapshot.values[index], 2)
+        self._update_ring_total()
+
+    def _update_ring_total(self):
+        current = self.rings.current()
+        if current is not None:
+            self.summary_data["环出土量"] = round(current["total_t"], 2)
+
+    def _belt_totals(self):
+        """皮带秤的总累计、本班、本环重量(t)与瞬时流量(t/h)，按显示精度取整"""
+        totals = self.belt_scale.totals()
+        return {
+            "cumulative_t": round(totals["cumulative_t"], 2),
+            "shift_t": round(totals["shift_t"], 2),
+            "shift_start": int(totals["shift_start"] * 1000),
+            "ring": totals["ring"],
+            "ring_t": round(totals["ring_t"], 2),
+            "flow_tph": round(totals["flow_tph"], 1),
+        }
+
+    def record_latency(self, seq):
+        """页面绘制完成后回报，计算从开始读取PLC到显示的延迟"""
+        read_at = self._pending_latency.pop(seq, None)
+        if read_at is None:
+            return
+        samples = self.latency_ms
+        samples.append((time.perf_counter() - read_at) * 1000.0)
+        if len(samples) >= LATENCY_REPORT_EVERY:
+            ordered = sorted(samples)
+            print(f"读取到显示延迟: 平均 {sum(ordered) / len(ordered):.1f} ms, "
+                  f"P95 {ordered[int(len(ordered) * 0.95)]:.1f} ms, 最大 {ordered[-1]:.1f} ms, "
+                  f"合并跳过 {self.skipped_snapshots} 个快照")
+            samples.clear()
+
     def update_data(self):
         """更新数据并刷新图表"""
-        new_interval = self._load_refresh_interval()
-        if new_interval != self.refresh_interval_ms:
-            self.set_refresh_interval(new_interval)
-        if random.choice([True, False]):
-            self.summary_data["当前状态"] = max(0, min(100, self.summary_data["当前状态"] + random.randint(-5, 5)))
-        if random.choice([True, False]):
-            self.summary_data["推进行程"] = max(0, min(200, self.summary_data["推进行程"] + random.randint(-10, 10)))
-        if random.choice([True, False]):
-            self.summary_data["瞬时出土量"] = max(0, min(300, self.summary_data["瞬时出土量"] + random.randint(-15, 15)))
-        if random.choice([True, False]):
-            self.summary_data["环出土量"] = max(0, min(300, self.summary_data["环出土量"] + random.randint(-20, 20)))
-
-        # 更新环号数据（模拟推进）
-        if random.random() < 0.1:  # 10%概率推进一环
-            last_ring = int(self.ring_data["rings"][-1])
-            self.ring_data["rings"].pop(0)
-            self.ring_data["rings"].append(str(last_ring + 1))
-            self.ring_data["values"].pop(0)
-            self.ring_data["values"].append(random.randint(80, 150))
-        
-        # 重新生成页面
-        self.generate_home_page()
+        self.link_status = self.engine.link_status()
+        self._update_ring_total()
+        # 只推送变化的数据
+        self.push_updates()
+    
+    def _collect_updates(self):
+        """与上一次推送的数据比较，返回变化部分"""
+        delta = {}
+        summary = {k: v for k, v in self.summary_data.items() if self._sent_summary.get(k) != v}
+        if summary:
+            delta["summary"] = summary
+            self._sent_summary.update(summary)
+        live = self._build_metrics_table()
+        sent = self._sent_metrics
+        metrics = {
+            i: row for i, row in enumerate(live)
+            if i >= len(sent) or sent[i] != row
+        }
+        if metrics:
+            delta["metrics"] = metrics
+            self._sent_metrics = live
+        ring_state = (len(self.rings), self.rings.version)
+        if ring_state != self._sent_ring:
+            # 只推送上次推送时的最后一环(统计可能已变化)及之后新增的环，页面端按窗口长度滚动
+            sent_rows = self._sent_ring[0] if self._sent_ring else 0
+            start = max(0, sent_rows - 1, ring_state[0] - CHART_RINGS)
+            rings, values, stroke = self.rings.columns(start)
+            delta["chart"] = {
+                "window": CHART_RINGS,
+                "points": [list(p) for p in zip(rings, values, stroke)]
+            }
+            self._sent_ring = ring_state
+        if self.alarms.version != self._sent_alarms:
+            alarms = self.alarms.active_alarms() if self.notifications else []
+            delta["alarms"] = [[name, message, int(since * 1000)] for name, message, since in alarms]
+            self._sent_alarms = self.alarms.version
+        belt = self._belt_totals()
+        if belt != self._sent_belt:
+            delta["belt"] = belt
+            self._sent_belt = belt
+        link = {k: v for k, v in self.link_status.items() if k != "since_s"}
+        if link and link != self._sent_link:
+            delta["link"] = link
+            self._sent_link = link
+        return delta
+    
+    def push_updates(self, read_at=None):
+        """通过 QWebChannel 把变化的数据推送到页面
+
+        Args:
+            read_at: 数据开始读取的 time.perf_counter()，提供时页面绘制后回报延迟
+        """
+        delta = self._collect_updates()
+        delta["updated"] = time.strftime('%Y-%m-%d %H:%M:%S')
+        if read_at is not None:
+            self._push_seq += 1
+            delta["seq"] = self._push_seq
+            self._pending_latency[self._push_seq] = read_at
+            # 页面未回报的序号(如页面尚未加载)不无限累积
+            if len(self._pending_latency) > LATENCY_REPORT_EVERY:
+                self._pending_latency.pop(next(iter(self._pending_latency)))
+        self.bridge.dataUpdated.emit(json.dumps(delta, ensure_ascii=False))
     
     def generate_home_page(self):
-        """生成主页内容"""
+        """生成主页内容，仅在创建时加载一次"""
         # 构建数据卡片HTML
-        import json
-        metrics_rows = self._build_metrics_table()
-        metrics_json = json.dumps(metrics_rows, ensure_ascii=False)
+        metrics_json = json.dumps(self.metrics_meta, ensure_ascii=False)
+        self._sent_summary = dict(self.summary_data)
+        self._sent_metrics = self._build_metrics_table()
+        self._sent_ring = (len(self.rings), self.rings.version)
+        metrics_live_json = json.dumps(self._sent_metrics)
         summary_cards = f"""
         <div class="data-grid">
             <div class="data-card" data-key="推进行程">
                 <div class="data-label">推进行程</div>
-                <div class="data-value">{self.summary_data["推进行程"]} <span class="data-unit">mm</span></div>
+                <div class="data-value"><span class="value-text">{self.summary_data["推进行程"]}</span> <span class="data-unit">mm</span></div>
             </div>
             <div class="data-card" data-key="瞬时出土量">
                 <div class="data-label">瞬时出土量</div>
-                <div class="data-value">{self.summary_data["瞬时出土量"]} <span class="data-unit">t/h</span></div>
+                <div class="data-value"><span class="value-text">{self.summary_data["瞬时出土量"]}</span> <span class="data-unit">t/h</span></div>
             </div>
             <div class="data-card" data-key="环出土量">
                 <div class="data-label">环出土量</div>
-                <div class="data-value">{self.summary_data["环出土量"]} <span class="data-unit">t</span></div>
+                <div class="data-value"><span class="value-text">{self.summary_data["环出土量"]}</span> <span class="data-unit">t</span></div>
             </div>
             <div class="data-card" data-key="当前状态">
                 <div class="data-label">当前状态</div>
-                <div class="data-value">{self.summary_data["当前状态"]} <span class="data-unit">%</span></div>
+                <div class="data-value"><span class="value-text">{self.summary_data["当前状态"]}</span> <span class="data-unit">%</span></div>
             </div>
         </div>
         """
         
-        ring_chart = self._clean_embed(self.create_ring_chart())
+        ring_chart_data = json.dumps(self.create_ring_chart(), ensure_ascii=False)
         
         # 构建HTML页面
         html_content = f"""
@@ -173,7 +446,7 @@ class HomePage:
         <head>
             <meta charset="UTF-8">
             <title>主页</title>
-            <script type="text/javascript" src="https://assets.pyecharts.org/assets/v5/echarts.min.js"></script>
+            <script type="text/javascript" src="{ECHARTS_URL}"></script>
             <style>
                 body {{
                     font-family: Arial, sans-serif;
@@ -201,12 +474,73 @@ class HomePage:
                     color: #333;
                     text-align: center;
                 }}
+                .link-status {{
+                    text-align: right;
+                    font-size: 13px;
+                    margin-bottom: 10px;
+                    color: #888;
+                }}
+                .link-status .link-label {{
+                    display: inline-block;
+                    padding: 2px 8px;
+                    border-radius: 10px;
+                    color: white;
+                    background-color: #bfbfbf;
+                }}
+                .link-status[data-state="up"] .link-label {{ background-color: #52c41a; }}
+                .link-status[data-state="degraded"] .link-label {{ background-color: #faad14; }}
+                .link-status[data-state="connecting"] .link-label {{ background-color: #1890ff; }}
+                .link-status[data-state="down"] .link-label {{ background-color: #f5222d; }}
+                .alarm-bar {{
+                    margin-bottom: 10px;
+                }}
+                .chart-range {{
+                    text-align: right;
+                    margin-bottom: 10px;
+                }}
+                .chart-range button {{
+                    padding: 4px 12px;
+                    margin-left: 6px;
+                    border: 1px solid #d9d9d9;
+                    border-radius: 4px;
+                    background-color: white;
+                    color: #333;
+                    cursor: pointer;
+                }}
+                .chart-range button.active {{
+                    background-color: #1890ff;
+                    border-color: #1890ff;
+                    color: white;
+                }}
+                .alarm-bar .alarm-item {{
+                    padding: 6px 10px;
+                    margin-bottom: 4px;
+                    border-radius: 4px;
+                    font-size: 13px;
+                    color: #a8071a;
+                    background-color: #fff1f0;
+                    border: 1px solid #ffa39e;
+                }}
                 .update-time {{
                     text-align: right;
                     color: #888;
                     font-size: 12px;
                     margin-top: 10px;
                 }}
+                .belt-scale {{
+                    display: flex;
+                    justify-content: space-around;
+                    padding: 10px;
+                    margin-bottom: 20px;
+                    border-radius: 8px;
+                    background-color: #f0f2f5;
+                    font-size: 14px;
+                    color: #666;
+                }}
+                .belt-scale .belt-value {{
+                    font-weight: bold;
+                    color: #333;
+                }}
                 .data-grid {{
                     display: grid;
                     grid-template-columns: repeat(4, 1fr);
@@ -312,13 +646,29 @@ class HomePage:
             <div class="chart-container">
                 <div class="chart-box">
                     <div class="chart-title">总数据汇总</div>
+                    <div class="link-status" id="linkStatus" data-state="connecting">
+                        PLC连接: <span class="link-label">连接中</span> <span class="link-detail"></span>
+                    </div>
+                    <div class="alarm-bar" id="alarmBar"></div>
                     {summary_cards}
-                    <div class="update-time">最后更新时间: {time.strftime('%Y-%m-%d %H:%M:%S')}</div>
+                    <div class="belt-scale" id="beltScale">
+                        <span>皮带秤 总累计 <span class="belt-value" data-key="cumulative_t">-</span> t</span>
+                        <span>本班 <span class="belt-value" data-key="shift_t">-</span> t</span>
+                        <span>第 <span class="belt-value" data-key="ring">-</span> 环 <span class="belt-value" data-key="ring_t">-</span> t</span>
+                        <span>瞬时 <span class="belt-value" data-key="flow_tph">-</span> t/h</span>
+                    </div>
+                    <div class="update-time">最后更新时间: <span class="update-stamp">{time.strftime('%Y-%m-%d %H:%M:%S')}</span></div>
                 </div>
                 <div class="chart-box">
                     <div class="chart-title">环号实时出土数据</div>
-                    {ring_chart}
-                    <div class="update-time">最后更新时间: {time.strftime('%Y-%m-%d %H:%M:%S')}</div>
+                    <div class="chart-range" id="chartRange">
+                        <button data-range="live" class="active">实时</button>
+                        <button data-range="shift">本班</button>
+                        <button data-range="day">24小时</button>
+                        <button data-range="all">全部</button>
+                    </div>
+                    <div id="ringChart" style="width:100%;height:360px;"></div>
+                    <div class="update-time">最后更新时间: <span class="update-stamp">{time.strftime('%Y-%m-%d %H:%M:%S')}</span></div>
                 </div>
             </div>
             
@@ -347,21 +697,202 @@ class HomePage:
             </div>
             
             <script>
-            const METRICS_ROWS = {metrics_json};
+            // 静态列: 名称,数据地址,数据类型,计算公式,公式输入值,单位；实时列: 实时值,数据时间
+            const METRICS_META = {metrics_json};
+            const METRICS_LIVE = {metrics_live_json};
+            function formatTime(ms) {{
+                if (!ms) return '-';
+                const d = new Date(ms);
+                const p = n => String(n).padStart(2, '0');
+                return d.getFullYear() + '-' + p(d.getMonth() + 1) + '-' + p(d.getDate()) + ' ' +
+                    p(d.getHours()) + ':' + p(d.getMinutes()) + ':' + p(d.getSeconds());
+            }}
+            const RING_CHART = {{ rings: [], values: [], stroke: [] }};
+            function cellText(v) {{
+                return (v !== undefined && v !== null) ? String(v) : '-';
+            }}
             function populateTable() {{
                 const tbody = document.getElementById('metricTBody');
+                if (tbody.rows.length === METRICS_META.length) return;
                 tbody.innerHTML = '';
-                METRICS_ROWS.forEach(r => {{
+                METRICS_META.forEach((meta, i) => {{
                     const tr = document.createElement('tr');
-                    const cols = ['名称','数据地址','数据类型','计算公式','公式输入值','单位','实时值','数据时间'];
-                    cols.forEach(k => {{
+                    const live = METRICS_LIVE[i];
+                    meta.concat([live[0], formatTime(live[1])]).forEach(v => {{
                         const td = document.createElement('td');
-                        td.textContent = (r[k] !== undefined && r[k] !== null) ? String(r[k]) : '-';
+                        td.textContent = cellText(v);
                         tr.appendChild(td);
                     }});
                     tbody.appendChild(tr);
                 }});
             }}
+            const RING_CHART_OPTION = {RING_CHART_OPTION_JSON};
+            const HISTORY_CHART_OPTION = {HISTORY_CHART_OPTION_JSON};
+            const HISTORY_CHART_TAGS = {json.dumps(HISTORY_CHART_TAGS, ensure_ascii=False)};
+            const SHIFT_START_HOURS = {json.dumps(list(SHIFT_START_HOURS))};
+            const MAX_CHART_POINTS = {MAX_CHART_POINTS};
+            let ringInstance = null;
+            // 'live' 为按环实时图表，其他为历史趋势的时间范围
+            let chartRange = 'live';
+            let historyWindow = null;
+            let zoomTimer = null;
+            // 历史查询序号，切换范围或缩放后较早查询的结果直接丢弃
+            let historyRequest = 0;
+            function ringChart() {{
+                return ringInstance;
+            }}
+            function applyChartPoints(chart) {{
+                RING_CHART.window = chart.window;
+                chart.points.forEach(p => {{
+                    const last = RING_CHART.rings.length - 1;
+                    if (last >= 0 && RING_CHART.rings[last] === p[0]) {{
+                        RING_CHART.values[last] = p[1];
+                        RING_CHART.stroke[last] = p[2];
+                    }} else {{
+                        RING_CHART.rings.push(p[0]);
+                        RING_CHART.values.push(p[1]);
+                        RING_CHART.stroke.push(p[2]);
+                    }}
+                }});
+                while (RING_CHART.rings.length > chart.window) {{
+                    RING_CHART.rings.shift();
+                    RING_CHART.values.shift();
+                    RING_CHART.stroke.shift();
+                }}
+                const instance = ringChart();
+                if (instance && chartRange === 'live') {{
+                    instance.setOption({{
+                        xAxis: [{{ data: RING_CHART.rings }}],
+                        series: [{{ data: RING_CHART.values }}, {{ data: RING_CHART.stroke }}]
+                    }}, {{ notMerge: false, lazyUpdate: true }});
+                }}
+            }}
+            function rangeStart(range) {{
+                const now = new Date();
+                if (range === 'day') return now.getTime() - 86400000;
+                if (range === 'shift') {{
+                    // 最近一个不晚于当前时间的交班时刻
+                    let start = 0;
+                    [0, 1].forEach(back => SHIFT_START_HOURS.forEach(hour => {{
+                        const d = new Date(now);
+                        d.setDate(d.getDate() - back);
+                        d.setHours(hour, 0, 0, 0);
+                        if (d <= now && d.getTime() > start) start = d.getTime();
+                    }}));
+                    return start;
+                }}
+                return 0;
+            }}
+            function loadHistory(startMs, endMs) {{
+                // 各系列分别查询已降采样的历史曲线，时间以秒传递，0 表示不限；结果经 historyLoaded 返回
+                historyRequest += 1;
+                HISTORY_CHART_TAGS.forEach(name => {{
+                    bridge.queryHistory(historyRequest, name, startMs / 1000, endMs / 1000, MAX_CHART_POINTS, 'lttb');
+                }});
+            }}
+            function applyHistory(request, name, payload) {{
+                const i = HISTORY_CHART_TAGS.indexOf(name);
+                if (request !== historyRequest || chartRange === 'live' || i < 0) return;
+                const series = [{{}}, {{}}];
+                series[i] = {{ data: JSON.parse(payload) }};
+                ringInstance.setOption({{ series: series }});
+            }}
+            function setChartRange(range) {{
+                if (!window.bridge && range !== 'live') return;
+                chartRange = range;
+                historyRequest += 1;
+                document.querySelectorAll('#chartRange button').forEach(btn => {{
+                    btn.classList.toggle('active', btn.dataset.range === range);
+                }});
+                if (range === 'live') {{
+                    ringInstance.setOption(RING_CHART_OPTION, {{ notMerge: true }});
+                    ringInstance.setOption({{
+                        xAxis: [{{ data: RING_CHART.rings }}],
+                        series: [{{ data: RING_CHART.values }}, {{ data: RING_CHART.stroke }}]
+                    }});
+                    return;
+                }}
+                const start = rangeStart(range);
+                historyWindow = [start, Date.now()];
+                const option = JSON.parse(JSON.stringify(HISTORY_CHART_OPTION));
+                // 固定横轴范围，缩放比例始终相对于整个时间范围
+                if (start) option.xAxis[0].min = start;
+                option.xAxis[0].max = historyWindow[1];
+                ringInstance.setOption(option, {{ notMerge: true }});
+                loadHistory(start, 0);
+            }}
+            function onChartZoom() {{
+                if (chartRange === 'live') return;
+                clearTimeout(zoomTimer);
+                zoomTimer = setTimeout(function() {{
+                    const zoom = ringInstance.getOption().dataZoom[0];
+                    if (zoom.startValue === undefined || zoom.endValue === undefined) return;
+                    loadHistory(Math.max(zoom.startValue, historyWindow[0]), zoom.endValue);
+                }}, 300);
+            }}
+            function applyLinkStatus(link) {{
+                const box = document.getElementById('linkStatus');
+                box.dataset.state = link.state;
+                box.querySelector('.link-label').textContent = link.label;
+                const parts = [];
+                if (link.state !== 'up' && link.current_outage_s) parts.push('已中断 ' + link.current_outage_s + ' 秒');
+                if (link.reconnects) parts.push('重连 ' + link.reconnects + ' 次');
+                if (link.last_reconnect_ms !== null) parts.push('上次重连耗时 ' + link.last_reconnect_ms + ' ms');
+                if (link.total_outage_s) parts.push('累计中断 ' + link.total_outage_s + ' 秒');
+                box.querySelector('.link-detail').textContent = parts.join('，');
+                box.title = link.error || '';
+            }}
+            function applyAlarms(alarms) {{
+                const bar = document.getElementById('alarmBar');
+                bar.innerHTML = '';
+                alarms.forEach(a => {{
+                    const item = document.createElement('div');
+                    item.className = 'alarm-item';
+                    item.textContent = formatTime(a[2]) + ' ' + a[0] + ': ' + a[1];
+                    bar.appendChild(item);
+                }});
+            }}
+            function applyBelt(belt) {{
+                document.querySelectorAll('#beltScale .belt-value').forEach(el => {{
+                    el.textContent = cellText(belt[el.dataset.key]);
+                }});
+                document.getElementById('beltScale').title = '本班开始: ' + formatTime(belt.shift_start);
+            }}
+            function applyUpdate(delta) {{
+                if (delta.summary) {{
+                    Object.keys(delta.summary).forEach(k => {{
+                        const el = document.querySelector('.data-card[data-key="' + k + '"] .value-text');
+                        if (el) el.textContent = delta.summary[k];
+                    }});
+                }}
+                if (delta.metrics) {{
+                    const tbody = document.getElementById('metricTBody');
+                    Object.keys(delta.metrics).forEach(i => {{
+                        const live = delta.metrics[i];
+                        METRICS_LIVE[i] = live;
+                        const tr = tbody.rows[i];
+                        if (tr) {{
+                            tr.cells[6].textContent = cellText(live[0]);
+                            tr.cells[7].textContent = formatTime(live[1]);
+                        }}
+                    }});
+                }}
+                if (delta.chart) {{
+                    applyChartPoints(delta.chart);
+                }}
+                if (delta.link) {{
+                    applyLinkStatus(delta.link);
+                }}
+                if (delta.belt) {{
+                    applyBelt(delta.belt);
+                }}
+                if (delta.alarms) {{
+                    applyAlarms(delta.alarms);
+                }}
+                if (delta.updated) {{
+                    document.querySelectorAll('.update-stamp').forEach(el => {{ el.textContent = delta.updated; }});
+                }}
+            }}
             function showMetric() {{
                 populateTable();
                 document.getElementById('metricModal').style.display = 'block';
@@ -370,6 +901,40 @@ class HomePage:
                 document.getElementById('metricModal').style.display = 'none';
             }}
             document.addEventListener('DOMContentLoaded', function() {{
+                const initial = {ring_chart_data};
+                RING_CHART.rings = initial.xAxis[0].data.slice();
+                RING_CHART.values = initial.series[0].data.slice();
+                RING_CHART.stroke = initial.series[1].data.slice();
+                ringInstance = echarts.init(document.getElementById('ringChart'), 'light');
+                ringInstance.setOption(RING_CHART_OPTION);
+                ringInstance.setOption(initial);
+                ringInstance.on('datazoom', onChartZoom);
+                window.addEventListener('resize', () => ringInstance.resize());
+                document.querySelectorAll('#chartRange button').forEach(btn => {{
+                    btn.addEventListener('click', () => setChartRange(btn.dataset.range));
+                }});
+                // 图表首帧绘制完成的时间(相对页面开始加载)
+                const firstChart = new Promise(resolve => {{
+                    requestAnimationFrame(() => resolve(performance.now()));
+                }});
+                // 外壳的共享通道(重新)初始化后重新连接信号
+                let firstChartReported = false;
+                parent.shell.onChannel('home', function(objects) {{
+                    window.bridge = objects.home;
+                    bridge.dataUpdated.connect(function(payload) {{
+                        const delta = JSON.parse(payload);
+                        applyUpdate(delta);
+                        if (delta.seq) {{
+                            // 下一帧绘制完成后回报，用于统计读取到显示的延迟
+                            requestAnimationFrame(() => bridge.reportApplied(delta.seq));
+                        }}
+                    }});
+                    bridge.historyLoaded.connect(applyHistory);
+                    if (!firstChartReported) {{
+                        firstChartReported = true;
+                        firstChart.then(ms => bridge.reportFirstChart(ms));
+                    }}
+                }});
                 document.querySelectorAll('.data-card').forEach(function(card) {{
                     card.addEventListener('click', function() {{
                         showMetric();
@@ -387,84 +952,105 @@ class HomePage:
         </html>
         """
         
-        # 保存HTML到临时文件
-        home_html_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ui", "home_page.html")
-        with open(home_html_path, "w", encoding="utf-8") as f:
-            f.write(html_content)
-        
-        # 加载HTML到WebView
-        self.page.load(QUrl.fromLocalFile(home_html_path))
+        # 发布到外壳
+        self.shell.set_route(self.route, html_content)
     
 
-    def create_ring_chart(self):
-        labels = self.ring_data["rings"]
-        values_output = self.ring_data["values"]
-        values_stroke = self.ring_data["stroke_values"]
-        
-        bar = (
-            Bar(init_opts=opts.InitOpts(width="100%", height="360px", theme=ThemeType.LIGHT))
-            .add_xaxis(labels)
-            .add_yaxis(
-                "出土量(t)", 
-                values_output, 
-                category_gap="40%", 
-                yaxis_index=0,
-                itemstyle_opts=opts.ItemStyleOpts(color="#1890ff")
-            )
-            .extend_axis(
-                yaxis=opts.AxisOpts(
-                    name="推进行程(mm)",
-                    type_="value",
-                    min_=0,
-                    max_=250,
-                    position="right",
-                    axisline_opts=opts.AxisLineOpts(
-                        linestyle_opts=opts.LineStyleOpts(color="#d14a61")
-                    ),
-                    axislabel_opts=opts.LabelOpts(formatter="{value} mm"),
-                )
-            )
-            .set_global_opts(
-                tooltip_opts=opts.TooltipOpts(trigger="axis", axis_pointer_type="cross"),
-                legend_opts=opts.LegendOpts(is_show=True),
-                xaxis_opts=opts.AxisOpts(
-                    name="环号",
-                    name_location="center",
-                    name_gap=30,
-                    axislabel_opts=opts.LabelOpts(font_size=12)
-                ),
-                yaxis_opts=opts.AxisOpts(
-                    name="出土量(t)",
-                    name_location="end",
-                    name_gap=15,
-                    axisline_opts=opts.AxisLineOpts(
-                        linestyle_opts=opts.LineStyleOpts(color="#1890ff")
-                    )
-                )
-            )
-        )
-        
-        line = (
-            Line()
-            .add_xaxis(labels)
-            .add_yaxis(
-                "推进行程(mm)", 
-                values_stroke, 
-                yaxis_index=1,
-                label_opts=opts.LabelOpts(is_show=False),
-                itemstyle_opts=opts.ItemStyleOpts(color="#d14a61"),
-                linestyle_opts=opts.LineStyleOpts(width=2)
-            )
-        )
-        
-        bar.overlap(line)
-        return bar.render_embed()
+    def create_ring_chart(self, first=None, last=None, max_points=MAX_CHART_POINTS):
+        """生成环号图表的数据部分，与 RING_CHART_OPTION 合并后即为完整配置
 
-    def _clean_embed(self, embed_html: str) -> str:
+        first/last 为环号范围，都不指定时为最近 CHART_RINGS 环；数据直接取自按环统计表，不扫描历史数据。
+        环数超过 max_points 时(整段掘进)按出土量做 LTTB 降采样，推进行程取相同的环。
+        """
+        if first is None and last is None:
+            rings, values, stroke = self.rings.window(CHART_RINGS)
+        else:
+            rings, values, stroke = self.rings.between(
+                first if first is not None else float("-inf"),
+                last if last is not None else float("inf"))
+        if len(rings) > max_points:
+            kept = downsample_indices(range(len(values)), values, max_points)
+            rings = [rings[i] for i in kept]
+            values = [values[i] for i in kept]
+            stroke = [stroke[i] for i in kept]
+        return {
+            "xAxis": [{"data": rings}],
+            "series": [
+                {"data": values},
+                {"data": stroke}
+            ]
+        }
+
+    def query_history(self, name, start=None, end=None, max_points=MAX_CHART_POINTS, method="lttb"):
+        """查询标签历史曲线(已降采样)，环号图表切换到整班或整段掘进时由页面经 queryHistory 调用"""
+        if self.history is None:
+            return []
+        return query_series(self.history, name, start, end, max_points, method)
+
+
+class HomeBridge(QObject):
+    """主页数据推送桥，页面通过 dataUpdated 信号接收增量数据
+
+    历史曲线在查询线程中读取，读取整段掘进的数据时界面不会卡住，
+    结果经 historyLoaded(查询序号, 标签名称, JSON) 返回页面。
+    """
+    dataUpdated = pyqtSignal(str)
+    historyLoaded = pyqtSignal(int, str, str)
+    
+    def __init__(self, created_at, home=None):
+        super().__init__()
+        self.created_at = created_at
+        self.home = home
+        self.first_chart_ms = None
+        self._executor = None
+        # 页面最新的查询序号，排队中的较早查询不再读取
+        self._history_request = 0
+    
+    @pyqtSlot(float)
+    def reportFirstChart(self, page_ms):
+        """记录并输出首个图表的绘制耗时"""
+        if self.first_chart_ms is not None:
+            return
+        self.first_chart_ms = (time.perf_counter() - self.created_at) * 1000.0
+        print(f"首屏图表耗时: {self.first_chart_ms:.0f} ms (页面加载后 {page_ms:.0f} ms)")
+
+    @pyqtSlot(int)
+    def reportApplied(self, seq):
+        """页面已绘制序号为 seq 的推送"""
+        if self.home is not None:
+            self.home.record_latency(seq)
+
+    @pyqtSlot(int, str, float, float, int, str)
+    def queryHistory(self, request, name, start, end, max_points, method):
+        """页面查询历史曲线，start/end 为秒级时间戳(<=0 表示不限)
+
+        在查询线程中读取，完成后发出 historyLoaded(request, name, [[毫秒, 值], ...] 的JSON)。
+        """
+        self._history_request = max(self._history_request, request)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history-query")
+        self._executor.submit(self._query_history, request, name,
+                              start if start > 0 else None, end if end > 0 else None,
+                              max_points if max_points > 0 else MAX_CHART_POINTS, method or "lttb")
+
+    def _query_history(self, request, name, start, end, max_points, method):
+        if request < self._history_request:
+            return
         try:
-            m = re.search(r"<body[^>]*>([\s\S]*?)</body>", embed_html)
-            if m:
-                return m.group(1)
-            return embed_html
-        except Exception:
-            return embed_html
+            points = self.home.query_history(name, start, end, max_points, method)
+        except (OSError, ValueError) as e:
+            print(f"Error querying history of {name}: {e}")
+            points = []
+        # 查询线程中发出的信号排队到界面线程再转发给页面
+        self.historyLoaded.emit(request, name, json.dumps(points))
+
+    def close(self):
+        """停止查询线程，丢弃排队中的查询"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+class SnapshotNotifier(QObject):
+    """采集线程到界面线程的通知，跨线程发出的信号以排队方式在界面线程执行"""
+    ready = pyqtSignal()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+连接监控模块
+维护PLC连接的状态机(connecting/up/degraded/down)，计算重连退避时间并统计中断时长
+"""
+
+import time
+import random
+import threading
+from collections import deque
+
+STATE_CONNECTING = "connecting"
+STATE_UP = "up"
+STATE_DEGRADED = "degraded"
+STATE_DOWN = "down"
+
+STATE_LABELS = {
+    STATE_CONNECTING: "连接中",
+    STATE_UP: "正常",
+    STATE_DEGRADED: "异常",
+    STATE_DOWN: "断开",
+}
+
+# 重连退避: 首次等待 BACKOFF_BASE 秒，每次失败翻倍，不超过 BACKOFF_MAX 秒
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 60.0
+# 连接仍在但连续失败达到该次数时视为断开，主动关闭连接后重连
+DEGRADED_LIMIT = 3
+# 保留的最近状态变化记录数
+HISTORY_SIZE = 50
+
+
+class LinkSupervisor:
+    """连接状态机
+
+    状态变化:
+        down/初始 -> connecting -> up            连接成功
+        connecting -> down                       连接失败，按带抖动的指数退避等待后重试
+        up -> degraded                           读取或心跳失败但连接仍在，标签标记为过期
+        degraded -> up                           再次读取成功
+        up/degraded -> down                      连接断开，或连续失败 DEGRADED_LIMIT 次
+
+    所有方法可在采集线程调用，status() 可在界面线程调用。
+    """
+
+    def __init__(self, backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX,
+                 degraded_limit=DEGRADED_LIMIT, clock=time.monotonic):
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.degraded_limit = degraded_limit
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._listeners = []
+        self.state = STATE_DOWN
+        self.since = clock()
+        self.last_error = ""
+        self.attempts = 0
+        self.failures = 0
+        self.reconnect_count = 0
+        self.last_reconnect_ms = None
+        self.last_outage_s = None
+        self.total_outage_s = 0.0
+        self.transitions = deque(maxlen=HISTORY_SIZE)
+        self._outage_started = None
+        self._down_started = None
+        self._ever_up = False
+
+    def add_listener(self, callback):
+        """注册状态变化回调 callback(old_state, new_state, reason)，在采集线程中调用"""
+        self._listeners.append(callback)
+
+    def _transition(self, state, reason=""):
+        old = self.state
+        if old == state:
+            return
+        now = self._clock()
+        with self._lock:
+            self.state = state
+            self.since = now
+            self.transitions.append((time.time(), old, state, reason))
+        for callback in self._listeners:
+            try:
+                callback(old, state, reason)
+            except Exception as e:
+                print(f"Error in link state listener: {e}")
+
+    def connecting(self):
+        """开始一次连接尝试"""
+        if self._down_started is None:
+            self._down_started = self._clock()
+        self._transition(STATE_CONNECTING)
+
+    def connected(self):
+        """连接成功，结束本次中断并记录重连耗时"""
+        now = self._clock()
+        with self._lock:
+            # 首次连接不计入重连，之后每次从检测到断开到恢复连接的时间为重连耗时
+            if self._ever_up and self._down_started is not None:
+                self.last_reconnect_ms = (now - self._down_started) * 1000.0
+                self.reconnect_count += 1
+            self._ever_up = True
+            self._end_outage(now)
+            self._down_started = None
+            self.attempts = 0
+            self.failures = 0
+        self._transition(STATE_UP)
+
+    def connect_failed(self, reason):
+        """连接失败
+
+        Returns:
+            下次重连前应等待的秒数
+        """
+        self.attempts += 1
+        self.last_error = reason
+        if self._ever_up and self._outage_started is None:
+            self._outage_started = self._clock()
+        self._transition(STATE_DOWN, reason)
+        return self.next_delay()
+
+    def next_delay(self):
+        """带抖动的指数退避: 在 [d/2, d] 内随机取值，避免多台设备同时重连"""
+        delay = min(self.backoff_max, self.backoff_base * (2 ** max(0, self.attempts - 1)))
+        return delay / 2 + random.random() * delay / 2
+
+    def failed(self, reason, link_lost):
+        """一次读取或心跳失败
+
+        Args:
+            reason: 错误信息
+            link_lost: 连接是否已断开
+
+        Returns:
+            True 表示应关闭连接并重连
+        """
+        self.failures += 1
+        self.last_error = reason
+        now = self._clock()
+        if self._outage_started is None:
+            self._outage_started = now
+        if link_lost or self.failures >= self.degraded_limit:
+            self._down_started = now
+            self._transition(STATE_DOWN, reason)
+            return True
+        self._transition(STATE_DEGRADED, reason)
+        return False
+
+    def succeeded(self):
+        """一次读取成功"""
+        if self.state == STATE_UP and not self.failures:
+            return
+        with self._lock:
+            self.failures = 0
+            self._end_outage(self._clock())
+        self._transition(STATE_UP)
+
+    def _end_outage(self, now):
+        if self._outage_started is not None:
+            self.last_outage_s = now - self._outage_started
+            self.total_outage_s += self.last_outage_s
+            self._outage_started = None
+
+    def status(self):
+        """供界面显示的状态与统计"""
+        now = self._clock()
+        with self._lock:
+            outage = now - self._outage_started if self._outage_started is not None else 0.0
+            return {
+                "state": self.state,
+                "label": STATE_LABELS[self.state],
+                "since_s": round(now - self.since, 1),
+                "error": self.last_error if self.state != STATE_UP else "",
+                "attempts": self.attempts,
+                "reconnects": self.reconnect_count,
+                "last_reconnect_ms": None if self.last_reconnect_ms is None else round(self.last_reconnect_ms),
+                "last_outage_s": None if self.last_outage_s is None else round(self.last_outage_s, 1),
+                "current_outage_s": round(outage, 1),
+                "total_outage_s": round(self.total_outage_s + outage, 1),
+            }
@@ -6,15 +6,116 @@
 整合所有UI组件并启动应用
 """
 
+import os
 import sys
-from PyQt5.QtWidgets import QApplication
-from PyQt5.QtCore import Qt
+import time
+from functools import partial
+
+# 冷启动计时起点
+STARTED = time.perf_counter()
+
+from PyQt5.QtWidgets import QApplication, QMessageBox
+from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtGui import QGuiApplication
+# 页面模块延迟导入，但 QtWebEngineWidgets 必须在创建 QApplication 之前导入
+from PyQt5 import QtWebEngineWidgets  # noqa: F401
 from ui.base_ui import BaseUI
-from home import HomePage
-from project import ProjectPage
-from plc_link import PLCLinkPage
-from setting import SettingPage
+from shell import AppShell
+from web_scheme import register_scheme, check_assets, AppSchemeHandler, AssetError
+from project_store import get_store
+from config_service import get_config
+from process_stats import resident_memory_mb, process_tree_memory_mb
+
+# 主页显示后开始预创建其他页面的等待时间(毫秒)，每个页面之间也间隔该时间
+PREWARM_DELAY_MS = 2000
+
+
+def create_home_page(shell):
+    from home import HomePage
+    return HomePage(shell)
+
+
+def create_project_page(shell):
+    from project import ProjectPage
+    return ProjectPage(shell)
+
+
+def create_plc_link_page(shell):
+    from plc_link import PLCLinkPage
+    return PLCLinkPage(shell)
+
+
+def create_setting_page(shell):
+    from setting import SettingPage
+    return SettingPage(shell)
+
+
+def report_startup(app, main_window):
+    """输出冷启动耗时与内存
+
+    设置环境变量 PLC_EXIT_AFTER_START=毫秒 时，在启动完成后等待该时间再次统计内存并退出；
+    同时设置 PLC_TAB_ROUNDS=轮数 时，退出前依次切换全部页面并统计切换耗时。供 benchmark.py 比较。
+    """
+    elapsed = (time.perf_counter() - STARTED) * 1000.0
+    memory = resident_memory_mb()
+    tree = process_tree_memory_mb()
+    pages = len(main_window.page_objects)
+    memory_text = f"{memory:.1f} MB" if memory is not None else "未知"
+    tree_text = f"{tree:.1f} MB" if tree is not None else "未知"
+    print(f"冷启动耗时 {elapsed:.0f} ms, 常驻内存 {memory_text}(含渲染进程 {tree_text}), "
+          f"已创建页面 {pages} 个")
+    settle = os.environ.get("PLC_EXIT_AFTER_START")
+    if not settle:
+        return
+
+    def finish():
+        print(f"STARTUP cold_start_ms={elapsed:.0f} rss_mb={memory or 0:.1f} pages={pages} "
+              f"settled_rss_mb={resident_memory_mb() or 0:.1f} settled_pages={len(main_window.page_objects)} "
+              f"tree_mb={process_tree_memory_mb() or 0:.1f}")
+        rounds = int(os.environ.get("PLC_TAB_ROUNDS", "0") or 0)
+        if rounds > 0:
+            run_tab_switches(app, main_window, rounds)
+        else:
+            app.quit()
+
+    QTimer.singleShot(int(settle), finish)
+
+
+def run_tab_switches(app, main_window, rounds, timeout_ms=2000):
+    """依次切换全部页面 rounds 轮，输出切换耗时与内存后退出
+
+    切换由页面端绘制后回报，超过 timeout_ms 未回报的切换记为丢失。
+    """
+    shows = [main_window.show_home_page, main_window.show_project_page,
+             main_window.show_plc_link_page, main_window.show_settings_page]
+    samples = []
+    state = {"remaining": rounds * len(shows), "step": 0, "lost": 0}
+
+    def next_switch(_name=None, ms=None):
+        if ms is not None:
+            samples.append(ms)
+        if state["remaining"] == 0:
+            ordered = sorted(samples) or [0.0]
+            print(f"TABS switches={len(samples)} lost={state['lost']} "
+                  f"avg_ms={sum(ordered) / len(ordered):.1f} p95_ms={ordered[int(len(ordered) * 0.95)]:.1f} "
+                  f"max_ms={ordered[-1]:.1f} tree_mb={process_tree_memory_mb() or 0:.1f}")
+            app.quit()
+            return
+        state["remaining"] -= 1
+        state["step"] += 1
+        step = state["step"]
+        # 回到事件循环后再切换，切换完成由页面端回报
+        QTimer.singleShot(0, shows[step % len(shows)])
+        QTimer.singleShot(timeout_ms, lambda: timed_out(step))
+
+    def timed_out(step):
+        if state["step"] == step:
+            state["lost"] += 1
+            next_switch()
+
+    main_window.shell.on_switched = next_switch
+    next_switch()
+
 
 def main():
     """主函数"""
@@ -27,25 +128,40 @@ def main():
     except Exception:
         pass
 
+    register_scheme()
     app = QApplication(sys.argv)
+    # 图表运行库随程序提供，缺失时直接报错退出，不在没有网络的现场静默显示空白图表
+    try:
+        check_assets()
+    except AssetError as e:
+        print(f"Error checking assets: {e}")
+        QMessageBox.critical(None, "缺少运行库", str(e))
+        sys.exit(1)
+    scheme_handler = AppSchemeHandler(app).install()
     
     # 创建主窗口
     main_window = BaseUI()
     
-    # 创建各页面
-    home_page = HomePage()
-    project_page = ProjectPage()
-    plc_link_page = PLCLinkPage()
-    setting_page = SettingPage()
-    
-    # 添加页面到主窗口
-    main_window.add_page(home_page.get_page(), "home")
-    main_window.add_page(project_page.get_page(), "project")
-    main_window.add_page(plc_link_page.get_page(), "plc_link")
-    main_window.add_page(setting_page.get_page(), "setting")
+    # 全部页面共用一个 WebView，各页面作为外壳中的路由，首次打开时才创建
+    shell = AppShell()
+    main_window.set_shell(shell)
+    main_window.add_page(partial(create_home_page, shell), "home")
+    main_window.add_page(partial(create_project_page, shell), "project")
+    main_window.add_page(partial(create_plc_link_page, shell), "plc_link")
+    main_window.add_page(partial(create_setting_page, shell), "setting")
+    app.aboutToQuit.connect(main_window.shutdown_pages)
+    app.aboutToQuit.connect(get_store().close)
     
     # 显示主窗口
     main_window.show()
+    # 环境变量 PLC_EAGER_PAGES=1 时启动即创建全部页面，用于对比
+    if os.environ.get("PLC_EAGER_PAGES") == "1":
+        for page_name in list(main_window.page_factories):
+            main_window.ensure_page(page_name)
+    elif get_config().settings().get("prewarm_pages", True):
+        main_window.prewarm(PREWARM_DELAY_MS)
+    # 主页在窗口显示后的第一个事件循环中创建，统计放在其后
+    QTimer.singleShot(0, lambda: report_startup(app, main_window))
     
     # 启动应用
     sys.exit(app.exec_())
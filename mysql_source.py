@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+MySQL数据源模块
+通过有界连接池与服务端预编译语句增量读取网关写入MySQL/MariaDB的PLC数据
+"""
+
+import queue
+import threading
+
+from data_source import TableSource, SourceError
+
+try:
+    import mysql.connector as mysql_connector
+except ImportError:  # 未安装驱动时仅在选择MySQL设备类型后报错
+    mysql_connector = None
+
+DEFAULT_PORT = 3306
+DEFAULT_DATABASE = "plc"
+DEFAULT_POOL_SIZE = 2
+
+
+class _Connection:
+    """池中的一个连接，按SQL文本缓存服务端预编译的游标"""
+
+    __slots__ = ("conn", "cursors")
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.cursors = {}
+
+    def execute(self, sql, params):
+        cursor = self.cursors.get(sql)
+        if cursor is None:
+            # prepared=True: 首次执行时在服务端 PREPARE，之后只传参数
+            cursor = self.conn.cursor(prepared=True)
+            self.cursors[sql] = cursor
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+    def close(self):
+        for cursor in self.cursors.values():
+            try:
+                cursor.close()
+            except Exception:
+                pass
+        self.cursors.clear()
+        try:
+            self.conn.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """有界连接池
+
+    最多同时存在 size 个连接，空闲连接在刷新周期之间复用；取连接等待超过 timeout 时报错，
+    出错的连接直接丢弃，下次按需重新创建。
+    """
+
+    def __init__(self, factory, size=DEFAULT_POOL_SIZE):
+        self._factory = factory
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max(1, size))
+        self.created = 0
+
+    def acquire(self, timeout):
+        if not self._slots.acquire(timeout=timeout):
+            raise SourceError("等待数据库连接超时")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            conn = _Connection(self._factory())
+        except Exception:
+            self._slots.release()
+            raise
+        self.created += 1
+        return conn
+
+    def release(self, conn):
+        self._idle.put(conn)
+        self._slots.release()
+
+    def discard(self, conn):
+        conn.close()
+        self._slots.release()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class MySQLSource(TableSource):
+    """MySQL/MariaDB数据表数据源
+
+    连接参数取自 plc_settings 的 address/port/username/password，数据库名为 database(默认 plc)。
+    默认以自增主键 id 作为水位线，范围扫描走主键索引。查询在与连接池等大的工作线程池中执行，
+    连接超时与读取超时均取 plc_settings.timeout。
+    """
+
+    placeholder = "%s"
+    default_watermark = "id"
+    errors = (mysql_connector.Error,) if mysql_connector is not None else ()
+
+    def __init__(self, settings, registry):
+        super().__init__(settings, registry)
+        self.port = int(settings.get("port") or DEFAULT_PORT)
+        self.database = settings.get("database", DEFAULT_DATABASE)
+        self.workers = max(1, int(settings.get("pool_size", DEFAULT_POOL_SIZE)))
+        self._pool = None
+
+    def describe(self):
+        return f"MySQL({self.address}:{self.port}/{self.database})"
+
+    def _create_connection(self):
+        timeout = max(1, int(round(self.timeout)))
+        return mysql_connector.connect(
+            host=self.address,
+            port=self.port,
+            user=self.settings.get("username", ""),
+            password=self.settings.get("password", ""),
+            database=self.database,
+            connection_timeout=timeout,
+            read_timeout=timeout,
+            write_timeout=timeout,
+            autocommit=True,
+        )
+
+    def _connect_blocking(self):
+        if mysql_connector is None:
+            raise SourceError("未安装 mysql-connector-python，无法连接MySQL")
+        if self._pool is None:
+            self._pool = ConnectionPool(self._create_connection, self.workers)
+        # 取一个连接验证可用，之后留在池中复用
+        self._pool.release(self._pool.acquire(self.timeout))
+
+    def _query(self, sql, params):
+        if self._pool is None:
+            raise SourceError("MySQL未连接")
+        # 空闲连接可能已被服务器关闭(wait_timeout)，丢弃后用新连接重试一次
+        for attempt in range(2):
+            conn = self._pool.acquire(self.timeout)
+            try:
+                rows = conn.execute(sql, params)
+            except self.errors:
+                self._pool.discard(conn)
+                if attempt:
+                    raise
+                continue
+            self._pool.release(conn)
+            return rows
+
+    def _close_blocking(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+
+    def _abandon(self):
+        # 被占用的连接随旧连接池一起丢弃，重新连接时创建新的连接池
+        self._pool = None
@@ -6,55 +6,59 @@ PLC连接模块
 负责PLC连接设置相关功能
 """
 
-import os
-import json
-from PyQt5.QtWebEngineWidgets import QWebEngineView
-from PyQt5.QtCore import QUrl, QSettings, QObject, pyqtSlot
-from PyQt5.QtWebChannel import QWebChannel
+from PyQt5.QtCore import QObject, pyqtSlot
+from project_store import DEFAULT_PLC_SETTINGS, get_store
+
+def load_active_plc_settings():
+    """加载当前运行项目的PLC设置"""
+    return get_store().active_plc_settings()
+
+def load_enabled_projects():
+    """加载全部启用项目的PLC设置，用于同时采集多台PLC
+
+    Returns:
+        [(name_en, plc_settings, is_active), ...]，enabled 为 false 的项目被跳过；
+        没有项目时返回一项默认设置
+    """
+    enabled = []
+    seen = set()
+    for i, p in enumerate(get_store().projects()):
+        if p.get("enabled", True) is False:
+            continue
+        name = p.get("name_en") or f"project{i + 1}"
+        if name in seen:
+            print(f"Duplicate project name_en {name}, skipped")
+            continue
+        seen.add(name)
+        enabled.append((name, {**DEFAULT_PLC_SETTINGS, **(p.get("plc_settings") or {})},
+                        bool(p.get("is_active"))))
+    if not enabled:
+        enabled.append(("default", dict(DEFAULT_PLC_SETTINGS), True))
+    elif not any(active for _, _, active in enabled):
+        name, settings, _ = enabled[0]
+        enabled[0] = (name, settings, True)
+    return enabled
 
 class PLCLinkPage:
     """PLC连接页面类"""
+
+    route = "plc_link"
     
-    def __init__(self):
-        self.page = QWebEngineView()
+    def __init__(self, shell):
+        self.shell = shell
         self.bridge = PLCLinkBridge()
-        self.channel = QWebChannel(self.page.page())
-        self.channel.registerObject('bridge', self.bridge)
-        self.page.page().setWebChannel(self.channel)
+        shell.add_route(self.route, self.bridge)
+        get_store().add_listener(self._on_projects_changed)
         self.generate_page()
     
-    def get_page(self):
-        """获取页面组件"""
-        return self.page
-    
     def load_plc_settings(self):
-        """从JSON文件加载当前项目的PLC设置"""
-        projects_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "project.json")
-        default_settings = {
-            "device_type": "S7",
-            "byte_order": "ABCD",
-            "heartbeat": 30,
-            "timeout": 10000,
-            "refresh_interval_ms": 60000,
-            "address": "192.168.1.10",
-            "port": 102,
-            "username": "",
-            "password": ""
-        }
-        
-        if os.path.exists(projects_path):
-            try:
-                with open(projects_path, 'r', encoding='utf-8') as f:
-                    projects = json.load(f)
-                    for p in projects:
-                        if p.get("is_active"):
-                            return {**default_settings, **p.get("plc_settings", {})}
-                    if projects:
-                        return {**default_settings, **projects[0].get("plc_settings", {})}
-            except Exception as e:
-                print(f"Error loading PLC settings: {e}")
-        
-        return default_settings
+        """加载当前项目的PLC设置"""
+        return load_active_plc_settings()
+
+    def _on_projects_changed(self, source):
+        """其他页面或外部修改了项目数据时重新生成页面，本页保存的修改不需要重新加载"""
+        if source is not self.bridge:
+            self.generate_page()
     
     def generate_page(self):
         """生成PLC连接页面内容"""
@@ -67,7 +71,6 @@ class PLCLinkPage:
         <head>
             <meta charset="UTF-8">
             <title>PLC连接设置</title>
-            <script src="qrc:///qtwebchannel/qwebchannel.js"></script>
             <style>
                 body {
                     font-family: Arial, sans-serif;
@@ -284,10 +287,12 @@ class PLCLinkPage:
             document.addEventListener('DOMContentLoaded', function(){
                 initValues();
                 
-                new QWebChannel(qt.webChannelTransport, function(channel){
-                    window.bridge = channel.objects.bridge;
-                    
-                    document.getElementById('saveBtn').addEventListener('click', function(){
+                // 外壳的共享通道(重新)初始化后更新桥接对象
+                parent.shell.onChannel('plc_link', function(objects){
+                    window.bridge = objects.plc_link;
+                });
+                
+                document.getElementById('saveBtn').addEventListener('click', function(){
                         var data = {
                             device_type: document.getElementById('device_type').value,
                             byte_order: document.getElementById('byte_order').value,
@@ -306,7 +311,6 @@ class PLCLinkPage:
                             data.port, data.username, data.password
                         );
                         alert('连接设置已保存');
-                    });
                 });
             });
             </script>
@@ -325,64 +329,25 @@ class PLCLinkPage:
         html_content = html_content.replace("__USERNAME__", settings.get("username", ""))
         html_content = html_content.replace("__PASSWORD__", settings.get("password", ""))
         
-        # 保存HTML到临时文件
-        html_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ui", "plc_link_page.html")
-        
-        # Ensure directory exists
-        os.makedirs(os.path.dirname(html_path), exist_ok=True)
-        
-        with open(html_path, "w", encoding="utf-8") as f:
-            f.write(html_content)
-        
-        # 加载HTML到WebView
-        self.page.load(QUrl.fromLocalFile(html_path))
+        # 发布到外壳，内容变化时外壳重新加载该页面
+        self.shell.set_route(self.route, html_content)
 
 class PLCLinkBridge(QObject):
     @pyqtSlot(str, str, int, int, int, str, int, str, str)
     def saveSettings(self, device_type, byte_order, heartbeat, timeout, refresh_ms, address, port, username, password):
-        projects_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "project.json")
         try:
-            projects = []
-            if os.path.exists(projects_path):
-                with open(projects_path, 'r', encoding='utf-8') as f:
-                    projects = json.load(f)
-            
-            # Update active project settings
-            updated = False
-            for p in projects:
-                if p.get("is_active"):
-                    p["plc_settings"] = {
-                        "device_type": device_type,
-                        "byte_order": byte_order,
-                        "heartbeat": int(heartbeat),
-                        "timeout": int(timeout),
-                        "refresh_interval_ms": int(refresh_ms),
-                        "address": address,
-                        "port": int(port),
-                        "username": username,
-                        "password": password
-                    }
-                    updated = True
-                    break
-            
-            # If no active project found but projects exist, update the first one
-            if not updated and projects:
-                projects[0]["plc_settings"] = {
-                    "device_type": device_type,
-                    "byte_order": byte_order,
-                    "heartbeat": int(heartbeat),
-                    "timeout": int(timeout),
-                    "refresh_interval_ms": int(refresh_ms),
-                    "address": address,
-                    "port": int(port),
-                    "username": username,
-                    "password": password
-                }
-                updated = True
-                
-            if updated:
-                with open(projects_path, 'w', encoding='utf-8') as f:
-                    json.dump(projects, f, indent=4, ensure_ascii=False)
-                    
+            settings = {
+                "device_type": device_type,
+                "byte_order": byte_order,
+                "heartbeat": int(heartbeat),
+                "timeout": int(timeout),
+                "refresh_interval_ms": int(refresh_ms),
+                "address": address,
+                "port": int(port),
+                "username": username,
+                "password": password
+            }
+            # 更新当前运行的项目，没有运行项目时更新第一个项目
+            get_store().update_active_plc_settings(settings, source=self)
         except Exception as e:
             print(f"Error saving PLC settings: {e}")
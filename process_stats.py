@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+进程资源统计模块
+获取当前进程及其子进程(QtWebEngine 渲染进程等)的常驻内存，用于启动与页面切换的性能测量
+"""
+
+import os
+import sys
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def _windows_api():
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [
+            ("cb", wintypes.DWORD),
+            ("PageFaultCount", wintypes.DWORD),
+            ("PeakWorkingSetSize", ctypes.c_size_t),
+            ("WorkingSetSize", ctypes.c_size_t),
+            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+            ("PagefileUsage", ctypes.c_size_t),
+            ("PeakPagefileUsage", ctypes.c_size_t),
+        ]
+
+    class PROCESSENTRY32W(ctypes.Structure):
+        _fields_ = [
+            ("dwSize", wintypes.DWORD),
+            ("cntUsage", wintypes.DWORD),
+            ("th32ProcessID", wintypes.DWORD),
+            ("th32DefaultHeapID", ctypes.c_size_t),
+            ("th32ModuleID", wintypes.DWORD),
+            ("cntThreads", wintypes.DWORD),
+            ("th32ParentProcessID", wintypes.DWORD),
+            ("pcPriClassBase", ctypes.c_long),
+            ("dwFlags", wintypes.DWORD),
+            ("szExeFile", ctypes.c_wchar * 260),
+        ]
+
+    kernel32 = ctypes.windll.kernel32
+    psapi = ctypes.windll.psapi
+    kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+    kernel32.OpenProcess.restype = wintypes.HANDLE
+    kernel32.CreateToolhelp32Snapshot.restype = wintypes.HANDLE
+    return ctypes, kernel32, psapi, PROCESS_MEMORY_COUNTERS, PROCESSENTRY32W
+
+
+def _windows_working_set(handle=None):
+    ctypes, kernel32, psapi, counters_type, _ = _windows_api()
+    counters = counters_type()
+    counters.cb = ctypes.sizeof(counters)
+    if handle is None:
+        handle = kernel32.GetCurrentProcess()
+    if not psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+        return None
+    return counters.WorkingSetSize
+
+
+def _windows_children():
+    """{父进程ID: [子进程ID, ...]}"""
+    ctypes, kernel32, _, _, entry_type = _windows_api()
+    snapshot = kernel32.CreateToolhelp32Snapshot(0x2, 0)  # TH32CS_SNAPPROCESS
+    children = {}
+    try:
+        entry = entry_type()
+        entry.dwSize = ctypes.sizeof(entry)
+        ok = kernel32.Process32FirstW(snapshot, ctypes.byref(entry))
+        while ok:
+            children.setdefault(entry.th32ParentProcessID, []).append(entry.th32ProcessID)
+            ok = kernel32.Process32NextW(snapshot, ctypes.byref(entry))
+    finally:
+        kernel32.CloseHandle(snapshot)
+    return children
+
+
+def _windows_process_memory(pid):
+    _, kernel32, _, _, _ = _windows_api()
+    # PROCESS_QUERY_LIMITED_INFORMATION | PROCESS_VM_READ
+    handle = kernel32.OpenProcess(0x1000 | 0x0010, False, pid)
+    if not handle:
+        return 0
+    try:
+        return _windows_working_set(handle) or 0
+    finally:
+        kernel32.CloseHandle(handle)
+
+
+def _linux_children():
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # 进程名可能含空格，父进程ID在右括号之后的第2个字段
+        ppid = int(stat[stat.rindex(")") + 2:].split()[1])
+        children.setdefault(ppid, []).append(int(entry))
+    return children
+
+
+def _linux_process_memory(pid):
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return 0
+
+
+def resident_memory_mb():
+    """当前进程的常驻内存(MB)，无法获取时返回 None
+
+    只统计本进程，不包含 QtWebEngine 的渲染子进程。
+    """
+    try:
+        if sys.platform == "win32":
+            size = _windows_working_set()
+            return None if size is None else size / 1048576
+        if os.path.exists("/proc/self/statm"):
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1048576
+        # 其他系统只能取得峰值
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1048576 if sys.platform == "darwin" else peak / 1024
+    except Exception as e:
+        print(f"Error reading memory usage: {e}")
+        return None
+
+
+def process_tree_memory_mb():
+    """当前进程与全部子孙进程的常驻内存合计(MB)，无法获取时返回 None
+
+    QtWebEngine 的页面渲染在独立的子进程中，比较 WebView 数量的内存占用时应使用该值。
+    共享内存页会在各进程中重复计入，结果偏大，只适合做前后对比。
+    """
+    try:
+        if sys.platform == "win32":
+            children, measure = _windows_children(), _windows_process_memory
+        elif os.path.isdir("/proc"):
+            children, measure = _linux_children(), _linux_process_memory
+        else:
+            return resident_memory_mb()
+        total = 0
+        pending = [os.getpid()]
+        while pending:
+            pid = pending.pop()
+            total += measure(pid)
+            pending.extend(children.get(pid, ()))
+        return total / 1048576
+    except Exception as e:
+        print(f"Error reading memory usage: {e}")
+        return None
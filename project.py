@@ -8,50 +8,57 @@
 
 import os
 import json
-from PyQt5.QtWebEngineWidgets import QWebEngineView
-from PyQt5.QtCore import QUrl, QObject, pyqtSlot
-from PyQt5.QtWebChannel import QWebChannel
+from PyQt5.QtCore import QObject, pyqtSlot, pyqtSignal
 from PyQt5.QtWidgets import QFileDialog
+from project_store import get_store
+from history_export import ExportJob, format_for_path
+from project_import import import_projects, STATUS_OK
+
+# 批量导入项目的文件类型
+IMPORT_FILTERS = "项目文件 (*.json *.zip);;JSON (*.json);;ZIP (*.zip)"
+# 导出历史数据的文件类型，顺序与 history_export.FORMATS 一致
+EXPORT_FILTERS = "CSV (*.csv);;CSV gzip (*.csv.gz);;Parquet (*.parquet)"
+EXPORT_SUFFIXES = {"CSV (*.csv)": ".csv", "CSV gzip (*.csv.gz)": ".csv.gz", "Parquet (*.parquet)": ".parquet"}
+
+def to_js_projects(projects):
+    """项目列表转换为页面使用的格式"""
+    # Convert snake_case to camelCase for JS
+    js_projects = []
+    for p in projects:
+        js_p = {
+            "nameCN": p.get("name_cn", ""),
+            "nameEN": p.get("name_en", ""),
+            "current": p.get("is_active", False),
+            "plcSettings": p.get("plc_settings", {})
+        }
+        js_projects.append(js_p)
+    return js_projects
+
 
 class ProjectPage:
     """项目管理页面类"""
     
-    def __init__(self):
-        self.page = QWebEngineView()
+    route = "project"
+    
+    def __init__(self, shell):
+        self.shell = shell
         self.bridge = ProjectBridge()
-        self.channel = QWebChannel(self.page.page())
-        self.channel.registerObject('bridge', self.bridge)
-        self.page.page().setWebChannel(self.channel)
+        shell.add_route(self.route, self.bridge)
+        get_store().add_listener(self._on_projects_changed)
         self.generate_project_page()
-    
-    def get_page(self):
-        """获取页面组件"""
-        return self.page
+
+    def shutdown(self):
+        """退出时取消正在进行的历史数据导出"""
+        self.bridge.cancelExport()
     
     def load_projects(self):
-        """从JSON文件加载项目列表"""
-        projects_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "project.json")
-        default_projects = []
-        
-        if os.path.exists(projects_path):
-            try:
-                with open(projects_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    # Convert snake_case to camelCase for JS
-                    js_projects = []
-                    for p in data:
-                        js_p = {
-                            "nameCN": p.get("name_cn", ""),
-                            "nameEN": p.get("name_en", ""),
-                            "current": p.get("is_active", False),
-                            "plcSettings": p.get("plc_settings", {})
-                        }
-                        js_projects.append(js_p)
-                    return js_projects
-            except Exception as e:
-                print(f"Error loading projects: {e}")
-                return default_projects
-        return default_projects
+        """加载项目列表"""
+        return to_js_projects(get_store().projects())
+
+    def _on_projects_changed(self, source):
+        """其他页面或外部修改了项目数据时重新生成页面，本页保存的修改不需要重新加载"""
+        if source is not self.bridge:
+            self.generate_project_page()
 
     def generate_project_page(self):
         """生成项目管理页面内容"""
@@ -64,7 +71,6 @@ class ProjectPage:
         <head>
             <meta charset="UTF-8">
             <title>项目管理</title>
-            <script src="qrc:///qtwebchannel/qwebchannel.js"></script>
             <style>
                 body {
                     font-family: Arial, sans-serif;
@@ -112,6 +118,13 @@ class ProjectPage:
                 .btn-export:hover {
                     background-color: #36cfc9;
                 }
+                .btn-history {
+                    background-color: #fa8c16;
+                    color: white;
+                }
+                .btn-history:hover {
+                    background-color: #ffa940;
+                }
                 .btn-delete {
                     background-color: #ff4d4f;
                     color: white;
@@ -308,6 +321,45 @@ class ProjectPage:
                 .modal-btn-cancel:hover {
                     background-color: #e0e0e0;
                 }
+                .import-report {
+                    max-height: 240px;
+                    overflow-y: auto;
+                    margin-top: 10px;
+                    font-size: 13px;
+                }
+                .import-report table {
+                    width: 100%;
+                    border-collapse: collapse;
+                }
+                .import-report td {
+                    padding: 4px;
+                    border-bottom: 1px solid #f0f0f0;
+                    word-break: break-all;
+                }
+                .import-ok {
+                    color: #52c41a;
+                }
+                .import-failed {
+                    color: #ff4d4f;
+                }
+                .export-progress {
+                    height: 8px;
+                    background-color: #f0f0f0;
+                    border-radius: 4px;
+                    overflow: hidden;
+                    margin-top: 10px;
+                }
+                .export-progress-bar {
+                    height: 100%;
+                    width: 0;
+                    background-color: #fa8c16;
+                }
+                .export-status {
+                    margin-top: 10px;
+                    color: #666;
+                    font-size: 13px;
+                    word-break: break-all;
+                }
             </style>
         </head>
         <body>
@@ -317,6 +369,7 @@ class ProjectPage:
                 <div style="flex: 1;"></div>
                 <button class="action-btn btn-import" onclick="importProjects()">导入项目</button>
                 <button class="action-btn btn-export" onclick="exportProjects()">导出项目</button>
+                <button class="action-btn btn-history" onclick="showExportModal()">导出历史</button>
                 <button class="action-btn btn-new" onclick="showAddModal()">新建项目</button>
             </div>
             
@@ -379,13 +432,35 @@ class ProjectPage:
                     <div class="modal-header">
                         <h2>导入项目</h2>
                     </div>
+                    <p>可选择多个项目 JSON 文件(单个项目或项目数组)、ZIP 压缩包，或包含项目文件的文件夹</p>
+                    <div class="import-report" id="importReport"></div>
+                    <div class="modal-footer">
+                        <button type="button" class="modal-btn modal-btn-cancel" onclick="hideImportModal()">关闭</button>
+                        <button type="button" class="modal-btn modal-btn-save" onclick="importFromDirectory()">选择文件夹</button>
+                        <button type="button" class="modal-btn modal-btn-save" onclick="importFromFiles()">选择文件</button>
+                    </div>
+                </div>
+            </div>
+            
+            <!-- 导出历史数据模态框 -->
+            <div id="exportModal" class="modal">
+                <div class="modal-content">
+                    <div class="modal-header">
+                        <h2>导出历史数据</h2>
+                    </div>
+                    <div class="form-group">
+                        <label for="exportStart">开始时间(留空表示不限)</label>
+                        <input type="datetime-local" id="exportStart">
+                    </div>
                     <div class="form-group">
-                        <label for="importFile">选择JSON文件</label>
-                        <input type="file" id="importFile" accept="application/json">
+                        <label for="exportEnd">结束时间(留空表示不限)</label>
+                        <input type="datetime-local" id="exportEnd">
                     </div>
+                    <div class="export-progress"><div class="export-progress-bar" id="exportProgressBar"></div></div>
+                    <div class="export-status" id="exportStatus"></div>
                     <div class="modal-footer">
-                        <button type="button" class="modal-btn modal-btn-cancel" onclick="hideImportModal()">取消</button>
-                        <button type="button" class="modal-btn modal-btn-save" onclick="confirmImportProject()">导入</button>
+                        <button type="button" class="modal-btn modal-btn-cancel" id="exportCancelBtn" onclick="cancelExport()">关闭</button>
+                        <button type="button" class="modal-btn modal-btn-save" id="exportStartBtn" onclick="confirmExportHistory()">导出</button>
                     </div>
                 </div>
             </div>
@@ -395,14 +470,79 @@ class ProjectPage:
                 let selectedProjectId = null;
                 let fileInputEl = null;
                 let editingIndex = null;
-                let importFileEl = null;
+                let exporting = false;
                 
                 document.addEventListener('DOMContentLoaded', function(){
-                    new QWebChannel(qt.webChannelTransport, function(channel){
-                        window.bridge = channel.objects.bridge;
+                    // 外壳的共享通道(重新)初始化后更新桥接对象
+                    parent.shell.onChannel('project', function(objects){
+                        window.bridge = objects.project;
+                        bridge.exportStarted.connect(onExportStarted);
+                        bridge.exportProgress.connect(onExportProgress);
+                        bridge.exportFinished.connect(onExportFinished);
                     });
                 });
                 
+                function showExportModal() {
+                    if (!exporting) {
+                        document.getElementById('exportProgressBar').style.width = '0';
+                        document.getElementById('exportStatus').textContent = '';
+                    }
+                    document.getElementById('exportModal').style.display = 'block';
+                }
+                
+                function confirmExportHistory() {
+                    let currentProject = projects.find(p => p.current);
+                    if (selectedProjectId !== null && projects[selectedProjectId]) {
+                        currentProject = projects[selectedProjectId];
+                    }
+                    if (!currentProject) {
+                        alert('请先选择或激活一个项目');
+                        return;
+                    }
+                    if (!window.bridge) {
+                        alert('导出失败：桥接未初始化');
+                        return;
+                    }
+                    // 时间以秒传递，0 表示不限
+                    const toSeconds = id => {
+                        const value = document.getElementById(id).value;
+                        return value ? new Date(value).getTime() / 1000 : 0;
+                    };
+                    bridge.exportHistory(currentProject.nameEN, toSeconds('exportStart'), toSeconds('exportEnd'));
+                }
+                
+                function cancelExport() {
+                    if (exporting && window.bridge) {
+                        bridge.cancelExport();
+                    } else {
+                        document.getElementById('exportModal').style.display = 'none';
+                    }
+                }
+                
+                function onExportStarted(path) {
+                    exporting = true;
+                    document.getElementById('exportStartBtn').disabled = true;
+                    document.getElementById('exportCancelBtn').textContent = '取消';
+                    document.getElementById('exportProgressBar').style.width = '0';
+                    document.getElementById('exportStatus').textContent = '正在导出到 ' + path;
+                }
+                
+                function onExportProgress(done, total) {
+                    const percent = total > 0 ? Math.min(100, done * 100 / total) : 100;
+                    document.getElementById('exportProgressBar').style.width = percent + '%';
+                    document.getElementById('exportStatus').textContent = `已导出 ${done} / ${total} 行`;
+                }
+                
+                function onExportFinished(status, message) {
+                    exporting = false;
+                    document.getElementById('exportStartBtn').disabled = false;
+                    document.getElementById('exportCancelBtn').textContent = '关闭';
+                    if (status === 'done') {
+                        document.getElementById('exportProgressBar').style.width = '100%';
+                    }
+                    document.getElementById('exportStatus').textContent = message;
+                }
+                
                 function showAddModal() {
                     document.getElementById('addModal').style.display = 'block';
                     document.getElementById('projectNameCN').focus();
@@ -414,16 +554,12 @@ class ProjectPage:
                 }
                 
                 function showImportModal() {
-                    importFileEl = document.getElementById('importFile');
-                    if (importFileEl) {
-                        importFileEl.value = '';
-                    }
+                    document.getElementById('importReport').innerHTML = '';
                     document.getElementById('importModal').style.display = 'block';
                 }
                 
                 function hideImportModal() {
                     document.getElementById('importModal').style.display = 'none';
-                    importFileEl = null;
                 }
                 
                 function renderProjects() {
@@ -606,26 +742,6 @@ class ProjectPage:
                 // 初始化页面
                 renderProjects();
 
-                function validateImportedProject(p) {
-                    if (!p || typeof p !== 'object') return false;
-                    const neededKeys = ['name_cn','name_en','is_active','plc_settings'];
-                    for (const k of neededKeys) {
-                        if (!(k in p)) return false;
-                    }
-                    if (typeof p.name_cn !== 'string' || typeof p.name_en !== 'string') return false;
-                    if (typeof p.is_active !== 'boolean') return false;
-                    if (typeof p.plc_settings !== 'object' || p.plc_settings === null) return false;
-                    const ps = p.plc_settings;
-                    const plcNeeded = ['device_type','byte_order','heartbeat','timeout','refresh_interval_ms','address','port','username','password'];
-                    for (const k of plcNeeded) {
-                        if (!(k in ps)) return false;
-                    }
-                    if (typeof ps.device_type !== 'string' || typeof ps.byte_order !== 'string') return false;
-                    if (typeof ps.address !== 'string' || typeof ps.username !== 'string' || typeof ps.password !== 'string') return false;
-                    if (typeof ps.heartbeat !== 'number' || typeof ps.timeout !== 'number' || typeof ps.refresh_interval_ms !== 'number' || typeof ps.port !== 'number') return false;
-                    return true;
-                }
-
                 function hideEditModal() {
                     document.getElementById('editModal').style.display = 'none';
                     document.getElementById('editProjectForm').reset();
@@ -659,54 +775,50 @@ class ProjectPage:
                     }
                 }
                 
-                function confirmImportProject() {
-                    if (!importFileEl) {
-                        alert('请选择JSON文件');
+                function importFromFiles() {
+                    if (!window.bridge) {
+                        alert('导入失败：桥接未初始化');
                         return;
                     }
-                    const file = importFileEl.files && importFileEl.files[0];
-                    if (!file) {
-                        alert('请选择JSON文件');
+                    bridge.importProjectFiles(showImportReport);
+                }
+                
+                function importFromDirectory() {
+                    if (!window.bridge) {
+                        alert('导入失败：桥接未初始化');
                         return;
                     }
-                    const extOk = /\.json$/i.test(file.name);
-                    const typeOk = file.type === 'application/json';
-                    if (!extOk || !typeOk) {
-                        alert('仅允许上传JSON文件');
+                    bridge.importProjectDirectory(showImportReport);
+                }
+                
+                function showImportReport(resultJson) {
+                    // 取消选择时返回空字符串
+                    if (!resultJson) {
                         return;
                     }
-                    const reader = new FileReader();
-                    reader.onload = function(e) {
-                        try {
-                            const data = JSON.parse(e.target.result);
-                            if (!validateImportedProject(data)) {
-                                alert('导入失败：JSON结构不符合 project.json 规范');
-                                return;
-                            }
-                            const nameEN = data.name_en.trim();
-                            if (projects.some(p => p.nameEN.toLowerCase() === nameEN.toLowerCase())) {
-                                alert('导入失败：项目英文名已存在');
-                                return;
-                            }
-                            projects.push({
-                                id: Date.now(),
-                                nameCN: data.name_cn,
-                                nameEN: data.name_en,
-                                description: '',
-                                status: 'pending',
-                                createdAt: new Date().toISOString(),
-                                current: data.is_active === true ? (projects.length === 0 ? true : false) : false,
-                                plcSettings: data.plc_settings || {}
-                            });
-                            renderProjects();
-                            saveProjects();
-                            hideImportModal();
-                            alert('导入成功');
-                        } catch (err) {
-                            alert('导入失败：' + err.message);
-                        }
-                    };
-                    reader.readAsText(file, 'utf-8');
+                    const result = JSON.parse(resultJson);
+                    if (result.projects) {
+                        projects = result.projects;
+                        selectedProjectId = null;
+                        renderProjects();
+                    }
+                    // 来源名称来自文件，以文本方式显示
+                    const table = document.createElement('table');
+                    const summary = table.insertRow();
+                    const cell = summary.insertCell();
+                    cell.colSpan = 3;
+                    cell.textContent = `导入 ${result.imported} 个，失败 ${result.report.length - result.imported} 个`;
+                    result.report.forEach(item => {
+                        const row = table.insertRow();
+                        row.insertCell().textContent = item.source;
+                        row.insertCell().textContent = item.name_en;
+                        const status = row.insertCell();
+                        status.textContent = item.message;
+                        status.className = item.status === 'ok' ? 'import-ok' : 'import-failed';
+                    });
+                    const container = document.getElementById('importReport');
+                    container.innerHTML = '';
+                    container.appendChild(table);
                 }
             </script>
         </body>
@@ -716,20 +828,22 @@ class ProjectPage:
         # 替换初始值
         html_content = html_content.replace("__PROJECTS__", json.dumps(js_projects, ensure_ascii=False))
         
-        # 保存HTML到临时文件
-        html_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ui", "project_page.html")
-        os.makedirs(os.path.dirname(html_path), exist_ok=True)
-        
-        with open(html_path, "w", encoding="utf-8") as f:
-            f.write(html_content)
-        
-        # 加载HTML到WebView
-        self.page.load(QUrl.fromLocalFile(html_path))
+        # 发布到外壳，内容变化时外壳重新加载该页面
+        self.shell.set_route(self.route, html_content)
 
 class ProjectBridge(QObject):
+    # 历史数据导出在后台线程中运行，进度与结果通过信号转到界面线程
+    exportStarted = pyqtSignal(str)
+    exportProgress = pyqtSignal(int, int)
+    exportFinished = pyqtSignal(str, str)
+
+    def __init__(self):
+        super().__init__()
+        self.export_job = None
+
     @pyqtSlot(str)
     def saveProjects(self, projects_json):
-        """保存项目列表到JSON文件"""
+        """保存项目列表"""
         try:
             js_projects = json.loads(projects_json)
             # Convert camelCase back to snake_case for storage
@@ -742,10 +856,8 @@ class ProjectBridge(QObject):
                     "plc_settings": p.get("plcSettings", {})
                 }
                 db_projects.append(db_p)
-            
-            projects_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "project.json")
-            with open(projects_path, 'w', encoding='utf-8') as f:
-                json.dump(db_projects, f, indent=4, ensure_ascii=False)
+
+            get_store().replace_all(db_projects, source=self)
         except Exception as e:
             print(f"Error saving projects: {e}")
     
@@ -762,3 +874,64 @@ class ProjectBridge(QObject):
                     json.dump(obj, f, indent=2, ensure_ascii=False)
         except Exception as e:
             print(f"Error exporting project: {e}")
+
+    @pyqtSlot(str, float, float)
+    def exportHistory(self, name_en, start, end):
+        """选择文件后在后台导出项目的历史数据，start/end 为 0 表示不限"""
+        if self.export_job is not None and self.export_job.running:
+            return
+        try:
+            base_dir = os.path.dirname(os.path.abspath(__file__))
+            default_path = os.path.join(base_dir, f"history_{name_en}.csv")
+            filename, selected = QFileDialog.getSaveFileName(None, "导出历史数据", default_path, EXPORT_FILTERS)
+            if not filename:
+                return
+            # 未输入扩展名时按所选的文件类型补全
+            if format_for_path(filename) is None:
+                filename += EXPORT_SUFFIXES.get(selected, ".csv")
+            self.export_job = ExportJob(name_en, filename, start=start if start > 0 else None,
+                                        end=end if end > 0 else None,
+                                        on_progress=self.exportProgress.emit,
+                                        on_finished=self.exportFinished.emit)
+            self.exportStarted.emit(filename)
+            self.export_job.start()
+        except Exception as e:
+            print(f"Error exporting history: {e}")
+            self.exportFinished.emit("failed", f"导出失败: {e}")
+
+    @pyqtSlot()
+    def cancelExport(self):
+        """取消正在进行的历史数据导出"""
+        if self.export_job is not None:
+            self.export_job.cancel()
+
+    @pyqtSlot(result=str)
+    def importProjectFiles(self):
+        """选择项目 JSON 文件或 ZIP 压缩包批量导入，返回导入报告(JSON)"""
+        try:
+            base_dir = os.path.dirname(os.path.abspath(__file__))
+            filenames, _ = QFileDialog.getOpenFileNames(None, "导入项目", base_dir, IMPORT_FILTERS)
+            return self._import(filenames)
+        except Exception as e:
+            print(f"Error importing projects: {e}")
+            return ""
+
+    @pyqtSlot(result=str)
+    def importProjectDirectory(self):
+        """选择文件夹，导入其中(含子文件夹)的全部项目 JSON 文件，返回导入报告(JSON)"""
+        try:
+            base_dir = os.path.dirname(os.path.abspath(__file__))
+            directory = QFileDialog.getExistingDirectory(None, "导入项目", base_dir)
+            return self._import([directory] if directory else [])
+        except Exception as e:
+            print(f"Error importing projects: {e}")
+            return ""
+
+    def _import(self, paths):
+        if not paths:
+            return ""
+        store = get_store()
+        report = import_projects(paths, store, source=self)
+        imported = sum(1 for item in report if item["status"] == STATUS_OK)
+        return json.dumps({"imported": imported, "report": report,
+                           "projects": to_js_projects(store.projects())}, ensure_ascii=False)
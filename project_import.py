@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+项目批量导入模块
+从 JSON 文件(单个项目或项目数组)、目录或 zip 压缩包一次导入多个项目，逐个校验后一次写入 project.json
+"""
+
+import os
+import re
+import json
+import zipfile
+
+from project_store import get_store
+
+# 数值类型: JSON 中的整数或小数，不包括 true/false
+NUMBER = "number"
+
+# 项目文件的结构，与 project.json 中的项目一致
+PROJECT_SCHEMA = {
+    "name_cn": str,
+    "name_en": str,
+    "is_active": bool,
+    "plc_settings": {
+        "device_type": str,
+        "byte_order": str,
+        "heartbeat": NUMBER,
+        "timeout": NUMBER,
+        "refresh_interval_ms": NUMBER,
+        "address": str,
+        "port": NUMBER,
+        "username": str,
+        "password": str,
+    },
+}
+# 英文名用作历史数据等目录名，规则与新建项目的表单一致
+NAME_PATTERN = re.compile(r"[A-Za-z0-9_]+")
+# 单个项目文件的最大字节数，避免误选大文件或压缩包炸弹
+MAX_FILE_BYTES = 1024 * 1024
+
+# 导入结果
+STATUS_OK = "ok"
+STATUS_INVALID = "invalid"
+STATUS_DUPLICATE = "duplicate"
+STATUS_ERROR = "error"
+
+_TYPE_NAMES = {str: "字符串", bool: "布尔值", NUMBER: "数值", dict: "对象"}
+_MISSING = object()
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def compile_schema(schema, prefix=()):
+    """把嵌套的结构定义展开为按顺序检查的列表 [(键路径, 显示名, 检查函数, 类型名), ...]
+
+    父对象排在其字段之前，校验时父对象不符合则跳过其字段。
+    """
+    checks = []
+    for key, expected in schema.items():
+        path = prefix + (key,)
+        label = ".".join(path)
+        if isinstance(expected, dict):
+            checks.append((path, label, lambda v: isinstance(v, dict), _TYPE_NAMES[dict]))
+            checks.extend(compile_schema(expected, path))
+        elif expected == NUMBER:
+            checks.append((path, label, _is_number, _TYPE_NAMES[NUMBER]))
+        else:
+            checks.append((path, label, lambda v, t=expected: isinstance(v, t), _TYPE_NAMES[expected]))
+    return checks
+
+
+_PROJECT_CHECKS = compile_schema(PROJECT_SCHEMA)
+
+
+def validate_project(project, checks=_PROJECT_CHECKS):
+    """校验一个项目，返回全部错误信息，没有错误时为空列表"""
+    if not isinstance(project, dict):
+        return ["项目必须是 JSON 对象"]
+    errors = []
+    failed = []
+    for path, label, check, type_name in checks:
+        if any(path[:len(p)] == p for p in failed):
+            continue
+        value = project
+        for key in path:
+            value = value.get(key, _MISSING) if isinstance(value, dict) else _MISSING
+        if value is _MISSING:
+            errors.append(f"缺少 {label}")
+        elif not check(value):
+            errors.append(f"{label} 应为{type_name}")
+        else:
+            continue
+        failed.append(path)
+    name_en = project.get("name_en")
+    if isinstance(name_en, str) and not NAME_PATTERN.fullmatch(name_en.strip()):
+        errors.append("name_en 只能包含字母、数字和下划线")
+    return errors
+
+
+def _read_limited(f):
+    data = f.read(MAX_FILE_BYTES + 1)
+    if len(data) > MAX_FILE_BYTES:
+        raise ValueError(f"文件超过 {MAX_FILE_BYTES // 1024} KB")
+    return data
+
+
+def _iter_files(path):
+    """逐个读取导入来源中的项目文件，产生 (来源名称, 文件内容 或 异常)"""
+    if os.path.isdir(path):
+        for folder, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if not name.lower().endswith(".json"):
+                    continue
+                file_path = os.path.join(folder, name)
+                label = os.path.relpath(file_path, path)
+                try:
+                    with open(file_path, "rb") as f:
+                        yield label, _read_limited(f)
+                except (OSError, ValueError) as e:
+                    yield label, e
+    elif zipfile.is_zipfile(path):
+        base = os.path.basename(path)
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                name = info.filename
+                if info.is_dir() or not name.lower().endswith(".json") or name.startswith("__MACOSX/"):
+                    continue
+                label = f"{base}/{name}"
+                try:
+                    with archive.open(info) as f:
+                        yield label, _read_limited(f)
+                except (OSError, ValueError, zipfile.BadZipFile) as e:
+                    yield label, e
+    else:
+        label = os.path.basename(path)
+        try:
+            with open(path, "rb") as f:
+                yield label, _read_limited(f)
+        except (OSError, ValueError) as e:
+            yield label, e
+
+
+def iter_candidates(paths):
+    """展开全部导入来源，产生 (来源名称, 项目 或 异常)；数组文件中的每一项单独列出"""
+    for path in paths:
+        for label, data in _iter_files(path):
+            if isinstance(data, Exception):
+                yield label, data
+                continue
+            try:
+                parsed = json.loads(data.decode("utf-8-sig"))
+            except (UnicodeDecodeError, ValueError) as e:
+                yield label, ValueError(f"不是有效的 JSON: {e}")
+                continue
+            if isinstance(parsed, list):
+                for i, item in enumerate(parsed):
+                    yield f"{label}[{i}]", item
+            else:
+                yield label, parsed
+
+
+def import_projects(paths, store=None, source=None):
+    """从文件、目录或 zip 压缩包批量导入项目
+
+    全部来源先逐个校验，英文名按不区分大小写的哈希索引检查与已有项目及本批项目是否重复，
+    通过校验的项目最后一次加入项目存储并立即写入 project.json。
+    与页面中导入单个项目相同，导入的项目只在当前没有任何项目时设为运行项目。
+
+    Args:
+        paths: 导入来源路径列表
+        store: ProjectStore，默认为共享实例
+        source: 通知项目修改监听者时的发起者
+
+    Returns:
+        每个来源一项的报告 [{"source", "name_en", "status", "message"}, ...]，
+        status 为 STATUS_OK / STATUS_INVALID / STATUS_DUPLICATE / STATUS_ERROR
+    """
+    store = store or get_store()
+    existing = store.projects()
+    taken = {p.get("name_en", "").casefold(): "已有项目" for p in existing}
+    # 已有项目或本批已有运行项目时，导入的项目不再设为运行项目
+    has_active = bool(existing)
+    accepted = []
+    report = []
+    for label, project in iter_candidates(paths):
+        entry = {"source": label, "name_en": "", "status": STATUS_OK, "message": "已导入"}
+        report.append(entry)
+        if isinstance(project, Exception):
+            entry.update(status=STATUS_ERROR, message=str(project))
+            continue
+        errors = validate_project(project)
+        if errors:
+            entry.update(status=STATUS_INVALID, message="; ".join(errors))
+            if isinstance(project, dict) and isinstance(project.get("name_en"), str):
+                entry["name_en"] = project["name_en"]
+            continue
+        name_en = project["name_en"].strip()
+        entry["name_en"] = name_en
+        key = name_en.casefold()
+        if key in taken:
+            entry.update(status=STATUS_DUPLICATE, message=f"英文名与{taken[key]}重复")
+            continue
+        taken[key] = label
+        active = project["is_active"] and not has_active
+        has_active = has_active or active
+        accepted.append({**project, "name_en": name_en, "is_active": active})
+    if accepted:
+        store.extend(accepted, source=source)
+        store.flush()
+    return report
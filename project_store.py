@@ -0,0 +1,273 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+项目数据存储模块
+在进程内缓存 project.json，按 name_en 建立索引，延迟合并写入并以原子替换方式落盘
+"""
+
+import os
+import copy
+import json
+import time
+import threading
+
+from app_paths import APP_DIR
+
+PROJECTS_PATH = os.path.join(APP_DIR, "project.json")
+# 修改后等待该时间(秒)内没有新的修改才写入文件
+SAVE_DELAY = 0.5
+
+DEFAULT_PLC_SETTINGS = {
+    "device_type": "S7",
+    "byte_order": "ABCD",
+    "heartbeat": 30,
+    "timeout": 10000,
+    "refresh_interval_ms": 60000,
+    "address": "192.168.1.10",
+    "port": 102,
+    "username": "",
+    "password": ""
+}
+
+
+class ProjectStore:
+    """project.json 的进程内存储
+
+    全部页面共用一个实例(见 get_store())。读取时比较文件的修改时间与大小，
+    被外部修改后自动重新加载；修改只更新内存并通知监听者，由后台线程在 SAVE_DELAY 秒内
+    没有新修改后一次性写入：先写临时文件并 fsync，再用 os.replace 原子替换，
+    写入过程中断电也不会留下不完整的 project.json。
+    """
+
+    def __init__(self, path=PROJECTS_PATH, save_delay=SAVE_DELAY):
+        self.path = path
+        self.save_delay = save_delay
+        self._projects = []
+        self._index = {}
+        self._stamp = None
+        self._lock = threading.RLock()
+        self._listeners = []
+        self._dirty = False
+        self._deadline = 0.0
+        self._version = 0
+        self._cond = threading.Condition(self._lock)
+        self._writer = None
+        self._closed = False
+        self._reload()
+
+    # ---- 读取 ----
+
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _reload(self):
+        """从文件加载，返回是否发生了变化"""
+        stamp = self._file_stamp()
+        if stamp == self._stamp:
+            return False
+        projects = []
+        if stamp is not None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    projects = json.load(f)
+                if not isinstance(projects, list):
+                    raise ValueError("project.json 顶层必须是数组")
+            except (OSError, ValueError) as e:
+                print(f"Error loading projects: {e}")
+                return False
+        self._set(projects)
+        self._stamp = stamp
+        return True
+
+    def _set(self, projects):
+        self._projects = [p for p in projects if isinstance(p, dict)]
+        self._index = {p.get("name_en", ""): p for p in self._projects}
+
+    def _fresh(self):
+        """未保存的修改优先；否则文件被外部修改时重新加载并通知"""
+        with self._lock:
+            if self._dirty:
+                return
+            changed = self._reload()
+        if changed:
+            self._notify(None)
+
+    def projects(self):
+        """全部项目(副本)，顺序与文件一致"""
+        self._fresh()
+        with self._lock:
+            return copy.deepcopy(self._projects)
+
+    def get(self, name_en):
+        """按 name_en 取项目(副本)，不存在时返回 None"""
+        self._fresh()
+        with self._lock:
+            project = self._index.get(name_en)
+            return copy.deepcopy(project) if project is not None else None
+
+    def active(self):
+        """当前运行的项目(副本)，没有标记 is_active 时取第一个"""
+        self._fresh()
+        with self._lock:
+            for p in self._projects:
+                if p.get("is_active"):
+                    return copy.deepcopy(p)
+            return copy.deepcopy(self._projects[0]) if self._projects else None
+
+    def active_plc_settings(self):
+        """当前运行项目的PLC设置，缺省项用默认值补齐"""
+        project = self.active()
+        return {**DEFAULT_PLC_SETTINGS, **((project or {}).get("plc_settings") or {})}
+
+    # ---- 修改 ----
+
+    def replace_all(self, projects, source=None):
+        """整体替换项目列表
+
+        列表中的项目按 name_en 与原有项目合并，未出现在新数据中的原有字段被保留。
+        """
+        with self._lock:
+            merged = []
+            for p in projects:
+                old = self._index.get(p.get("name_en", ""))
+                merged.append({**old, **p} if old is not None else dict(p))
+            self._set(merged)
+            self._mark_dirty()
+        self._notify(source)
+
+    def extend(self, projects, source=None):
+        """在末尾追加多个项目，只标记一次修改、通知一次
+
+        调用方负责保证 name_en 不重复
+        """
+        with self._lock:
+            self._set(self._projects + copy.deepcopy(list(projects)))
+            self._mark_dirty()
+        self._notify(source)
+
+    def update(self, name_en, fields, source=None):
+        """更新一个项目的字段，项目不存在时返回 False"""
+        with self._lock:
+            project = self._index.get(name_en)
+            if project is None:
+                return False
+            project.update(copy.deepcopy(fields))
+            self._mark_dirty()
+        self._notify(source)
+        return True
+
+    def update_active_plc_settings(self, settings, source=None):
+        """更新当前运行项目的PLC设置，没有项目时返回 False
+
+        settings 中没有的原有设置项(如数据表列名)被保留
+        """
+        with self._lock:
+            target = next((p for p in self._projects if p.get("is_active")), None)
+            if target is None and self._projects:
+                target = self._projects[0]
+            if target is None:
+                return False
+            target["plc_settings"] = {**(target.get("plc_settings") or {}), **settings}
+            self._mark_dirty()
+        self._notify(source)
+        return True
+
+    # ---- 通知 ----
+
+    def add_listener(self, callback):
+        """注册修改通知 callback(source)，source 为发起修改者(外部修改为 None)
+
+        回调在发起修改的线程中执行
+        """
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _notify(self, source):
+        for callback in list(self._listeners):
+            try:
+                callback(source)
+            except Exception as e:
+                print(f"Error in project listener: {e}")
+
+    # ---- 写入 ----
+
+    def _mark_dirty(self):
+        self._dirty = True
+        self._version += 1
+        self._deadline = time.monotonic() + self.save_delay
+        if self._writer is None and not self._closed:
+            self._writer = threading.Thread(target=self._write_loop, name="project-store", daemon=True)
+            self._writer.start()
+        self._cond.notify_all()
+
+    def _write_loop(self):
+        with self._cond:
+            while not self._closed:
+                if not self._dirty:
+                    self._cond.wait()
+                    continue
+                remaining = self._deadline - time.monotonic()
+                if remaining > 0:
+                    self._cond.wait(remaining)
+                    continue
+                self._write_locked()
+
+    def _write_locked(self):
+        data = json.dumps(self._projects, indent=4, ensure_ascii=False)
+        version = self._version
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"Error saving projects: {e}")
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            # 稍后重试
+            self._deadline = time.monotonic() + max(self.save_delay, 1.0)
+            return
+        self._stamp = self._file_stamp()
+        if version == self._version:
+            self._dirty = False
+
+    def flush(self):
+        """立即写入未保存的修改"""
+        with self._cond:
+            if self._dirty:
+                self._write_locked()
+
+    def close(self):
+        """写入未保存的修改并停止后台线程"""
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._writer is not None:
+            self._writer.join(2)
+            self._writer = None
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """进程内共享的 ProjectStore"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ProjectStore()
+        return _store
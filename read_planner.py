@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+读取计划模块
+将标签按存储区/DB分组，合并相邻地址为连续块，并按PDU大小打包成多项读取请求
+"""
+
+from array import array
+
+from s7_client import (READ_REQUEST_ITEM_SIZE, READ_RESPONSE_ITEM_SIZE, READ_RESPONSE_OVERHEAD,
+                       READ_REQUEST_OVERHEAD, MAX_ITEMS_PER_READ, AREA_NAMES)
+
+# 两段地址之间的空隙不超过单独一项请求的开销时合并读取
+DEFAULT_MAX_GAP = READ_REQUEST_ITEM_SIZE + READ_RESPONSE_ITEM_SIZE
+
+
+class ReadBlock:
+    """一段连续读取的字节区
+
+    tags 为落在本块内的标签索引，offsets 为各标签相对块起始的字节偏移
+    """
+
+    __slots__ = ("area", "db", "start", "size", "tags", "offsets")
+
+    def __init__(self, area, db, start):
+        self.area = area
+        self.db = db
+        self.start = start
+        self.size = 0
+        self.tags = array("I")
+        self.offsets = array("I")
+
+    @property
+    def end(self):
+        return self.start + self.size
+
+    def item(self):
+        """返回 S7Client.read_multi 使用的读取项"""
+        return (self.area, self.db, self.start, self.size)
+
+    def __repr__(self):
+        return f"ReadBlock({AREA_NAMES.get(self.area, self.area)}{self.db}[{self.start}:{self.end}], {len(self.tags)} tags)"
+
+
+class ReadPlan:
+    """读取计划
+
+    blocks 为全部连续块，jobs 为每次请求包含的块索引列表
+    """
+
+    __slots__ = ("blocks", "jobs", "pdu_size", "tag_count")
+
+    def __init__(self, blocks, jobs, pdu_size, tag_count):
+        self.blocks = blocks
+        self.jobs = jobs
+        self.pdu_size = pdu_size
+        self.tag_count = tag_count
+
+    def report(self):
+        """统计每个周期规划前后的请求数量"""
+        return {
+            "tags": self.tag_count,
+            "requests_before": self.tag_count,
+            "requests_after": len(self.jobs),
+            "blocks": len(self.blocks),
+            "bytes_per_cycle": sum(b.size for b in self.blocks),
+            "pdu_size": self.pdu_size,
+        }
+
+
+def max_block_size(pdu_size):
+    """单个读取项在PDU内可容纳的最大字节数(取偶数，免去补齐字节)"""
+    return (pdu_size - READ_RESPONSE_OVERHEAD - READ_RESPONSE_ITEM_SIZE) & ~1
+
+
+def plan_reads(registry, pdu_size, max_gap=DEFAULT_MAX_GAP, indices=None):
+    """生成读取计划
+
+    Args:
+        registry: TagRegistry 标签注册表
+        pdu_size: 与PLC协商得到的PDU大小
+        max_gap: 允许合并的最大地址空隙(字节)
+        indices: 仅规划指定的标签索引，默认全部
+
+    Returns:
+        ReadPlan
+    """
+    if indices is None:
+        indices = range(len(registry))
+    area, db, offset, size = registry.area, registry.db, registry.offset, registry.size
+    limit = max_block_size(pdu_size)
+
+    # 按 (存储区, DB, 起始地址) 排序后顺序合并
+    order = sorted(indices, key=lambda i: (area[i], db[i], offset[i]))
+    blocks = []
+    block = None
+    for i in order:
+        start = offset[i]
+        end = start + min(size[i], limit)
+        if (block is None or area[i] != block.area or db[i] != block.db
+                or start - block.end > max_gap or max(end, block.end) - block.start > limit):
+            block = ReadBlock(area[i], db[i], start)
+            blocks.append(block)
+        block.tags.append(i)
+        block.offsets.append(start - block.start)
+        if end > block.end:
+            block.size = end - block.start
+
+    return ReadPlan(blocks, _pack_jobs(blocks, pdu_size), pdu_size, len(order))
+
+
+def _pack_jobs(blocks, pdu_size):
+    """按应答长度与项数限制，用首次适应递减法把块装入尽量少的请求"""
+    capacity = pdu_size - READ_RESPONSE_OVERHEAD
+    max_items = max(1, min(MAX_ITEMS_PER_READ, (pdu_size - READ_REQUEST_OVERHEAD) // READ_REQUEST_ITEM_SIZE))
+    jobs = []
+    remaining = []
+    for index in sorted(range(len(blocks)), key=lambda b: blocks[b].size, reverse=True):
+        # 奇数长度的项需要1字节补齐，按最坏情况计算
+        cost = READ_RESPONSE_ITEM_SIZE + blocks[index].size + (blocks[index].size & 1)
+        for j, job in enumerate(jobs):
+            if remaining[j] >= cost and len(job) < max_items:
+                job.append(index)
+                remaining[j] -= cost
+                break
+        else:
+            jobs.append([index])
+            remaining.append(capacity - cost)
+    for job in jobs:
+        job.sort()
+    return jobs
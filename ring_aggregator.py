@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+环统计模块
+由采集样本增量计算每一环的起止、出土量累计、峰值与平均值，供环号图表直接使用
+"""
+
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+
+from tag_registry import QUALITY_GOOD
+
+# 参与环统计的标签
+FLOW_TAG = "瞬时出土量"
+STROKE_TAG = "推进行程"
+RING_TAG = "环号"
+
+# 推进行程从本环最大值回落超过该值(mm)视为油缸回缩、本环结束
+RESET_DROP_MM = 100.0
+# 本环推进行程至少增加该值(mm)后才检测回缩，避免换环时行程尚未归零被重复判定
+MIN_ADVANCE_MM = 100.0
+# 相邻样本间隔超过该值(秒)视为采集中断，该段不计入出土量
+MAX_GAP_S = 60.0
+
+
+class RingAggregator:
+    """按环统计出土量
+
+    作为采集引擎的周期处理器，每个成功的采集周期调用一次 process()，每个样本的计算量为 O(1)：
+    瞬时出土量(t/h)按数据时间以梯形法累加为本环出土量(t)；环号变化或推进行程回缩时开始新的一环。
+
+    各环的统计以列式数组保存(每环一行)，另有 环号 -> 行号 的索引，
+    显示任意一段环的图表只读取对应的行，不需要重新扫描历史数据。
+    采集线程写入、界面线程读取，读写都在 _lock 内完成。
+    """
+
+    def __init__(self, registry, reset_drop=RESET_DROP_MM, min_advance=MIN_ADVANCE_MM, max_gap=MAX_GAP_S):
+        """
+        Args:
+            registry: TagRegistry，需包含 瞬时出土量、推进行程，环号可选
+            reset_drop: 判定油缸回缩的行程回落量(mm)
+            min_advance: 检测回缩前本环至少推进的行程(mm)
+            max_gap: 计入出土量的最大样本间隔(秒)
+        """
+        self.flow_index = registry.index_of(FLOW_TAG)
+        self.stroke_index = registry.index_of(STROKE_TAG)
+        self.ring_index = registry.index_of(RING_TAG) if RING_TAG in registry else None
+        self.reset_drop = reset_drop
+        self.min_advance = min_advance
+        self.max_gap = max_gap
+        # 每环一行
+        self.rings = array("q")
+        self.start = array("d")
+        self.end = array("d")
+        self.total = array("d")       # 出土量(t)
+        self.active = array("d")      # 计入出土量的时长(秒)，扣除采集中断
+        self.peak = array("d")        # 瞬时出土量峰值(t/h)
+        self.stroke = array("d")      # 推进行程最大值(mm)，从本环行程最低点之后算起
+        self.samples = array("L")
+        self.index = {}
+        # 每次有环的统计变化时加一，界面据此判断是否需要推送
+        self.version = 0
+        self._lock = threading.Lock()
+        self._last_ts = None
+        self._last_flow = None
+        self._stroke_low = float("inf")
+        # 上一次读到的PLC环号
+        self._plc_ring = None
+
+    def __len__(self):
+        return len(self.rings)
+
+    def process(self, registry, now):
+        """采集引擎的周期回调，取出本周期的样本"""
+        values = registry.values
+        quality = registry.quality
+        flow = values[self.flow_index] if quality[self.flow_index] == QUALITY_GOOD else None
+        stroke = values[self.stroke_index] if quality[self.stroke_index] == QUALITY_GOOD else None
+        ring = None
+        timestamps = registry.timestamps
+        timestamp = max(timestamps[self.flow_index], timestamps[self.stroke_index])
+        index = self.ring_index
+        if index is not None:
+            if quality[index] == QUALITY_GOOD:
+                ring = int(values[index])
+            timestamp = max(timestamp, timestamps[index])
+        # 数据表数据源的数据时间是记录时间，没有新记录的周期不重复计入
+        self.add_sample(timestamp or now, flow, stroke, ring)
+
+    def add_sample(self, timestamp, flow, stroke=None, ring=None):
+        """加入一个样本，flow/stroke/ring 为 None 表示该值本周期无效
+
+        Args:
+            timestamp: 数据时间(秒)，不晚于上一个样本时忽略
+            flow: 瞬时出土量(t/h)
+            stroke: 推进行程(mm)
+            ring: PLC中的环号
+        """
+        last_ts = self._last_ts
+        if last_ts is not None and timestamp <= last_ts:
+            return
+        if flow is not None:
+            flow = max(0.0, flow)
+        # 只在PLC环号变化时换环: 按行程回缩换环后，PLC环号在变化之前仍是上一环
+        ring_changed = ring is not None and ring != self._plc_ring
+        if ring is not None:
+            self._plc_ring = ring
+        with self._lock:
+            row = len(self.rings) - 1
+            if row >= 0 and flow is not None and self._last_flow is not None \
+                    and timestamp - last_ts <= self.max_gap:
+                # 上一个样本到本样本之间的一段计入上一个样本所在的环
+                dt = timestamp - last_ts
+                self.total[row] += (self._last_flow + flow) * 0.5 * dt / 3600.0
+                self.active[row] += dt
+            if row < 0:
+                row = self._open_ring(ring if ring is not None else 1, timestamp, stroke)
+            elif ring_changed and ring != self.rings[row]:
+                row = self._open_ring(ring, timestamp, stroke)
+            elif stroke is not None and self.stroke[row] - self._stroke_low >= self.min_advance \
+                    and stroke < self.stroke[row] - self.reset_drop:
+                # 油缸回缩时PLC的环号可能还没有变化，先按下一环统计，环号随后变为该值时不再换环
+                row = self._open_ring(self.rings[row] + 1, timestamp, stroke)
+            if flow is not None and flow > self.peak[row]:
+                self.peak[row] = flow
+            if stroke is not None:
+                if stroke < self._stroke_low:
+                    # 换环时油缸可能还在回缩，本环的行程从回缩到的最低点起算
+                    self._stroke_low = stroke
+                    self.stroke[row] = stroke
+                elif stroke > self.stroke[row]:
+                    self.stroke[row] = stroke
+            self.end[row] = timestamp
+            self.samples[row] += 1
+            self.version += 1
+        self._last_ts = timestamp
+        self._last_flow = flow
+
+    def _open_ring(self, ring, timestamp, stroke):
+        self.rings.append(ring)
+        self.start.append(timestamp)
+        self.end.append(timestamp)
+        self.total.append(0.0)
+        self.active.append(0.0)
+        self.peak.append(0.0)
+        self.stroke.append(0.0)
+        self.samples.append(0)
+        self._stroke_low = stroke if stroke is not None else float("inf")
+        row = len(self.rings) - 1
+        # 环号重复出现(如PLC环号被修正)时索引指向最新的一行
+        self.index[ring] = row
+        return row
+
+    def _summary(self, row):
+        duration = self.end[row] - self.start[row]
+        active = self.active[row]
+        return {
+            "ring": self.rings[row],
+            "start": self.start[row],
+            "end": self.end[row],
+            "duration_s": duration,
+            "total_t": self.total[row],
+            "peak_tph": self.peak[row],
+            # 按时间加权的平均瞬时出土量
+            "average_tph": self.total[row] * 3600.0 / active if active > 0 else 0.0,
+            "stroke_mm": self.stroke[row],
+            "samples": self.samples[row],
+        }
+
+    def current(self):
+        """当前环的统计，尚无样本时返回 None"""
+        with self._lock:
+            return self._summary(len(self.rings) - 1) if self.rings else None
+
+    def ring(self, ring):
+        """指定环号的统计，不存在时返回 None"""
+        with self._lock:
+            row = self.index.get(ring)
+            return self._summary(row) if row is not None else None
+
+    def columns(self, start=0, stop=None):
+        """行号 [start, stop) 的图表数据
+
+        Returns:
+            (环号, 出土量(t), 推进行程最大值(mm)) 三个列表，出土量与行程保留两位小数
+        """
+        with self._lock:
+            rings = self.rings[start:stop].tolist()
+            totals = [round(v, 2) for v in self.total[start:stop]]
+            strokes = [round(v, 2) for v in self.stroke[start:stop]]
+        return rings, totals, strokes
+
+    def window(self, count):
+        """最近 count 环的图表数据，见 columns()"""
+        return self.columns(max(0, len(self.rings) - count))
+
+    def between(self, first, last):
+        """环号在 [first, last] 内的图表数据，见 columns()
+
+        环号随掘进递增，按二分查找定位行，不逐行扫描。
+        """
+        with self._lock:
+            start, stop = bisect_left(self.rings, first), bisect_right(self.rings, last)
+        return self.columns(start, stop)
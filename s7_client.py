@@ -0,0 +1,361 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+S7通信模块
+基于asyncio实现的非阻塞S7(ISO-on-TCP, 端口102)客户端，
+以及用于本地联调的S7模拟服务端
+"""
+
+import re
+import asyncio
+import struct
+
+# 存储区代码
+AREA_PE = 0x81
+AREA_PA = 0x82
+AREA_MK = 0x83
+AREA_DB = 0x84
+
+AREA_NAMES = {
+    AREA_PE: "I",
+    AREA_PA: "Q",
+    AREA_MK: "M",
+    AREA_DB: "DB",
+}
+
+# S7协议常量
+_TPKT_HEADER = struct.Struct(">BBH")
+_S7_JOB_HEADER = struct.Struct(">BBHHHH")
+_S7_ACK_HEADER = struct.Struct(">BBHHHHBB")
+_READ_ITEM = struct.Struct(">BBBBHHB3s")
+_COTP_DT = b"\x02\xf0\x80"
+
+ROSCTR_JOB = 0x01
+ROSCTR_ACK_DATA = 0x03
+FUNC_READ_VAR = 0x04
+FUNC_SETUP_COMM = 0xF0
+
+TS_BYTE = 0x02
+RET_SUCCESS = 0xFF
+RET_OBJECT_NOT_EXIST = 0x0A
+RET_OUT_OF_RANGE = 0x05
+
+# 请求: S7头10字节 + 功能码/项数2字节，每项12字节
+READ_REQUEST_OVERHEAD = 12
+READ_REQUEST_ITEM_SIZE = 12
+# 应答: S7头12字节 + 功能码/项数2字节，每项4字节头 + 数据(奇数补齐)
+READ_RESPONSE_OVERHEAD = 14
+READ_RESPONSE_ITEM_SIZE = 4
+MAX_ITEMS_PER_READ = 20
+
+DEFAULT_PDU_SIZE = 480
+
+_ADDRESS_RE = re.compile(
+    r"^(?:DB(?P<db>\d+)\.DB(?P<dbw>[XBWD])(?P<dbo>\d+)(?:\.(?P<dbbit>[0-7]))?"
+    r"|(?P<area>[IQEAM])(?P<w>[XBWD]?)(?P<o>\d+)(?:\.(?P<bit>[0-7]))?)$",
+    re.IGNORECASE
+)
+
+_AREA_LETTERS = {"I": AREA_PE, "E": AREA_PE, "Q": AREA_PA, "A": AREA_PA, "M": AREA_MK}
+_WIDTH_SIZES = {"X": 1, "B": 1, "W": 2, "D": 4, "": 1}
+
+
+class S7Error(Exception):
+    """S7通信异常"""
+
+
+def parse_address(address):
+    """解析S7地址字符串
+
+    支持 DB1.DBX0.0 / DB1.DBB2 / DB1.DBW4 / DB1.DBD8 以及 I0.0 / QB1 / MW10 / MD20 等写法
+
+    Returns:
+        (area, db, byte_offset, bit, size) 元组
+    """
+    m = _ADDRESS_RE.match(str(address).strip().replace(" ", ""))
+    if not m:
+        raise S7Error(f"无法解析的S7地址: {address}")
+    if m.group("db") is not None:
+        width = m.group("dbw").upper()
+        bit = m.group("dbbit")
+        if (width == "X") != (bit is not None):
+            raise S7Error(f"无法解析的S7地址: {address}")
+        return (AREA_DB, int(m.group("db")), int(m.group("dbo")),
+                int(bit) if bit is not None else 0, _WIDTH_SIZES[width])
+    width = (m.group("w") or "").upper()
+    bit = m.group("bit")
+    if width in ("B", "W", "D") and bit is not None:
+        raise S7Error(f"无法解析的S7地址: {address}")
+    if width in ("", "X") and bit is None:
+        raise S7Error(f"无法解析的S7地址: {address}")
+    return (_AREA_LETTERS[m.group("area").upper()], 0, int(m.group("o")),
+            int(bit) if bit is not None else 0, _WIDTH_SIZES[width])
+
+
+def read_response_size(sizes):
+    """计算一组读取项的应答报文长度"""
+    total = READ_RESPONSE_OVERHEAD
+    for i, size in enumerate(sizes):
+        total += READ_RESPONSE_ITEM_SIZE + size
+        if size % 2 and i != len(sizes) - 1:
+            total += 1
+    return total
+
+
+def _tpkt(payload):
+    return _TPKT_HEADER.pack(3, 0, len(payload) + 4) + payload
+
+
+def _encode_address(start):
+    bit_address = start * 8
+    return bytes(((bit_address >> 16) & 0xFF, (bit_address >> 8) & 0xFF, bit_address & 0xFF))
+
+
+async def _read_tpkt(reader):
+    header = await reader.readexactly(4)
+    version, _, length = _TPKT_HEADER.unpack(header)
+    if version != 3 or length < 7:
+        raise S7Error(f"非法的TPKT报文头: {header.hex()}")
+    return await reader.readexactly(length - 4)
+
+
+class S7Client:
+    """非阻塞S7客户端
+
+    所有方法均为协程，必须在同一个事件循环中调用。
+    每次请求都受 timeout 约束，超时后连接将被关闭。
+    """
+
+    def __init__(self, address, port=102, rack=0, slot=1, timeout=10.0, pdu_size=DEFAULT_PDU_SIZE):
+        self.address = address
+        self.port = int(port)
+        self.rack = int(rack)
+        self.slot = int(slot)
+        self.timeout = float(timeout)
+        self.requested_pdu_size = int(pdu_size)
+        self.pdu_size = 0
+        self._reader = None
+        self._writer = None
+        self._pdu_ref = 0
+        self._lock = asyncio.Lock()
+
+    @property
+    def connected(self):
+        return self._writer is not None and not self._writer.is_closing()
+
+    async def connect(self):
+        """建立TCP连接并完成COTP握手与S7通信协商"""
+        await self.close()
+        try:
+            self._reader, self._writer = await asyncio.wait_for(
+                asyncio.open_connection(self.address, self.port), self.timeout
+            )
+            await asyncio.wait_for(self._handshake(), self.timeout)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+            await self.close()
+            raise S7Error(f"连接PLC失败 {self.address}:{self.port}: {e!r}") from e
+        except S7Error:
+            await self.close()
+            raise
+
+    async def close(self):
+        writer, self._writer, self._reader = self._writer, None, None
+        self.pdu_size = 0
+        if writer is not None:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+    async def _handshake(self):
+        # COTP连接请求，本地TSAP 0x0100，远端TSAP 按机架/槽位计算
+        remote_tsap = 0x0100 | (self.rack * 0x20 + self.slot)
+        cr = bytes((0x11, 0xE0, 0x00, 0x00, 0x00, 0x01, 0x00,
+                    0xC0, 0x01, 0x0A,
+                    0xC1, 0x02, 0x01, 0x00,
+                    0xC2, 0x02, (remote_tsap >> 8) & 0xFF, remote_tsap & 0xFF))
+        self._writer.write(_tpkt(cr))
+        await self._writer.drain()
+        cc = await _read_tpkt(self._reader)
+        if len(cc) < 2 or cc[1] != 0xD0:
+            raise S7Error(f"COTP连接被拒绝: {cc.hex()}")
+
+        params = struct.pack(">BBHHH", FUNC_SETUP_COMM, 0, 1, 1, self.requested_pdu_size)
+        rparams, _ = await self._exchange(params, b"")
+        if len(rparams) < 8:
+            raise S7Error("通信协商应答长度不足")
+        self.pdu_size = struct.unpack_from(">H", rparams, 6)[0]
+
+    async def _exchange(self, params, data):
+        self._pdu_ref = (self._pdu_ref + 1) & 0xFFFF
+        header = _S7_JOB_HEADER.pack(0x32, ROSCTR_JOB, 0, self._pdu_ref, len(params), len(data))
+        self._writer.write(_tpkt(_COTP_DT + header + params + data))
+        await self._writer.drain()
+        while True:
+            payload = await _read_tpkt(self._reader)
+            if len(payload) < 3 + _S7_ACK_HEADER.size or payload[1] != 0xF0:
+                raise S7Error("非法的COTP数据报文")
+            pid, rosctr, _, ref, plen, dlen, err_class, err_code = _S7_ACK_HEADER.unpack_from(payload, 3)
+            if pid != 0x32 or rosctr != ROSCTR_ACK_DATA:
+                raise S7Error(f"非法的S7应答类型: {rosctr}")
+            if ref != self._pdu_ref:
+                # 过期的应答(上一次请求超时后到达)，丢弃
+                continue
+            if err_class or err_code:
+                raise S7Error(f"S7应答错误: class={err_class:#x} code={err_code:#x}")
+            body = 3 + _S7_ACK_HEADER.size
+            return payload[body:body + plen], payload[body + plen:body + plen + dlen]
+
+    def max_read_items(self):
+        """按协商PDU计算单次请求允许的最大读取项数"""
+        pdu = self.pdu_size or DEFAULT_PDU_SIZE
+        return max(1, min(MAX_ITEMS_PER_READ, (pdu - READ_REQUEST_OVERHEAD) // READ_REQUEST_ITEM_SIZE))
+
+    async def read_multi(self, items):
+        """一次请求读取多个字节区
+
+        Args:
+            items: [(area, db, start, size), ...]，应答长度须在协商PDU之内
+
+        Returns:
+            与 items 对应的 bytes 列表
+        """
+        if not items:
+            return []
+        if not self.connected:
+            raise S7Error("PLC未连接")
+        if len(items) > self.max_read_items():
+            raise S7Error(f"单次读取项数 {len(items)} 超过PDU限制 {self.max_read_items()}")
+        if read_response_size([it[3] for it in items]) > self.pdu_size:
+            raise S7Error(f"读取数据长度超过协商PDU {self.pdu_size}")
+        params = bytearray((FUNC_READ_VAR, len(items)))
+        for area, db, start, size in items:
+            params += _READ_ITEM.pack(0x12, 0x0A, 0x10, TS_BYTE, size,
+                                      db if area == AREA_DB else 0, area, _encode_address(start))
+        async with self._lock:
+            try:
+                _, data = await asyncio.wait_for(self._exchange(bytes(params), b""), self.timeout)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+                await self.close()
+                raise S7Error(f"读取PLC数据失败: {e!r}") from e
+            except S7Error:
+                await self.close()
+                raise
+        results = []
+        pos = 0
+        for i, (area, db, start, size) in enumerate(items):
+            if pos + 4 > len(data):
+                raise S7Error("读取应答长度不足")
+            ret, tsize, length = struct.unpack_from(">BBH", data, pos)
+            pos += 4
+            if ret != RET_SUCCESS:
+                raise S7Error(f"读取 {AREA_NAMES.get(area, area)}{db}.{start} 失败，返回码 {ret:#x}")
+            if tsize in (0x03, 0x04, 0x05):
+                length = (length + 7) // 8
+            results.append(bytes(data[pos:pos + length]))
+            pos += length
+            if length % 2 and i != len(items) - 1:
+                pos += 1
+        return results
+
+    async def read_area(self, area, db, start, size):
+        """读取单个字节区"""
+        return (await self.read_multi([(area, db, start, size)]))[0]
+
+
+class S7StandInServer:
+    """S7模拟服务端
+
+    在本地端口上应答COTP握手、通信协商与读变量请求，
+    数据来自内存中的存储区，可用于在无PLC的环境下联调采集链路。
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, pdu_size=DEFAULT_PDU_SIZE, delay=0.0):
+        self.host = host
+        self.port = port
+        self.pdu_size = pdu_size
+        self.delay = delay
+        self.areas = {}
+        self.request_count = 0
+        self._server = None
+        self._writers = set()
+
+    def set_area(self, area, db, data):
+        """设置存储区内容"""
+        self.areas[(area, db if area == AREA_DB else 0)] = bytearray(data)
+
+    def write(self, area, db, start, data):
+        """写入存储区，区域不足时自动扩展"""
+        buf = self.areas.setdefault((area, db if area == AREA_DB else 0), bytearray())
+        end = start + len(data)
+        if len(buf) < end:
+            buf.extend(bytes(end - len(buf)))
+        buf[start:end] = data
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        """停止监听并断开全部客户端连接(模拟PLC掉线)"""
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._writers):
+                writer.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader, writer):
+        negotiated = self.pdu_size
+        self._writers.add(writer)
+        try:
+            cr = await _read_tpkt(reader)
+            if len(cr) < 2 or cr[1] != 0xE0:
+                return
+            cc = bytearray(cr)
+            cc[1] = 0xD0
+            writer.write(_tpkt(bytes(cc)))
+            while True:
+                payload = await _read_tpkt(reader)
+                _, _, _, ref, plen, dlen = _S7_JOB_HEADER.unpack_from(payload, 3)
+                params = payload[3 + _S7_JOB_HEADER.size:3 + _S7_JOB_HEADER.size + plen]
+                if self.delay:
+                    await asyncio.sleep(self.delay)
+                if params[0] == FUNC_SETUP_COMM:
+                    negotiated = min(self.pdu_size, struct.unpack_from(">H", params, 6)[0])
+                    rparams = struct.pack(">BBHHH", FUNC_SETUP_COMM, 0, 1, 1, negotiated)
+                    rdata = b""
+                elif params[0] == FUNC_READ_VAR:
+                    self.request_count += 1
+                    rparams, rdata = self._read_var(params)
+                else:
+                    return
+                header = _S7_ACK_HEADER.pack(0x32, ROSCTR_ACK_DATA, 0, ref, len(rparams), len(rdata), 0, 0)
+                writer.write(_tpkt(_COTP_DT + header + rparams + rdata))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    def _read_var(self, params):
+        count = params[1]
+        data = bytearray()
+        for i in range(count):
+            _, _, _, _, size, db, area, addr = _READ_ITEM.unpack_from(params, 2 + i * 12)
+            start = ((addr[0] << 16) | (addr[1] << 8) | addr[2]) >> 3
+            buf = self.areas.get((area, db if area == AREA_DB else 0))
+            if buf is None:
+                data += bytes((RET_OBJECT_NOT_EXIST, 0, 0, 0))
+                continue
+            if start + size > len(buf):
+                data += bytes((RET_OUT_OF_RANGE, 0, 0, 0))
+                continue
+            data += struct.pack(">BBH", RET_SUCCESS, 0x04, size * 8) + buf[start:start + size]
+            if size % 2 and i != count - 1:
+                data.append(0)
+        return bytes((FUNC_READ_VAR, count)), bytes(data)
@@ -6,46 +6,29 @@
 负责系统设置相关功能
 """
 
-import os
-import json
-import codecs
-from PyQt5.QtWebEngineWidgets import QWebEngineView
-from PyQt5.QtCore import QUrl, QSettings, QObject, pyqtSlot
-from PyQt5.QtWebChannel import QWebChannel
+from PyQt5.QtCore import QObject, pyqtSlot
+from config_service import get_config
 
 class SettingPage:
     """设置页面类"""
     
-    def __init__(self):
-        self.page = QWebEngineView()
+    route = "setting"
+    
+    def __init__(self, shell):
+        self.shell = shell
         self.bridge = SettingsBridge()
-        self.channel = QWebChannel(self.page.page())
-        self.channel.registerObject('bridge', self.bridge)
-        self.page.page().setWebChannel(self.channel)
+        shell.add_route(self.route, self.bridge)
         self.generate_setting_page()
-    
-    def get_page(self):
-        """获取页面组件"""
-        return self.page
+        get_config().settingsChanged.connect(self._on_settings_changed)
     
     def load_settings(self):
-        """从JSON文件加载设置"""
-        settings_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "setting.json")
-        default_settings = {
-            "theme": "浅色",
-            "refresh_interval": 5,
-            "auto_save_logs": True,
-            "enable_notifications": True
-        }
-        
-        if os.path.exists(settings_path):
-            try:
-                with open(settings_path, 'r', encoding='utf-8') as f:
-                    return {**default_settings, **json.load(f)}
-            except Exception as e:
-                print(f"Error loading settings: {e}")
-                return default_settings
-        return default_settings
+        """加载设置"""
+        return get_config().settings()
+
+    def _on_settings_changed(self, _settings):
+        """setting.json 被外部修改时重新生成页面，本页保存的修改不需要重新加载"""
+        if not self.bridge.saving:
+            self.generate_setting_page()
 
     def generate_setting_page(self):
         """生成设置页面内容"""
@@ -58,7 +41,6 @@ class SettingPage:
         <head>
             <meta charset="UTF-8">
             <title>系统设置</title>
-            <script src="qrc:///qtwebchannel/qwebchannel.js"></script>
             <style>
                 body {
                     font-family: Arial, sans-serif;
@@ -244,18 +226,19 @@ class SettingPage:
                 var themeSelect = document.getElementById('themeSelect');
                 themeSelect.value = "__THEME__";
 
-                new QWebChannel(qt.webChannelTransport, function(channel){
-                    window.bridge = channel.objects.bridge;
-                    var saveBtn = document.getElementById('saveSettingsBtn');
-                    saveBtn.addEventListener('click', function(){
-                        var theme = document.getElementById('themeSelect').value;
-                        var refreshInterval = parseInt(document.getElementById('refreshInterval').value);
-                        var autoSaveLogs = document.getElementById('autoSaveLogs').checked;
-                        var enableNotifications = document.getElementById('enableNotifications').checked;
+                // 外壳的共享通道(重新)初始化后更新桥接对象
+                parent.shell.onChannel('setting', function(objects){
+                    window.bridge = objects.setting;
+                });
+                var saveBtn = document.getElementById('saveSettingsBtn');
+                saveBtn.addEventListener('click', function(){
+                    var theme = document.getElementById('themeSelect').value;
+                    var refreshInterval = parseInt(document.getElementById('refreshInterval').value);
+                    var autoSaveLogs = document.getElementById('autoSaveLogs').checked;
+                    var enableNotifications = document.getElementById('enableNotifications').checked;
 
-                        bridge.saveSettings(theme, refreshInterval, autoSaveLogs, enableNotifications);
-                        alert('设置已保存');
-                    });
+                    bridge.saveSettings(theme, refreshInterval, autoSaveLogs, enableNotifications);
+                    alert('设置已保存');
                 });
             });
             </script>
@@ -269,29 +252,26 @@ class SettingPage:
         html_content = html_content.replace("__AUTO_SAVE_LOGS__", "checked" if settings["auto_save_logs"] else "")
         html_content = html_content.replace("__ENABLE_NOTIFICATIONS__", "checked" if settings["enable_notifications"] else "")
 
-        # 保存HTML到临时文件
-        setting_html_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ui", "setting_page.html")
-        os.makedirs(os.path.dirname(setting_html_path), exist_ok=True)
-        with open(setting_html_path, "w", encoding="utf-8") as f:
-            f.write(html_content)
-        
-        # 加载HTML到WebView
-        self.page.load(QUrl.fromLocalFile(setting_html_path))
+        # 发布到外壳，内容变化时外壳重新加载该页面
+        self.shell.set_route(self.route, html_content)
 
 class SettingsBridge(QObject):
+    # 正在保存本页修改，配置服务的变更通知由本页发起
+    saving = False
+
     @pyqtSlot(str, int, bool, bool)
     def saveSettings(self, theme, refresh_interval, auto_save_logs, enable_notifications):
-        """保存设置到JSON文件"""
+        """保存设置，由配置服务写入 setting.json 并通知订阅者"""
         settings = {
             "theme": theme,
             "refresh_interval": refresh_interval,
             "auto_save_logs": auto_save_logs,
             "enable_notifications": enable_notifications
         }
-        
-        settings_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "setting.json")
+        self.saving = True
         try:
-            with open(settings_path, 'w', encoding='utf-8') as f:
-                json.dump(settings, f, indent=4, ensure_ascii=False)
+            get_config().save_settings(settings)
         except Exception as e:
             print(f"Error saving settings: {e}")
+        finally:
+            self.saving = False
@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+页面外壳模块
+全部页面共用一个 QWebEngineView 与一个 QWebChannel，页面作为外壳内的路由按需加载
+"""
+
+import json
+import time
+
+from PyQt5.QtWebEngineWidgets import QWebEngineView
+from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot
+from PyQt5.QtWebChannel import QWebChannel
+
+from web_scheme import load_page, page_url, publish
+
+# 每累计多少次页面切换输出一次耗时统计
+SWITCH_REPORT_EVERY = 20
+
+SHELL_HTML = r"""
+<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <title>PLC监控系统</title>
+    <script src="qrc:///qtwebchannel/qwebchannel.js"></script>
+    <style>
+        html, body {
+            margin: 0;
+            height: 100%;
+            overflow: hidden;
+            background-color: #f9f9f9;
+        }
+        iframe {
+            display: none;
+            border: none;
+            width: 100%;
+            height: 100%;
+        }
+        iframe.active {
+            display: block;
+        }
+    </style>
+</head>
+<body>
+<script>
+(function() {
+    // 路由名称 -> iframe；页面通过 parent.shell.onChannel 取得共享通道上的桥接对象
+    const frames = {};
+    const listeners = {};
+    let channel = null;
+    let current = null;
+    let initializing = false;
+    let reinit = false;
+
+    function setRoute(name, url) {
+        let frame = frames[name];
+        if (!frame) {
+            frame = document.createElement('iframe');
+            frame.name = name;
+            frames[name] = frame;
+            document.body.appendChild(frame);
+        }
+        if (frame.getAttribute('src') !== url) {
+            frame.setAttribute('src', url);
+        }
+        frame.classList.toggle('active', name === current);
+    }
+
+    function show(name, seq) {
+        current = name;
+        Object.keys(frames).forEach(function(key) {
+            frames[key].classList.toggle('active', key === name);
+        });
+        if (seq && channel) {
+            // 两帧之后页面已绘制，回报切换完成
+            requestAnimationFrame(function() {
+                requestAnimationFrame(function() {
+                    channel.objects.shell.reportShown(name, seq);
+                });
+            });
+        }
+    }
+
+    function notify(route) {
+        const callback = listeners[route];
+        if (!callback || !channel) {
+            return;
+        }
+        try {
+            callback(channel.objects);
+        } catch (e) {
+            console.error('route ' + route + ': ' + e);
+        }
+    }
+
+    function initChannel() {
+        // 初始化进行中时完成后再来一次；有未返回的调用时稍后再重新初始化，避免丢失应答
+        if (initializing) {
+            reinit = true;
+            return;
+        }
+        if (channel && Object.keys(channel.execCallbacks).length) {
+            setTimeout(initChannel, 10);
+            return;
+        }
+        initializing = true;
+        new QWebChannel(qt.webChannelTransport, function(ch) {
+            channel = ch;
+            initializing = false;
+            if (reinit) {
+                reinit = false;
+                setTimeout(initChannel, 0);
+                return;
+            }
+            const shell = ch.objects.shell;
+            shell.routeUpdated.connect(setRoute);
+            shell.navigate.connect(show);
+            shell.objectsChanged.connect(initChannel);
+            shell.state(function(payload) {
+                const state = JSON.parse(payload);
+                current = state.current;
+                Object.keys(state.routes).forEach(function(name) {
+                    setRoute(name, state.routes[name]);
+                });
+                if (current) {
+                    show(current, 0);
+                }
+            });
+            Object.keys(listeners).forEach(notify);
+        });
+    }
+
+    window.shell = {
+        // 注册路由页面的通道回调，通道(重新)初始化后以全部桥接对象调用
+        onChannel: function(route, callback) {
+            listeners[route] = callback;
+            notify(route);
+        }
+    };
+
+    initChannel();
+})();
+</script>
+</body>
+</html>
+"""
+
+
+class AppShell:
+    """单 WebView 页面外壳
+
+    只创建一个 QWebEngineView(一个渲染进程)与一个 QWebChannel。
+    各页面类通过 add_route() 注册桥接对象，通过 set_route() 发布页面HTML；
+    页面在外壳内以同源 iframe 加载，切换页面只是显示/隐藏，不重新加载也不重建渲染进程。
+    """
+
+    def __init__(self):
+        self.view = QWebEngineView()
+        self.channel = QWebChannel(self.view.page())
+        self.bridge = ShellBridge(self)
+        self.channel.registerObject("shell", self.bridge)
+        self.view.page().setWebChannel(self.channel)
+        # 路由名称 -> 带版本号的页面地址
+        self.routes = {}
+        self.current = None
+        self._switch_seq = 0
+        self._switch_started = {}
+        self.switch_ms = []
+        # 页面切换完成时的回调 callback(name, ms)，供性能测试使用
+        self.on_switched = None
+        load_page(self.view, "shell.html", SHELL_HTML)
+
+    def get_page(self):
+        """获取页面组件"""
+        return self.view
+
+    def add_route(self, name, bridge):
+        """注册路由的桥接对象，页面中通过 objects[name] 访问"""
+        self.channel.registerObject(name, bridge)
+        # 已初始化的页面端通道看不到新注册的对象，通知其重新初始化
+        self.bridge.objectsChanged.emit()
+
+    def set_route(self, name, html):
+        """发布路由页面HTML，内容变化时页面端重新加载该路由"""
+        url = page_url(f"{name}.html", publish(f"{name}.html", html)).toString()
+        if self.routes.get(name) == url:
+            return False
+        self.routes[name] = url
+        self.bridge.routeUpdated.emit(name, url)
+        return True
+
+    def show(self, name):
+        """切换到路由页面"""
+        self.current = name
+        self._switch_seq += 1
+        started = self._switch_started
+        started[self._switch_seq] = time.perf_counter()
+        # 页面端未回报的序号(如外壳尚未加载)不无限累积
+        if len(started) > SWITCH_REPORT_EVERY:
+            started.pop(next(iter(started)))
+        self.bridge.navigate.emit(name, self._switch_seq)
+
+    def record_switch(self, name, seq):
+        """页面端绘制完成后回报，统计切换耗时"""
+        started = self._switch_started.pop(seq, None)
+        if started is None:
+            return
+        elapsed = (time.perf_counter() - started) * 1000.0
+        if self.on_switched is not None:
+            self.on_switched(name, elapsed)
+        samples = self.switch_ms
+        samples.append(elapsed)
+        if len(samples) >= SWITCH_REPORT_EVERY:
+            ordered = sorted(samples)
+            print(f"页面切换耗时: 平均 {sum(ordered) / len(ordered):.1f} ms, "
+                  f"P95 {ordered[int(len(ordered) * 0.95)]:.1f} ms, 最大 {ordered[-1]:.1f} ms")
+            samples.clear()
+
+
+class ShellBridge(QObject):
+    """外壳与页面端之间的桥接对象"""
+
+    routeUpdated = pyqtSignal(str, str)
+    navigate = pyqtSignal(str, int)
+    objectsChanged = pyqtSignal()
+
+    def __init__(self, shell):
+        super().__init__()
+        self.shell = shell
+
+    @pyqtSlot(result=str)
+    def state(self):
+        """页面端通道初始化后取得全部路由与当前页面，补上初始化前错过的通知"""
+        return json.dumps({"routes": self.shell.routes, "current": self.shell.current})
+
+    @pyqtSlot(str, int)
+    def reportShown(self, name, seq):
+        self.shell.record_switch(name, seq)
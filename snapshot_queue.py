@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+快照队列模块
+采集线程与界面线程之间的有界单生产者/单消费者队列，界面处理不过来时只保留最新的快照
+"""
+
+from collections import deque, namedtuple
+
+# 默认队列长度
+SNAPSHOT_QUEUE_SIZE = 8
+
+# 一个采集周期的结果
+#   values/quality/timestamps: 注册表数组的副本
+#   timestamp: 数据时间(秒)
+#   read_at: 开始读取PLC时的 time.perf_counter()，用于计算读取到显示的延迟
+#   cycle: 采集周期序号
+Snapshot = namedtuple("Snapshot", ["values", "quality", "timestamps", "timestamp", "read_at", "cycle"])
+
+
+class SnapshotQueue:
+    """有界SPSC快照队列
+
+    基于 deque(maxlen)：append/popleft 是原子操作，生产者与消费者之间不需要加锁；
+    队列满时自动丢弃最旧的快照。生产者只在消费者可能已处理完时返回需要唤醒，
+    避免界面线程落后时事件队列中堆积大量通知。
+    """
+
+    def __init__(self, capacity=SNAPSHOT_QUEUE_SIZE):
+        self._items = deque(maxlen=max(1, capacity))
+        self._notified = False
+        self.produced = 0
+        self.consumed = 0
+        self.coalesced = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def put(self, snapshot):
+        """放入一个快照(生产者线程)
+
+        Returns:
+            True 表示需要通知消费者
+        """
+        self._items.append(snapshot)
+        self.produced += 1
+        if self._notified:
+            return False
+        self._notified = True
+        return True
+
+    def take_latest(self):
+        """取出全部快照，只返回最新的一个(消费者线程)
+
+        Returns:
+            (snapshot, skipped): 无数据时 snapshot 为 None，skipped 为被合并跳过的快照数
+        """
+        # 先清除通知标志再取数据，之后放入的快照会重新触发通知
+        self._notified = False
+        latest = None
+        taken = 0
+        items = self._items
+        while True:
+            try:
+                latest = items.popleft()
+            except IndexError:
+                break
+            taken += 1
+        skipped = max(0, taken - 1)
+        self.consumed += taken
+        self.coalesced += skipped
+        return latest, skipped
+
+    @property
+    def overflowed(self):
+        """队列已满时被丢弃的快照数"""
+        return self.produced - self.consumed - len(self._items)
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+SQLite数据源模块
+以只读方式增量读取网关写入本地SQLite数据库的PLC数据
+"""
+
+import os
+import sqlite3
+from urllib.parse import quote
+
+from app_paths import APP_DIR
+from data_source import TableSource, SourceError
+
+
+class SqliteSource(TableSource):
+    """SQLite数据表数据源
+
+    plc_settings.address 为数据库文件路径(相对路径以程序目录为基准)，默认以 rowid 作为水位线，
+    rowid 即主键，范围扫描无需额外索引。sqlite3 按SQL文本缓存已编译的语句，
+    每次轮询复用同一条预编译查询。
+    """
+
+    placeholder = "?"
+    default_watermark = "rowid"
+    errors = (sqlite3.Error,)
+
+    def __init__(self, settings, registry):
+        super().__init__(settings, registry)
+        path = self.address or "plc_data.db"
+        self.path = path if os.path.isabs(path) else os.path.join(APP_DIR, path)
+        self._conn = None
+
+    def describe(self):
+        return f"SQLite({self.path})"
+
+    def _connect_blocking(self):
+        # sqlite3 连接只能在创建它的线程中使用，总是在当前工作线程中重新创建
+        self._close_blocking()
+        if not os.path.isfile(self.path):
+            raise SourceError(f"SQLite数据库不存在: {self.path}")
+        # 只读打开，避免与网关的写入争用写锁
+        self._conn = sqlite3.connect(f"file:{quote(self.path)}?mode=ro", uri=True,
+                                     timeout=self.timeout, cached_statements=16)
+
+    def _query(self, sql, params):
+        if self._conn is None:
+            raise SourceError("SQLite未连接")
+        return self._conn.execute(sql, params).fetchall()
+
+    def _close_blocking(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _abandon(self):
+        self._conn = None
@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+标签注册表模块
+以列式数组保存全部PLC标签的静态信息与实时值
+"""
+
+from array import array
+
+from s7_client import S7Error, parse_address
+
+# 数据类型: 名称 -> (类型代码, 字节长度)
+TYPE_BOOL = 0
+TYPE_BYTE = 1
+TYPE_SHORT = 2
+TYPE_WORD = 3
+TYPE_DINT = 4
+TYPE_DWORD = 5
+TYPE_FLOAT = 6
+TYPE_LREAL = 7
+TYPE_STRING = 8
+
+DATA_TYPES = {
+    "bool": (TYPE_BOOL, 1),
+    "byte": (TYPE_BYTE, 1),
+    "short": (TYPE_SHORT, 2),
+    "int": (TYPE_SHORT, 2),
+    "word": (TYPE_WORD, 2),
+    "dint": (TYPE_DINT, 4),
+    "dword": (TYPE_DWORD, 4),
+    "float": (TYPE_FLOAT, 4),
+    "real": (TYPE_FLOAT, 4),
+    "lreal": (TYPE_LREAL, 8),
+    "string": (TYPE_STRING, 256),
+}
+
+# 数据质量: 过期表示保留最后一次的值，但连接异常后未再更新
+QUALITY_BAD = 0
+QUALITY_GOOD = 1
+QUALITY_STALE = 2
+
+_STALE_TABLE = bytes(QUALITY_STALE if i == QUALITY_GOOD else i for i in range(256))
+
+
+def parse_data_type(dtype):
+    """解析数据类型，STRING 支持 string[20] 形式指定最大长度
+
+    Returns:
+        (类型代码, 字节长度)
+    """
+    key = str(dtype).strip().lower()
+    if key.startswith("string[") and key.endswith("]"):
+        # S7 STRING: 1字节最大长度 + 1字节实际长度 + 字符
+        return TYPE_STRING, int(key[7:-1]) + 2
+    try:
+        return DATA_TYPES[key]
+    except KeyError:
+        raise ValueError(f"不支持的数据类型: {dtype}")
+
+
+class TagRegistry:
+    """标签注册表
+
+    静态信息(名称、地址、类型、公式、单位、扫描等级)在添加时解析一次，
+    按列保存在紧凑数组中；实时值、时间戳和质量保存在连续的类型化数组中并原地更新。
+    raw 为采集得到的原始值，values 为经计算公式换算后的工程值。
+    按名称或地址查找均为O(1)。
+    """
+
+    __slots__ = (
+        "names", "addresses", "dtype_names", "formulas", "formula_inputs", "units",
+        "area", "db", "offset", "bit", "dtype", "size", "scan_class",
+        "raw", "values", "timestamps", "quality", "texts",
+        "_by_name", "_by_address", "_by_location",
+    )
+
+    def __init__(self):
+        self.names = []
+        self.addresses = []
+        self.dtype_names = []
+        self.formulas = []
+        self.formula_inputs = array("d")
+        self.units = []
+        self.area = array("B")
+        self.db = array("H")
+        self.offset = array("I")
+        self.bit = array("B")
+        self.dtype = array("B")
+        self.size = array("H")
+        self.scan_class = array("B")
+        self.raw = array("d")
+        self.values = array("d")
+        self.timestamps = array("d")
+        self.quality = array("B")
+        # STRING 类型的值无法放入数值数组，单独按索引保存
+        self.texts = {}
+        self._by_name = {}
+        self._by_address = {}
+        self._by_location = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self._by_name
+
+    @classmethod
+    def from_definitions(cls, definitions):
+        """由标签定义列表创建注册表
+
+        Args:
+            definitions: [{"名称", "数据地址", "数据类型", "计算公式", "公式输入值", "单位", "扫描等级"}, ...]
+                         或 (名称, 数据地址, 数据类型, 单位) 元组
+        """
+        registry = cls()
+        for d in definitions:
+            if isinstance(d, dict):
+                registry.add(
+                    d.get("名称", d.get("name")),
+                    d.get("数据地址", d.get("address")),
+                    d.get("数据类型", d.get("type", "float")),
+                    formula=d.get("计算公式", d.get("formula", "none")),
+                    formula_input=d.get("公式输入值", d.get("formula_input", 0)),
+                    unit=d.get("单位", d.get("unit", "")),
+                    scan_class=d.get("扫描等级", d.get("scan_class", 0)),
+                )
+            else:
+                name, address, dtype, unit = d
+                registry.add(name, address, dtype, unit=unit)
+        return registry
+
+    def add(self, name, address, dtype, formula="none", formula_input=0, unit="", scan_class=0):
+        """添加标签并返回其索引"""
+        if name in self._by_name:
+            raise ValueError(f"标签名称重复: {name}")
+        area, db, offset, bit, _ = parse_address(address)
+        code, size = parse_data_type(dtype)
+        key = (area, db, offset, bit, code)
+        if key in self._by_address:
+            raise ValueError(f"标签地址重复: {address}")
+
+        index = len(self.names)
+        self.names.append(name)
+        self.addresses.append(str(address).strip().upper())
+        self.dtype_names.append(str(dtype).strip().lower())
+        self.formulas.append(formula or "none")
+        self.formula_inputs.append(float(formula_input or 0))
+        self.units.append(unit or "")
+        self.area.append(area)
+        self.db.append(db)
+        self.offset.append(offset)
+        self.bit.append(bit)
+        self.dtype.append(code)
+        self.size.append(size)
+        self.scan_class.append(int(scan_class))
+        self.raw.append(0.0)
+        self.values.append(0.0)
+        self.timestamps.append(0.0)
+        self.quality.append(QUALITY_BAD)
+        self._by_name[name] = index
+        self._by_address[key] = index
+        self._by_location.setdefault(key[:4], index)
+        return index
+
+    def index_of(self, name):
+        """按名称查找标签索引，不存在时返回-1"""
+        return self._by_name.get(name, -1)
+
+    def index_of_address(self, address, dtype=None):
+        """按S7地址查找标签索引，不存在时返回-1
+
+        同一地址可能按不同类型登记，未指定 dtype 时返回第一个匹配项
+        """
+        try:
+            area, db, offset, bit, _ = parse_address(address)
+        except S7Error:
+            return -1
+        if dtype is not None:
+            return self._by_address.get((area, db, offset, bit, parse_data_type(dtype)[0]), -1)
+        return self._by_location.get((area, db, offset, bit), -1)
+
+    def value(self, name, default=None):
+        """按名称取实时值"""
+        index = self._by_name.get(name)
+        if index is None or self.quality[index] == QUALITY_BAD:
+            return default
+        if self.dtype[index] == TYPE_STRING:
+            return self.texts.get(index, "")
+        return self.values[index]
+
+    def set_value(self, index, value, timestamp, quality=QUALITY_GOOD):
+        """原地写入单个标签的原始值"""
+        if self.dtype[index] == TYPE_STRING:
+            self.texts[index] = value
+        else:
+            self.raw[index] = value
+        self.timestamps[index] = timestamp
+        self.quality[index] = quality
+
+    def set_quality(self, quality, indices=None):
+        """批量设置数据质量"""
+        if indices is None:
+            self.quality[:] = array("B", [quality]) * len(self.names)
+            return
+        q = self.quality
+        for i in indices:
+            q[i] = quality
+
+    def mark_stale(self):
+        """把全部质量为好的标签标记为过期，保留其最后的值"""
+        view = memoryview(self.quality)
+        view[:] = view.tobytes().translate(_STALE_TABLE)
+
+    def metadata_rows(self):
+        """返回静态信息行，供界面表格在初始化时一次性使用"""
+        return [
+            [self.names[i], self.addresses[i], self.dtype_names[i], self.formulas[i],
+             self.formula_inputs[i], self.units[i]]
+            for i in range(len(self.names))
+        ]
@@ -21,6 +21,11 @@ class BaseUI(QMainWindow):
     
     def __init__(self):
         super().__init__()
+        # 页面名称 -> 页面工厂 / 已创建的页面对象
+        self.shell = None
+        self.page_factories = {}
+        self.page_objects = {}
+        self._prewarm_queue = []
         self.initUI()
         
     def initUI(self):
@@ -180,17 +185,69 @@ class BaseUI(QMainWindow):
         self.middle_section = QStackedWidget()
         self.right_layout.addWidget(self.middle_section)
 
+    def set_shell(self, shell):
+        """设置页面外壳，全部页面在外壳的同一个 WebView 中显示"""
+        self.shell = shell
+        self.middle_section.addWidget(shell.get_page())
+
     def add_page(self, page, page_name):
-        """添加页面到中间内容区域
+        """添加页面
         
         Args:
-            page: 页面组件
-            page_name: 页面名称，用于标识页面
+            page: 页面对象，或无参数的页面工厂(返回页面对象)，工厂在首次显示该页面时才调用
+            page_name: 页面名称，即外壳中的路由名称
         """
-        self.middle_section.addWidget(page)
-        # 如果是第一个添加的页面，默认显示
-        if self.middle_section.count() == 1:
-            self.show_home_page()
+        if callable(page):
+            self.page_factories[page_name] = page
+        else:
+            self.page_objects[page_name] = page
+        # 如果是第一个添加的页面，默认显示；页面工厂在窗口显示后的事件循环中再创建
+        if len(self.page_factories) + len(self.page_objects) == 1:
+            if page_name in self.page_factories:
+                QTimer.singleShot(0, self.show_home_page)
+            else:
+                self.show_home_page()
+
+    def ensure_page(self, page_name):
+        """创建尚未创建的页面，返回页面对象"""
+        if page_name in self.page_objects:
+            return self.page_objects[page_name]
+        factory = self.page_factories.pop(page_name)
+        started = time.perf_counter()
+        page = factory()
+        self.page_objects[page_name] = page
+        print(f"页面 {page_name} 创建耗时 {(time.perf_counter() - started) * 1000:.0f} ms")
+        return page
+
+    def prewarm(self, delay_ms=2000):
+        """空闲时逐个创建尚未打开的页面，首次切换时不需要等待
+
+        每个页面之间间隔 delay_ms 毫秒并回到事件循环，避免连续占用界面线程。
+        """
+        self._prewarm_queue = list(self.page_factories)
+        QTimer.singleShot(delay_ms, lambda: self._prewarm_next(delay_ms))
+
+    def _prewarm_next(self, delay_ms):
+        while self._prewarm_queue:
+            page_name = self._prewarm_queue.pop(0)
+            if page_name in self.page_factories:
+                self.ensure_page(page_name)
+                break
+        if self._prewarm_queue:
+            QTimer.singleShot(delay_ms, lambda: self._prewarm_next(delay_ms))
+
+    def shutdown_pages(self):
+        """关闭已创建页面的后台任务(定时器、采集线程等)"""
+        for page in self.page_objects.values():
+            shutdown = getattr(page, "shutdown", None)
+            if callable(shutdown):
+                shutdown()
+
+    def _show_page(self, page_name, title, btn):
+        self.ensure_page(page_name)
+        self.shell.show(page_name)
+        self.page_title.setText(title)
+        self.update_btn_style(btn)
     
     def update_btn_style(self, active_btn):
         """更新按钮样式"""
@@ -226,27 +283,19 @@ class BaseUI(QMainWindow):
 
     def show_home_page(self):
         """显示主页"""
-        self.middle_section.setCurrentIndex(0)
-        self.page_title.setText("主页")
-        self.update_btn_style(self.home_btn)
+        self._show_page("home", "主页", self.home_btn)
     
     def show_project_page(self):
         """显示项目管理页面"""
-        self.middle_section.setCurrentIndex(1)
-        self.page_title.setText("项目管理")
-        self.update_btn_style(self.project_btn)
+        self._show_page("project", "项目管理", self.project_btn)
     
     def show_plc_link_page(self):
         """显示PLC连接页面"""
-        self.middle_section.setCurrentIndex(2)
-        self.page_title.setText("PLC连接")
-        self.update_btn_style(self.plc_link_btn)
+        self._show_page("plc_link", "PLC连接", self.plc_link_btn)
     
     def show_settings_page(self):
         """显示设置页面"""
-        self.middle_section.setCurrentIndex(3)
-        self.page_title.setText("设置")
-        self.update_btn_style(self.settings_btn)
+        self._show_page("setting", "设置", self.settings_btn)
 
     def update_time(self):
         """更新时间显示"""
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+自定义URL协议模块
+通过 plc:// 协议从内存提供页面HTML与页面使用的静态资源(如 ECharts)，无需联网也不写磁盘
+"""
+
+import os
+import hashlib
+import mimetypes
+import threading
+from PyQt5.QtCore import QBuffer, QIODevice, QUrl, QByteArray
+from PyQt5.QtWebEngineCore import (QWebEngineUrlScheme, QWebEngineUrlSchemeHandler,
+                                   QWebEngineUrlRequestJob)
+from PyQt5.QtWebEngineWidgets import QWebEngineProfile
+
+SCHEME = b"plc"
+HOST = "app"
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ui", "assets")
+
+# 随程序提供的 ECharts 运行库(Apache ECharts 5.4.1)，不依赖网络，启动时按 SHA-256 校验
+ECHARTS_VERSION = "5.4.1"
+ECHARTS_ASSET = "echarts.min.js"
+ECHARTS_SHA256 = "205df6a283fc34f233420fdfb3b9551e9c06f7625c08f1354d9004c854a01995"
+
+ECHARTS_URL = f"{SCHEME.decode()}://{HOST}/assets/echarts.min.js"
+
+
+
+class AssetError(Exception):
+    """静态资源缺失或损坏"""
+
+
+def check_assets(assets_dir=ASSETS_DIR):
+    """检查随程序提供的 ECharts 运行库
+
+    Raises:
+        AssetError: 文件缺失或内容与 ECHARTS_SHA256 不一致
+    """
+    path = os.path.join(assets_dir, ECHARTS_ASSET)
+    try:
+        with open(path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+    except OSError as e:
+        raise AssetError(f"缺少 ECharts {ECHARTS_VERSION} 运行库 {path}: {e}") from e
+    if digest != ECHARTS_SHA256:
+        raise AssetError(f"ECharts 运行库 {path} 已损坏或版本不符，应为 {ECHARTS_VERSION} (SHA-256 {ECHARTS_SHA256})")
+
+
+# 内存中的页面内容: 名称 -> (内容, MIME类型, ETag)
+_pages = {}
+_pages_lock = threading.Lock()
+
+
+def publish(name, data, mime=None):
+    """发布一份内存内容，可通过 plc://app/pages/<name> 访问
+
+    Args:
+        name: 名称，如 "home.html"、"home/initial.json"
+        data: str 或 bytes
+        mime: MIME类型，默认按扩展名推断
+
+    Returns:
+        ETag: 内容的SHA1摘要，内容不变时保持不变
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    if mime is None:
+        mime = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        if mime.startswith("text/") or mime in ("application/json", "application/javascript"):
+            mime += "; charset=utf-8"
+    etag = hashlib.sha1(data).hexdigest()
+    with _pages_lock:
+        cached = _pages.get(name)
+        if cached is None or cached[2] != etag:
+            _pages[name] = (data, mime.encode(), etag)
+    return etag
+
+
+def page_url(name, etag):
+    """带版本号的页面地址，内容变化后地址随之变化，不会取到旧的缓存"""
+    return QUrl(f"{SCHEME.decode()}://{HOST}/pages/{name}?v={etag[:16]}")
+
+
+def load_page(view, name, html):
+    """把页面HTML发布到内存并在 QWebEngineView 中打开
+
+    内容与当前显示的版本相同(ETag一致)时不重新加载。
+
+    Returns:
+        True 表示重新加载了页面
+    """
+    url = page_url(name, publish(name, html))
+    if view.url() == url:
+        return False
+    view.load(url)
+    return True
+
+
+def register_scheme():
+    """注册 plc:// 协议，必须在创建 QApplication 之前调用"""
+    scheme = QWebEngineUrlScheme(SCHEME)
+    scheme.setSyntax(QWebEngineUrlScheme.Syntax.Host)
+    scheme.setFlags(
+        QWebEngineUrlScheme.SecureScheme
+        | QWebEngineUrlScheme.LocalScheme
+        | QWebEngineUrlScheme.LocalAccessAllowed
+        | QWebEngineUrlScheme.CorsEnabled
+    )
+    QWebEngineUrlScheme.registerScheme(scheme)
+
+
+class AppSchemeHandler(QWebEngineUrlSchemeHandler):
+    """plc:// 协议处理器
+
+    /pages/ 下为 publish() 发布的内存内容；/assets/ 下的文件在首次请求时读入内存，
+    之后的请求都直接从内存应答，不再访问磁盘，也从不访问网络。
+    Qt5 的协议处理器无法读取请求头与设置应答头，以地址中的 ETag 版本号代替条件请求。
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._assets = {}
+
+    def install(self, profile=None):
+        """安装到 WebEngine 配置(默认配置)"""
+        profile = profile or QWebEngineProfile.defaultProfile()
+        profile.installUrlSchemeHandler(SCHEME, self)
+        return self
+
+    def _load_asset(self, name):
+        cached = self._assets.get(name)
+        if cached is None:
+            path = os.path.normpath(os.path.join(ASSETS_DIR, name))
+            if not path.startswith(ASSETS_DIR + os.sep) or not os.path.isfile(path):
+                return None
+            with open(path, "rb") as f:
+                data = f.read()
+            mime = mimetypes.guess_type(path)[0] or "application/octet-stream"
+            cached = (QByteArray(data), mime.encode())
+            self._assets[name] = cached
+        return cached
+
+    def requestStarted(self, job):
+        url = job.requestUrl()
+        path = url.path()
+        if url.host() == HOST and path.startswith("/pages/"):
+            with _pages_lock:
+                page = _pages.get(path[len("/pages/"):])
+            if page is None:
+                job.fail(QWebEngineUrlRequestJob.UrlNotFound)
+            else:
+                self._reply(job, QByteArray(page[0]), page[1])
+            return
+        if url.host() != HOST or not path.startswith("/assets/"):
+            job.fail(QWebEngineUrlRequestJob.UrlNotFound)
+            return
+        name = path[len("/assets/"):]
+        try:
+            asset = self._load_asset(name)
+        except OSError as e:
+            print(f"Error loading asset {name}: {e}")
+            asset = None
+        if asset is None:
+            print(f"Error loading asset {name}: not found in {ASSETS_DIR}")
+            job.fail(QWebEngineUrlRequestJob.UrlNotFound)
+            return
+        data, mime = asset
+        self._reply(job, data, mime)
+
+    @staticmethod
+    def _reply(job, data, mime):
+        buffer = QBuffer(job)
+        buffer.setData(data)
+        buffer.open(QIODevice.ReadOnly)
+        job.reply(mime, buffer)